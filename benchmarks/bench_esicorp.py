@@ -0,0 +1,386 @@
+"""
+Benchmark ESICORP - Procesamiento y desencriptación con corpus sintéticos
+
+Genera corpus de archivos Area-DD-MM-AAAA.Sede y mide, sin red:
+- ESICORPProcessor.procesar_todos (hash + Base64 + AES + ZIP)
+- decrypt_esicorp.procesar_directorio (desencriptación en el servidor)
+
+Perfiles de corpus:
+- pequenos: muchos archivos diminutos
+- mixto:    tamaños variados
+- grandes:  pocos archivos de varios GB
+
+Variantes: texto (CSV, comprimible) y aleatorio (incomprimible).
+
+Cada escenario corre en un proceso nuevo para que la memoria pico (RSS) sea
+la del escenario. Los resultados se guardan como JSON en benchmarks/resultados
+para comparar versiones en la misma máquina:
+
+    python benchmarks/bench_esicorp.py --perfiles pequenos mixto --escala 0.1
+    python benchmarks/bench_esicorp.py --jobs 4 --formato 2 --comprimir
+    python benchmarks/bench_esicorp.py --comparar base.json nuevo.json
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import decrypt_esicorp  # noqa: E402
+from src.esicorp_processor import ESICORPProcessor  # noqa: E402
+from src.metricas import rss_pico_mb, resource  # noqa: E402
+
+VERSION_RESULTADOS = 1
+MB = 1024 * 1024
+
+# perfil -> lista de (cantidad de archivos, tamaño en bytes)
+PERFILES = {
+    "pequenos": [(2000, 4 * 1024)],
+    "mixto": [(200, 16 * 1024), (50, 1 * MB), (10, 32 * MB)],
+    "grandes": [(2, 2048 * MB)],
+}
+VARIANTES = ("texto", "aleatorio")
+
+AREAS = ("Ventas", "Compras", "Finanzas", "Nomina", "Inventario")
+SEDES = ("lima", "santiago", "bogota", "quito", "buenosaires")
+TAMANO_MUESTRA = 4 * MB  # bloque base a partir del cual se escriben los archivos
+
+
+def _muestra(variante, semilla):
+    """
+    Bloque de datos del que se toman los archivos del corpus.
+
+    La ventana de zlib es de 32 KB, así que repetir un bloque de 4 MB no
+    cambia la compresibilidad de cada variante.
+    """
+    rng = random.Random(semilla)
+    if variante == "aleatorio":
+        return rng.randbytes(TAMANO_MUESTRA)
+
+    lineas = []
+    tamano = 0
+    while tamano < TAMANO_MUESTRA:
+        linea = (
+            f"{rng.randint(1, 10**9)},{rng.choice(SEDES)},{rng.choice(AREAS)},"
+            f"{rng.randint(1, 9999)},{rng.random() * 10000:.2f}\n"
+        )
+        lineas.append(linea)
+        tamano += len(linea)
+    return "".join(lineas).encode()[:TAMANO_MUESTRA]
+
+
+def _escribir_archivo(ruta, tamano, muestra, desplazamiento):
+    """Escribe ``tamano`` bytes tomados de la muestra de forma circular."""
+    with open(ruta, "wb") as f:
+        restante = tamano
+        inicio = desplazamiento % len(muestra)
+        while restante:
+            bloque = muestra[inicio : inicio + restante]
+            f.write(bloque)
+            restante -= len(bloque)
+            inicio = 0
+
+
+def generar_corpus(directorio, perfil, variante, escala):
+    """
+    Genera (o reutiliza) un corpus sintético.
+
+    Args:
+        directorio (Path): Directorio base de corpus
+        perfil (str): Clave de PERFILES
+        variante (str): "texto" o "aleatorio"
+        escala (float): Factor aplicado al tamaño de cada archivo
+
+    Returns:
+        tuple: (directorio con los archivos, cantidad de archivos, bytes totales)
+    """
+    especificacion = [
+        (cantidad, max(1, int(tamano * escala))) for cantidad, tamano in PERFILES[perfil]
+    ]
+    destino = Path(directorio) / f"{perfil}-{variante}-x{escala:g}"
+    marca = destino / ".corpus.json"
+    if marca.exists() and json.loads(marca.read_text())["especificacion"] == especificacion:
+        datos = json.loads(marca.read_text())
+        return destino / "salida", datos["archivos"], datos["bytes"]
+
+    shutil.rmtree(destino, ignore_errors=True)
+    salida = destino / "salida"
+    salida.mkdir(parents=True)
+    muestra = _muestra(variante, semilla=f"{perfil}-{variante}")
+
+    print(f"[INFO] Generando corpus {destino.name}...")
+    fecha_base = date(2000, 1, 1)
+    numero = 0
+    total = 0
+    for cantidad, tamano in especificacion:
+        for _ in range(cantidad):
+            # Una fecha distinta por archivo: nombres de archivo (y de ZIP, que
+            # llevan el nombre completo) únicos aunque se repitan Area y Sede
+            fecha = fecha_base + timedelta(days=numero)
+            nombre = (
+                f"{AREAS[numero % len(AREAS)]}-{fecha:%d-%m-%Y}."
+                f"{SEDES[numero % len(SEDES)]}"
+            )
+            _escribir_archivo(salida / nombre, tamano, muestra, numero * 4099)
+            numero += 1
+            total += tamano
+
+    marca.write_text(
+        json.dumps({"especificacion": especificacion, "archivos": numero, "bytes": total})
+    )
+    return salida, numero, total
+
+
+def _mb_s(total_bytes, segundos):
+    return round(total_bytes / segundos / 1e6, 1) if segundos > 0 else None
+
+
+def ejecutar_escenario(salida, trabajo, opciones):
+    """
+    Procesa y desencripta un corpus. Se ejecuta en un proceso aparte.
+
+    Args:
+        salida (Path): Directorio con el corpus
+        trabajo (Path): Directorio temporal para ZIP y archivos restaurados
+        opciones (dict): Argumentos de ESICORPProcessor
+
+    Returns:
+        dict: Tiempos, rendimiento, latencias y memoria del escenario
+    """
+    trabajo = Path(tempfile.mkdtemp(dir=trabajo))
+    procesados = trabajo / "procesados"
+    extraidos = trabajo / "extraidos"
+    try:
+        processor = ESICORPProcessor(
+            salida_dir=salida,
+            procesados_dir=procesados,
+            incremental=False,
+            deduplicar=False,
+            **opciones,
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            zips = processor.procesar_todos(permitir_seleccion=False)
+            t_procesar = time.perf_counter() - inicio
+        resumen = processor.metricas.resumen()
+
+        inicio = time.perf_counter()
+        for zip_file in zips:
+            with zipfile.ZipFile(zip_file) as zipf:
+                zipf.extractall(extraidos)
+        t_extraer = time.perf_counter() - inicio
+        bytes_zip = sum(zip_file.stat().st_size for zip_file in zips)
+        for zip_file in zips:
+            zip_file.unlink()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            decrypt_esicorp.procesar_directorio(extraidos)
+            t_descifrar = time.perf_counter() - inicio
+        restaurados = [
+            extraidos / p.name for p in Path(salida).iterdir() if (extraidos / p.name).exists()
+        ]
+        bytes_restaurados = sum(p.stat().st_size for p in restaurados)
+
+        rss_hijos = None
+        if resource is not None and opciones.get("executor") == "process":
+            rss_hijos = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+        return {
+            "zips": len(zips),
+            "bytes_zip": bytes_zip,
+            "procesamiento": {
+                "segundos": round(t_procesar, 4),
+                "mb_s": _mb_s(resumen["bytes"], t_procesar),
+                "archivos_s": round(len(zips) / t_procesar, 1) if t_procesar > 0 else None,
+                "latencia": resumen["latencia"],
+                "etapas_mb_s": {n: e["mb_s"] for n, e in resumen["etapas"].items()},
+            },
+            "extraccion": {"segundos": round(t_extraer, 4)},
+            "descifrado": {
+                "segundos": round(t_descifrar, 4),
+                "mb_s": _mb_s(bytes_restaurados, t_descifrar),
+                "archivos_s": (
+                    round(len(restaurados) / t_descifrar, 1) if t_descifrar > 0 else None
+                ),
+                "latencia_media": (
+                    round(t_descifrar / len(restaurados), 6) if restaurados else None
+                ),
+                "restaurados": len(restaurados),
+            },
+            "rss_pico_mb": rss_pico_mb(),
+            "rss_pico_workers_mb": rss_hijos,
+        }
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def info_maquina():
+    """Datos del entorno para interpretar los resultados."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import cryptography
+
+        version_cryptography = cryptography.__version__
+    except ImportError:
+        version_cryptography = None
+    return {
+        "host": platform.node(),
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "cryptography": version_cryptography,
+        "commit": commit,
+    }
+
+
+def comparar(base, nuevo):
+    """Muestra la variación de rendimiento entre dos archivos de resultados."""
+    datos_base = json.loads(Path(base).read_text())
+    datos_nuevo = json.loads(Path(nuevo).read_text())
+    anteriores = {
+        (e["perfil"], e["variante"]): e for e in datos_base["escenarios"]
+    }
+
+    print(f"Base:  {base} ({datos_base['maquina'].get('commit')})")
+    print(f"Nuevo: {nuevo} ({datos_nuevo['maquina'].get('commit')})\n")
+    print(f"{'Escenario':<22} {'Etapa':<14} {'Base MB/s':>10} {'Nuevo MB/s':>11} {'Cambio':>8}")
+    for escenario in datos_nuevo["escenarios"]:
+        clave = (escenario["perfil"], escenario["variante"])
+        anterior = anteriores.get(clave)
+        if anterior is None:
+            continue
+        for etapa in ("procesamiento", "descifrado"):
+            a = anterior[etapa]["mb_s"]
+            b = escenario[etapa]["mb_s"]
+            cambio = f"{100 * (b - a) / a:+.1f}%" if a and b else "-"
+            print(f"{'-'.join(clave):<22} {etapa:<14} {a or 0:>10.1f} {b or 0:>11.1f} {cambio:>8}")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark offline del procesamiento ESICORP"
+    )
+    parser.add_argument(
+        "--perfiles", nargs="+", choices=list(PERFILES), default=["pequenos", "mixto"]
+    )
+    parser.add_argument("--variantes", nargs="+", choices=VARIANTES, default=list(VARIANTES))
+    parser.add_argument(
+        "--escala",
+        type=float,
+        default=1.0,
+        help="Factor para el tamaño de cada archivo (ej: 0.01 para una prueba rápida)",
+    )
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--formato", type=int, choices=[1, 2, 3], default=1)
+    parser.add_argument("--comprimir", action="store_true")
+    parser.add_argument(
+        "--corpus",
+        type=Path,
+        default=RAIZ / "benchmarks" / "corpus",
+        help="Directorio de corpus generados (se reutilizan entre ejecuciones)",
+    )
+    parser.add_argument(
+        "--trabajo",
+        type=Path,
+        default=None,
+        help="Directorio temporal para ZIP y archivos restaurados",
+    )
+    parser.add_argument(
+        "--salida",
+        type=Path,
+        default=RAIZ / "benchmarks" / "resultados",
+        help="Directorio donde guardar el JSON de resultados",
+    )
+    parser.add_argument(
+        "--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Comparar dos resultados"
+    )
+    return parser
+
+
+def main():
+    args = crear_parser().parse_args()
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    opciones = {
+        "jobs": args.jobs,
+        "executor": args.executor,
+        "formato": args.formato,
+        "compresion": args.comprimir,
+    }
+    trabajo = args.trabajo or Path(tempfile.gettempdir())
+    resultados = {
+        "version": VERSION_RESULTADOS,
+        "fecha": datetime.now().isoformat(),
+        "maquina": info_maquina(),
+        "parametros": {**opciones, "escala": args.escala},
+        "escenarios": [],
+    }
+
+    for perfil in args.perfiles:
+        for variante in args.variantes:
+            salida, archivos, total = generar_corpus(args.corpus, perfil, variante, args.escala)
+            print(f"[PROC] {perfil}-{variante}: {archivos} archivo(s), {total:,} bytes")
+            # Un proceso nuevo por escenario: RSS pico independiente
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                medicion = pool.submit(ejecutar_escenario, salida, trabajo, opciones).result()
+            escenario = {
+                "perfil": perfil,
+                "variante": variante,
+                "archivos": archivos,
+                "bytes": total,
+                **medicion,
+            }
+            resultados["escenarios"].append(escenario)
+
+            latencia = escenario["procesamiento"]["latencia"]
+            print(
+                f"   [OK] Procesamiento {escenario['procesamiento']['mb_s']} MB/s "
+                f"(p50 {latencia['p50']}s, p99 {latencia['p99']}s) | "
+                f"Descifrado {escenario['descifrado']['mb_s']} MB/s | "
+                f"RSS {escenario['rss_pico_mb']} MB"
+            )
+            if escenario["descifrado"]["restaurados"] != archivos:
+                print(
+                    f"   [X] Restaurados {escenario['descifrado']['restaurados']}"
+                    f"/{archivos} archivos"
+                )
+
+    args.salida.mkdir(parents=True, exist_ok=True)
+    destino = args.salida / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    destino.write_text(json.dumps(resultados, indent=1))
+    print(f"\n[OK] Resultados guardados en: {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,162 +1,1046 @@
 """
 Script de desencriptacion ESICORP para ejecutar en el servidor Linux
 
-Este script se ejecuta en el servidor después de recibir y extraer los archivos.
+Este script se ejecuta en el servidor después de recibir los archivos: lee los
+.enc directamente del ZIP subido (o de un directorio ya extraído).
 Realiza el proceso inverso: Lee .enc binario -> AES decrypt -> Base64 decode -> archivo original
+(en formato v2, detectado por la cabecera, no hay paso Base64; en formato v3 los
+bloques AES-GCM se descifran y verifican en paralelo)
+
+El descifrado es en streaming, con memoria constante: el resultado se escribe
+en un archivo temporal calculando su SHA-256 al mismo tiempo, y solo se
+renombra al nombre final si el hash coincide con el del .hash.txt.
+
+Cada archivo restaurado y verificado deja un marcador oculto
+(.<nombre>.completo) con su hash: al volver a ejecutar el script sobre el mismo
+ZIP o directorio (ej: después de una interrupción) se omiten los archivos que
+ya están restaurados y continúa con el resto. --forzar descifra todo de nuevo.
 """
 
+import io
+import os
 import sys
+import argparse
 import base64
+import binascii
+import json
+import shutil
+import struct
 import hashlib
-from pathlib import Path
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path, PurePosixPath
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 
+# Formatos v2 y v3 (ver ESICORPProcessor.CABECERA_V2):
+# magic, versión, flags, tamaño original, tamaño de bloque
+MAGIC_V2 = b"ESIC"
+CABECERA_V2 = struct.Struct(">4sBBQI")
+FLAG_ZLIB = 0x01
+VERSIONES_CABECERA = (2, 3)
+
+# Formato v3 (ver src/cifrado_bloques.py): nonce de bloque =
+# [prefijo 7 bytes][índice 4 bytes big-endian][último 1 byte]
+TAMANO_PREFIJO = 7
+TAMANO_TAG = 16
+HILOS_DESCIFRADO = os.cpu_count() or 1
+
+# Bytes cifrados leídos por iteración en v1/v2 (múltiplo de 16 y de 4)
+TAMANO_LECTURA = 1024 * 1024
+
+# v1/v2 sin compresión: desde UMBRAL_PARALELO bytes cifrados, el archivo se
+# descifra en segmentos de TAMANO_SEGMENTO bytes en paralelo (ver
+# descifrar_cbc_paralelo). El segmento es múltiplo de 16 (bloque AES) y de 4
+# (grupo Base64), así cada uno se decodifica por separado.
+UMBRAL_PARALELO = 64 * 1024 * 1024
+TAMANO_SEGMENTO = 8 * 1024 * 1024
+
+# Omitir los archivos ya restaurados y verificados (ver ya_restaurado);
+# --forzar lo desactiva
+REANUDAR = True
+
+
+def publicar(destino, escribir):
+    """
+    Crea ``destino`` de forma atómica: ``escribir`` recibe un temporal abierto
+    junto a él (.<nombre>.parcial), que se renombra al terminar o se elimina
+    si falla. Una interrupción nunca deja ``destino`` a medio escribir.
+
+    Args:
+        destino: Archivo a crear (o reemplazar)
+        escribir: Función que recibe el archivo temporal abierto en binario
+    """
+    destino = Path(destino)
+    temporal = destino.with_name(f".{destino.name}.parcial")
+    try:
+        with open(temporal, "wb") as f:
+            escribir(f)
+        os.replace(temporal, destino)
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+
+
+class SalidaVerificada:
+    """
+    Archivo de salida escrito en un temporal mientras se calcula su SHA-256.
+
+    Solo se renombra al nombre final (os.replace, atómico) si el tamaño y el
+    hash coinciden; si no, o si ocurre un error, el temporal se elimina y no
+    queda ningún archivo corrupto.
+
+    Uso:
+        with SalidaVerificada(archivo_salida, hash_esperado) as salida:
+            salida.escribir(datos)
+            ok = salida.confirmar()
+    """
+
+    def __init__(self, archivo_salida, hash_esperado=None, resultado=None):
+        """
+        Args:
+            archivo_salida: Archivo final a crear
+            hash_esperado: SHA-256 hexadecimal esperado, o None para no verificar
+            resultado: dict del resultado del archivo (ver nuevo_resultado) donde
+                anotar tamaño, hash verificado o el error, o None
+        """
+        self.archivo_salida = Path(archivo_salida)
+        self.temporal = self.archivo_salida.with_name(
+            f".{self.archivo_salida.name}.parcial"
+        )
+        self.hash_esperado = hash_esperado
+        self.resultado = resultado
+        self.sha256 = hashlib.sha256()
+        self.escritos = 0
+        self.confirmado = False
+        self._archivo = open(self.temporal, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.confirmado:
+            self.descartar()
+        return False
+
+    def escribir(self, datos):
+        if datos:
+            self._archivo.write(datos)
+            self.sha256.update(datos)
+            self.escritos += len(datos)
+
+    def reservar(self, tamano):
+        """Preasigna ``tamano`` bytes en el temporal para escribir_en."""
+        fd = self._archivo.fileno()
+        try:
+            os.posix_fallocate(fd, 0, tamano)
+        except (AttributeError, OSError):
+            pass  # sistema de archivos sin fallocate: basta con el tamaño
+        os.ftruncate(fd, tamano)
+
+    def escribir_en(self, posicion, datos):
+        """
+        Escribe ``datos`` en ``posicion`` sin mover el archivo (seguro entre
+        hilos). No actualiza el hash: los mismos datos se pasan luego, en
+        orden, a acumular.
+        """
+        os.pwrite(self._archivo.fileno(), datos, posicion)
+
+    def acumular(self, datos):
+        """Suma al hash y al tamaño datos ya escritos con escribir_en, en orden."""
+        self.sha256.update(datos)
+        self.escritos += len(datos)
+
+    def descartar(self):
+        """Cierra y elimina el temporal."""
+        self._archivo.close()
+        self.temporal.unlink(missing_ok=True)
+
+    def confirmar(self, tamano_original=None):
+        """
+        Verifica tamaño y hash y, si coinciden, publica el archivo final.
+
+        Args:
+            tamano_original: Tamaño esperado en bytes, o None
+
+        Returns:
+            bool: True si el archivo final quedó creado
+        """
+        self._archivo.close()
+        if tamano_original is not None and self.escritos != tamano_original:
+            _fallo(
+                self.resultado,
+                f"Error: tamaño {self.escritos} bytes, cabecera indica {tamano_original}",
+            )
+            self.descartar()
+            return False
+
+        if self.hash_esperado:
+            print(f"[CHK] Verificando integridad...")
+            hash_calculado = self.sha256.hexdigest()
+            if hash_calculado != self.hash_esperado:
+                _fallo(self.resultado, "Hash NO coincide!")
+                print(f"      Esperado:  {self.hash_esperado}")
+                print(f"      Calculado: {hash_calculado}")
+                self.descartar()
+                return False
+            print(f"  [OK] Hash verificado correctamente")
+            print(f"  [OK] SHA-256: {hash_calculado[:16]}...")
+
+        os.replace(self.temporal, self.archivo_salida)
+        self.confirmado = True
+        if self.resultado is not None:
+            self.resultado["tamano"] = self.escritos
+            self.resultado["hash_verificado"] = bool(self.hash_esperado)
+        return True
+
+
+def nuevo_resultado(archivo):
+    """
+    Resultado de restaurar un .enc, tal como se informa al cliente (ver
+    modo_json y modo_worker)
+
+    Args:
+        archivo: Nombre del .enc
+
+    Returns:
+        dict: "archivo", "original" (nombre restaurado), "exito", "tamano"
+        (bytes restaurados), "ms" (duración del descifrado), "hash_verificado",
+        "copias" (copias idénticas creadas), "omitido" (ya estaba restaurado,
+        ver ya_restaurado) y "error" (texto o None)
+    """
+    return {
+        "archivo": archivo,
+        "original": None,
+        "exito": False,
+        "tamano": 0,
+        "ms": 0.0,
+        "hash_verificado": False,
+        "copias": 0,
+        "omitido": False,
+        "error": None,
+    }
+
+
+def _fallo(resultado, mensaje):
+    """Muestra un error y lo anota en ``resultado`` (si no es None). Devuelve False."""
+    print(f"  [X] {mensaje}")
+    if resultado is not None:
+        resultado["error"] = mensaje
+    return False
+
+
+def leer_cabecera(datos):
+    """
+    Interpreta la cabecera v2/v3 al inicio de un .enc
+
+    Args:
+        datos: Primeros bytes del archivo .enc
+
+    Returns:
+        tuple: (versión, flags, tamaño original, tamaño de bloque), o None si
+        los datos no empiezan con una cabecera válida
+    """
+    if len(datos) < CABECERA_V2.size or datos[:4] != MAGIC_V2:
+        return None
+    magic, version, flags, tamano_original, chunk = CABECERA_V2.unpack_from(datos)
+    if version not in VERSIONES_CABECERA:
+        return None
+    return version, flags, tamano_original, chunk
+
+
+def _descifrar_bloque(aead, prefijo, indice, datos, ultimo, aad):
+    nonce = prefijo + indice.to_bytes(4, "big") + (b"\x01" if ultimo else b"\x00")
+    try:
+        return aead.decrypt(nonce, datos, aad)
+    except InvalidTag:
+        raise ValueError(
+            f"bloque {indice}: autenticación fallida "
+            "(datos alterados, reordenados o truncados)"
+        ) from None
+
+
+def descifrar_por_bloques(
+    f, tamano, archivo_salida, cabecera, hash_esperado=None, resultado=None
+):
+    """
+    Descifra un .enc v3 (AES-256-GCM por bloques) en varios hilos
+
+    Formato: [Cabecera 18 bytes][Prefijo 7 bytes][Clave 32 bytes][Bloques]
+    Cada bloque mide tamaño de bloque + 16 bytes de tag (el último, menos).
+    Se lee y escribe bloque a bloque: la memoria no depende del tamaño.
+
+    Args:
+        f: .enc abierto (archivo o miembro de un ZIP), al inicio
+        tamano: Tamaño del .enc en bytes
+        archivo_salida: Archivo original a crear
+        cabecera: Resultado de leer_cabecera
+        hash_esperado: SHA-256 del .hash.txt, o None para no verificar
+        resultado: dict donde anotar el resultado (ver nuevo_resultado), o None
+
+    Returns:
+        bool: True si todos los bloques se autenticaron y el tamaño y el hash
+        coinciden
+    """
+    version, flags, tamano_original, chunk = cabecera
+    tamano_bloque = chunk + TAMANO_TAG
+
+    aad = f.read(CABECERA_V2.size)
+    prefijo = f.read(TAMANO_PREFIJO)
+    clave = f.read(32)
+    if len(prefijo) != TAMANO_PREFIJO or len(clave) != 32:
+        return _fallo(resultado, "Error: archivo v3 incompleto")
+
+    tamano_datos = tamano - f.tell()
+    n_bloques = max(1, -(-tamano_datos // tamano_bloque))
+    print(f"      Formato: v{version} (AES-GCM, bloques de {chunk} bytes)")
+    print(f"      Tamaño original: {tamano_original} bytes")
+    print(f"  [>>] Descifrando AES-256-GCM: {n_bloques} bloque(s), {HILOS_DESCIFRADO} hilo(s)...")
+
+    aead = AESGCM(clave)
+    descompresor = zlib.decompressobj() if flags & FLAG_ZLIB else None
+    en_curso = deque()
+
+    try:
+        with ThreadPoolExecutor(max_workers=HILOS_DESCIFRADO) as pool, SalidaVerificada(
+            archivo_salida, hash_esperado, resultado
+        ) as salida:
+
+            def escribir_siguiente():
+                datos = en_curso.popleft().result()
+                if descompresor:
+                    datos = descompresor.decompress(datos)
+                salida.escribir(datos)
+
+            for indice in range(n_bloques):
+                datos = f.read(tamano_bloque)
+                en_curso.append(
+                    pool.submit(
+                        _descifrar_bloque,
+                        aead,
+                        prefijo,
+                        indice,
+                        datos,
+                        indice == n_bloques - 1,
+                        aad,
+                    )
+                )
+                if len(en_curso) >= 2 * HILOS_DESCIFRADO:
+                    escribir_siguiente()
+            while en_curso:
+                escribir_siguiente()
 
-def descifrar_archivo(archivo_enc, archivo_salida):
+            if descompresor:
+                salida.escribir(descompresor.flush())
+            print(f"  [OK] {n_bloques} bloque(s) autenticado(s), en orden y completos")
+            if not salida.confirmar(tamano_original):
+                return False
+    except (ValueError, zlib.error) as e:
+        return _fallo(resultado, f"Error: {e}")
+
+    print(f"  [OK] Archivo descifrado: {archivo_salida}")
+    print(f"  [OK] Tamaño: {salida.escritos} bytes")
+    return True
+
+
+def descifrar_cbc(f, clave, iv, base64_, descompresor, salida):
+    """
+    Descifra en streaming los datos AES-256-CBC de ``f`` hacia ``salida``
+
+    Cada bloque leído pasa por AES, quitar padding PKCS7, Base64 (solo v1) y
+    zlib (si corresponde) sin acumular el archivo en memoria. Base64 decodifica
+    en grupos de 4 caracteres: lo que sobra de un bloque pasa al siguiente.
+
+    Args:
+        f: Archivo .enc abierto, posicionado al inicio de los datos cifrados
+        clave: Clave AES de 32 bytes
+        iv: Vector de inicialización de 16 bytes
+        base64_: True si los datos descifrados están en Base64 (v1)
+        descompresor: zlib.decompressobj(), o None sin compresión
+        salida: SalidaVerificada donde escribir el resultado
+
+    Raises:
+        ValueError: Si el padding, el Base64 o el flujo zlib no son válidos
+    """
+    decryptor = Cipher(algorithms.AES(clave), modes.CBC(iv), backend=default_backend()).decryptor()
+    unpadder = padding.PKCS7(128).unpadder()
+    resto = b""  # Base64 pendiente (menos de 4 caracteres)
+
+    def entregar(datos, final=False):
+        nonlocal resto
+        if base64_:
+            datos = resto + datos
+            corte = len(datos) if final else len(datos) - len(datos) % 4
+            resto = datos[corte:]
+            try:
+                datos = base64.b64decode(datos[:corte])
+            except binascii.Error as e:
+                raise ValueError(f"Base64 no válido: {e}") from None
+        if descompresor:
+            datos = descompresor.decompress(datos)
+            if final:
+                datos += descompresor.flush()
+                if not descompresor.eof:
+                    raise ValueError("flujo zlib incompleto")
+        salida.escribir(datos)
+
+    while bloque := f.read(TAMANO_LECTURA):
+        entregar(unpadder.update(decryptor.update(bloque)))
+    entregar(unpadder.update(decryptor.finalize()) + unpadder.finalize(), final=True)
+
+
+def descifrar_cbc_paralelo(fd, inicio, tamano_datos, clave, iv, base64_, salida, hilos=None):
+    """
+    Descifra AES-256-CBC por segmentos en varios hilos, leyendo con pread
+
+    En CBC cada bloque en claro depende solo de su bloque cifrado y del
+    anterior, así que cada segmento se descifra por separado usando como IV el
+    último bloque cifrado del segmento previo. Cada hilo escribe su resultado
+    en su posición del archivo de salida preasignado, y el SHA-256 se calcula
+    en orden a medida que terminan los segmentos.
+
+    El último segmento (con el padding PKCS7 y el final del Base64) se
+    descifra primero para conocer el tamaño de la salida.
+
+    Args:
+        fd: Descriptor del archivo con los datos cifrados (el .enc, o el ZIP
+            que lo contiene sin comprimir)
+        inicio: Posición de los datos cifrados en ``fd``
+        tamano_datos: Bytes de datos cifrados
+        clave: Clave AES de 32 bytes
+        iv: Vector de inicialización de 16 bytes
+        base64_: True si los datos descifrados están en Base64 (v1)
+        salida: SalidaVerificada donde escribir el resultado
+        hilos: Hilos de descifrado (por defecto, HILOS_DESCIFRADO)
+
+    Raises:
+        ValueError: Si los datos están truncados o el padding o el Base64 no
+            son válidos
     """
-     Descifra un archivo .enc y lo devuelve a su estado original
+    hilos = hilos or HILOS_DESCIFRADO
+    if not tamano_datos or tamano_datos % 16:
+        raise ValueError(f"datos cifrados incompletos ({tamano_datos} bytes, no múltiplo de 16)")
+    # El último segmento lleva siempre los dos últimos bloques: el final del
+    # Base64 ("=") puede caer en el penúltimo si el padding ocupa un bloque entero
+    n_segmentos = max(1, -(-(tamano_datos - 16) // TAMANO_SEGMENTO))
+
+    def posicion(indice):
+        desde = indice * TAMANO_SEGMENTO
+        return desde // 4 * 3 if base64_ else desde
+
+    def descifrar_segmento(indice):
+        ultimo = indice == n_segmentos - 1
+        desde = indice * TAMANO_SEGMENTO
+        hasta = tamano_datos if ultimo else desde + TAMANO_SEGMENTO
+        if indice == 0:
+            iv_segmento, cifrado = iv, os.pread(fd, hasta, inicio)
+        else:
+            datos = os.pread(fd, hasta - desde + 16, inicio + desde - 16)
+            iv_segmento, cifrado = datos[:16], datos[16:]
+        if len(cifrado) != hasta - desde:
+            raise ValueError(f"segmento {indice}: lectura incompleta")
+
+        decryptor = Cipher(
+            algorithms.AES(clave), modes.CBC(iv_segmento), backend=default_backend()
+        ).decryptor()
+        datos = decryptor.update(cifrado) + decryptor.finalize()
+        if ultimo:
+            unpadder = padding.PKCS7(128).unpadder()
+            datos = unpadder.update(datos) + unpadder.finalize()
+        if base64_:
+            try:
+                datos = base64.b64decode(datos, validate=True)
+            except binascii.Error as e:
+                raise ValueError(f"segmento {indice}: Base64 no válido: {e}") from None
+        if not ultimo and len(datos) != posicion(indice + 1) - posicion(indice):
+            raise ValueError(f"segmento {indice}: Base64 no válido (relleno intermedio)")
+        salida.escribir_en(posicion(indice), datos)
+        return datos
+
+    print(f"  [>>] Descifrando en paralelo: {n_segmentos} segmento(s), {hilos} hilo(s)...")
+
+    # Tamaño final = inicio del último segmento + su contenido sin padding
+    final = descifrar_segmento(n_segmentos - 1)
+    salida.reservar(posicion(n_segmentos - 1) + len(final))
+
+    en_curso = deque()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for indice in range(n_segmentos - 1):
+            en_curso.append(pool.submit(descifrar_segmento, indice))
+            if len(en_curso) >= 2 * hilos:
+                salida.acumular(en_curso.popleft().result())
+        while en_curso:
+            salida.acumular(en_curso.popleft().result())
+    salida.acumular(final)
+
+
+def _tiene_descriptor(f):
+    """True si ``f`` es un archivo del sistema (admite pread/fstat)."""
+    try:
+        f.fileno()
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def posicion_en_zip(zipf, info):
+    """
+    Posición de los datos de un miembro sin comprimir dentro del ZIP
+
+    Permite leer el miembro con pread sobre el descriptor del ZIP, sin
+    extraerlo (ver descifrar_cbc_paralelo).
+
+    Args:
+        zipf: ZipFile abierto sobre un archivo del sistema
+        info: ZipInfo del miembro
+
+    Returns:
+        int: Posición del primer byte del miembro en el ZIP, o None si está
+            comprimido, cifrado o el ZIP no es un archivo del sistema
+    """
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+        return None
+    if not _tiene_descriptor(zipf.fp):
+        return None
+    cabecera = os.pread(zipf.fp.fileno(), zipfile.sizeFileHeader, info.header_offset)
+    if len(cabecera) != zipfile.sizeFileHeader:
+        return None
+    # Cabecera local: [firma]...[largo del nombre][largo del campo extra]
+    firma, *_, largo_nombre, largo_extra = struct.unpack(zipfile.structFileHeader, cabecera)
+    if firma != zipfile.stringFileHeader:
+        return None
+    return info.header_offset + zipfile.sizeFileHeader + largo_nombre + largo_extra
+
+
+def descifrar_archivo(
+    archivo_enc,
+    archivo_salida,
+    compresion=None,
+    formato=None,
+    hash_esperado=None,
+    resultado=None,
+):
+    """
+    Descifra un archivo .enc y lo devuelve a su estado original
+
+    Ver descifrar_flujo.
+
+    Args:
+        archivo_enc: Archivo cifrado (.enc)
+        archivo_salida: Nombre del archivo original a crear
+        compresion: Valor de "Compresion:" en el .hash.txt, o None
+        formato: Valor de "Formato:" en el .hash.txt, o None para autodetectar
+        hash_esperado: Valor de "SHA-256:" en el .hash.txt, o None para no
+            verificar
+        resultado: dict donde anotar el resultado (ver nuevo_resultado), o None
+
+    Returns:
+        bool: True si el descifrado (y la verificación del hash) fue exitoso
+    """
+    try:
+        f = open(archivo_enc, "rb")
+    except OSError as e:
+        return _fallo(resultado, f"Error al abrir {archivo_enc}: {e}")
+    with f:
+        return descifrar_flujo(
+            f,
+            os.fstat(f.fileno()).st_size,
+            archivo_salida,
+            compresion,
+            formato,
+            hash_esperado,
+            resultado,
+            nombre=archivo_enc,
+        )
+
+
+def descifrar_flujo(
+    f,
+    tamano,
+    archivo_salida,
+    compresion=None,
+    formato=None,
+    hash_esperado=None,
+    resultado=None,
+    nombre=None,
+    ubicacion=None,
+):
+    """
+     Descifra un .enc abierto (archivo o miembro de un ZIP) y lo devuelve a
+     su estado original
 
      Formato del archivo .enc:
-     [IV 16 bytes][Clave 32 bytes][Datos cifrados]
+     v1: [IV 16 bytes][Clave 32 bytes][Datos cifrados]
+     v2: [Cabecera 18 bytes][IV 16 bytes][Clave 32 bytes][Datos cifrados]
+     v3: [Cabecera 18 bytes][Prefijo 7 bytes][Clave 32 bytes][Bloques AES-GCM]
+         (ver descifrar_por_bloques)
+
+    En v1 los datos cifrados contienen el archivo original codificado en Base64;
+    en v2 contienen los bytes originales. En ambos casos pueden estar comprimidos
+    con zlib (compresion="zlib" en v1, flag en la cabecera en v2).
+
+    Si no se indica el formato se detecta por la cabecera.
 
-    Los datos cifrados contienen el archivo original codificado en Base64
+    El archivo se procesa en bloques (ver descifrar_cbc y descifrar_por_bloques)
+    y el resultado se publica con SalidaVerificada: si el hash no coincide no
+    queda archivo de salida.
 
      Args:
-         archivo_enc: Archivo cifrado (.enc)
+         f: .enc abierto en binario, al inicio (debe admitir seek)
+         tamano: Tamaño del .enc en bytes
          archivo_salida: Nombre del archivo original a crear
+         compresion: Valor de "Compresion:" en el .hash.txt, o None
+         formato: Valor de "Formato:" en el .hash.txt, o None para autodetectar
+         hash_esperado: Valor de "SHA-256:" en el .hash.txt, o None para no
+             verificar
+         resultado: dict donde anotar tamaño, hash verificado o el error (ver
+             nuevo_resultado), o None
+         nombre: Nombre del .enc para los mensajes
+         ubicacion: (descriptor, posición) del .enc dentro de otro archivo,
+             ej: un miembro sin comprimir de un ZIP (ver posicion_en_zip)
 
      Returns:
-         bool: True si el descifrado fue exitoso
+         bool: True si el descifrado (y la verificación del hash) fue exitoso
     """
     try:
-        print(f"[PROC] Descifrando: {archivo_enc}")
+        print(f"[PROC] Descifrando: {nombre or archivo_salida}")
 
-        # Leer archivo cifrado (formato binario)
-        with open(archivo_enc, "rb") as f:
-            datos_completos = f.read()
+        # La cabecera indica el formato (v3: ver descifrar_por_bloques)
+        inicio = f.read(CABECERA_V2.size)
+        f.seek(0)
+        cabecera = leer_cabecera(inicio) if formato != "1" else None
+        if formato in ("2", "3") and (not cabecera or str(cabecera[0]) != formato):
+            return _fallo(resultado, f"Error: cabecera v{formato} no valida")
+        if cabecera and cabecera[0] == 3:
+            return descifrar_por_bloques(
+                f, tamano, archivo_salida, cabecera, hash_esperado, resultado
+            )
+
+        tamano_original = None
+        if cabecera:
+            version, flags, tamano_original, chunk = cabecera
+            compresion = "zlib" if flags & FLAG_ZLIB else None
+        if compresion and compresion != "zlib":
+            return _fallo(resultado, f"Compresion no soportada: {compresion}")
 
         print(f"  [>>] Leyendo estructura del archivo cifrado...")
-        print(f"      Tamaño total: {len(datos_completos)} bytes")
+        print(f"      Tamaño total: {tamano} bytes")
+        if cabecera:
+            f.seek(CABECERA_V2.size)
+            print(f"      Formato: v{version} (binario, bloques de {chunk} bytes)")
+            print(f"      Tamaño original: {tamano_original} bytes")
 
         # Extraer componentes según formato: [IV 16][Clave 32][Datos cifrados]
-        iv = datos_completos[:16]
-        clave = datos_completos[16:48]  # 16 + 32 = 48
-        datos_cifrados = datos_completos[48:]
+        iv = f.read(16)
+        clave = f.read(32)
 
         print(f"      IV: {len(iv)} bytes")
         print(f"      Clave: {len(clave)} bytes")
-        print(f"      Datos cifrados: {len(datos_cifrados)} bytes")
+        tamano_datos = tamano - f.tell()
+        print(f"      Datos cifrados: {tamano_datos} bytes")
 
         # Validar
         if len(iv) != 16:
-            print(f"  [X] Error: IV debe ser 16 bytes, encontrado {len(iv)}")
-            return False
+            return _fallo(resultado, f"Error: IV debe ser 16 bytes, encontrado {len(iv)}")
 
         if len(clave) != 32:
-            print(f"  [X] Error: Clave debe ser 32 bytes, encontrado {len(clave)}")
-            return False
-
-        print(f"  [>>] Descifrando AES-256-CBC...")
-
-        # Descifrar con AES
-        cipher = Cipher(algorithms.AES(clave), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        datos_descifrados = decryptor.update(datos_cifrados) + decryptor.finalize()
+            return _fallo(
+                resultado, f"Error: Clave debe ser 32 bytes, encontrado {len(clave)}"
+            )
 
-        # Remover padding PKCS7
-        padding_length = datos_descifrados[-1]
-        datos_base64 = datos_descifrados[:-padding_length]
+        pasos = ["AES-256-CBC"]
+        if not cabecera:
+            pasos.append("Base64")
+        if compresion:
+            pasos.append("zlib")
+        print(f"  [>>] Descifrando en streaming: {' -> '.join(pasos)}...")
 
-        print(f"  [>>] Decodificando Base64...")
+        # Archivos grandes sin zlib (que solo se descomprime en orden):
+        # segmentos en paralelo, leídos con pread del .enc o del ZIP que lo
+        # contiene sin comprimir. Un miembro comprimido se extrae antes a un
+        # temporal junto a la salida.
+        paralelo = (
+            not compresion
+            and HILOS_DESCIFRADO > 1
+            and tamano_datos >= UMBRAL_PARALELO
+            and hasattr(os, "pwrite")
+        )
 
-        # Decodificar Base64 para obtener archivo original
+        temporal = None
         try:
-            datos_originales = base64.b64decode(datos_base64)
-        except Exception as e:
-            print(f"  [X] Error al decodificar Base64: {e}")
-            return False
-
-        # Guardar archivo original
-        with open(archivo_salida, "wb") as f:
-            f.write(datos_originales)
+            with SalidaVerificada(archivo_salida, hash_esperado, resultado) as salida:
+                if paralelo:
+                    if ubicacion:
+                        fd, inicio_datos = ubicacion[0], ubicacion[1] + f.tell()
+                    elif _tiene_descriptor(f):
+                        fd, inicio_datos = f.fileno(), f.tell()
+                    else:
+                        print(f"  [>>] Extrayendo los datos cifrados a un temporal...")
+                        temporal = tempfile.TemporaryFile(dir=Path(archivo_salida).parent)
+                        shutil.copyfileobj(f, temporal, TAMANO_LECTURA)
+                        fd, inicio_datos = temporal.fileno(), 0
+                    descifrar_cbc_paralelo(
+                        fd, inicio_datos, tamano_datos, clave, iv, not cabecera, salida
+                    )
+                else:
+                    descifrar_cbc(
+                        f,
+                        clave,
+                        iv,
+                        not cabecera,
+                        zlib.decompressobj() if compresion else None,
+                        salida,
+                    )
+                if not salida.confirmar(tamano_original):
+                    return False
+        except (ValueError, zlib.error) as e:
+            return _fallo(resultado, f"Error: {e}")
+        finally:
+            if temporal:
+                temporal.close()
 
         print(f"  [OK] Archivo descifrado: {archivo_salida}")
-        print(f"  [OK] Tamaño: {len(datos_originales)} bytes")
+        print(f"  [OK] Tamaño: {salida.escritos} bytes")
 
         return True
 
     except Exception as e:
-        print(f"  [X] Error al descifrar: {e}")
+        _fallo(resultado, f"Error al descifrar: {e}")
         import traceback
 
         traceback.print_exc()
         return False
 
 
-def verificar_hash(archivo, archivo_hash):
+def leer_sidecar(archivo_hash):
     """
-    Verifica el hash SHA-256 del archivo
+    Lee los campos "Clave: valor" de un archivo .hash.txt
+
+    Las líneas "Duplicado: <nombre>" (una por copia idéntica deduplicada por
+    el cliente) se reúnen en la lista campos["Duplicados"].
 
     Args:
-        archivo: Archivo a verificar
-        archivo_hash: Archivo .hash.txt con el hash esperado
+        archivo_hash: Archivo .hash.txt generado por el cliente
 
     Returns:
-        bool: True si el hash coincide
+        dict: Campos encontrados (vacío si el archivo no existe o no se puede leer)
     """
     try:
-        print(f"[CHK] Verificando integridad...")
-
-        # Leer hash esperado
         with open(archivo_hash, "r") as f:
-            contenido = f.read()
+            return campos_sidecar(f)
+    except OSError:
+        return {"Duplicados": []}
 
-        # Extraer hash (formato: "SHA-256: <hash>")
-        hash_esperado = None
-        for linea in contenido.split("\n"):
-            if linea.startswith("SHA-256:"):
-                hash_esperado = linea.split(":", 1)[1].strip()
-                break
 
-        if not hash_esperado:
-            print(f"  [!] No se pudo extraer hash del archivo")
-            return False
+def campos_sidecar(lineas):
+    """Campos de las líneas de un .hash.txt (ver leer_sidecar)."""
+    campos = {"Duplicados": []}
+    for linea in lineas:
+        if ":" in linea:
+            clave, valor = linea.split(":", 1)
+            if clave.strip() == "Duplicado":
+                campos["Duplicados"].append(valor.strip())
+            else:
+                campos[clave.strip()] = valor.strip()
+    return campos
 
-        # Calcular hash del archivo
-        sha256 = hashlib.sha256()
-        with open(archivo, "rb") as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        hash_calculado = sha256.hexdigest()
 
-        if hash_calculado == hash_esperado:
-            print(f"  [OK] Hash verificado correctamente")
-            print(f"  [OK] SHA-256: {hash_calculado[:16]}...")
-            return True
-        else:
-            print(f"  [X] Hash NO coincide!")
-            print(f"      Esperado:  {hash_esperado}")
-            print(f"      Calculado: {hash_calculado}")
-            return False
+def restaurar_duplicados(archivo_salida, nombres):
+    """
+    Crea las copias idénticas que el cliente deduplicó antes de cifrar
 
-    except Exception as e:
-        print(f"  [X] Error al verificar hash: {e}")
+    Args:
+        archivo_salida: Archivo ya descifrado y verificado
+        nombres: Nombres de las copias (en el mismo directorio)
+
+    Returns:
+        int: Cantidad de copias creadas
+    """
+    creadas = 0
+    for nombre in nombres:
+        # Solo nombres simples: nunca escribir fuera del directorio
+        if not nombre or Path(nombre).name != nombre:
+            print(f"  [!] Nombre de copia no válido, se omite: {nombre}")
+            continue
+        with open(archivo_salida, "rb") as origen:
+            publicar(archivo_salida.parent / nombre, lambda f: shutil.copyfileobj(origen, f))
+        print(f"  [OK] Copia idéntica restaurada: {nombre}")
+        creadas += 1
+    return creadas
+
+
+def archivo_marca(archivo_salida):
+    """Marcador de restauración completa de ``archivo_salida`` (.<nombre>.completo)."""
+    archivo_salida = Path(archivo_salida)
+    return archivo_salida.with_name(f".{archivo_salida.name}.completo")
+
+
+def marcar_completo(archivo_salida, hash_verificado):
+    """
+    Registra que ``archivo_salida`` quedó restaurado con ``hash_verificado``
+
+    El marcador guarda el hash y el tamaño y la fecha de modificación del
+    archivo, para reconocerlo después sin volver a leerlo (ver ya_restaurado).
+    """
+    stat = Path(archivo_salida).stat()
+    contenido = (
+        f"SHA-256: {hash_verificado}\n"
+        f"Tamano: {stat.st_size}\n"
+        f"Modificado: {stat.st_mtime_ns}\n"
+    )
+    publicar(archivo_marca(archivo_salida), lambda f: f.write(contenido.encode("utf-8")))
+
+
+def ya_restaurado(archivo_salida, hash_esperado):
+    """
+    True si ``archivo_salida`` ya existe con el SHA-256 ``hash_esperado``
+
+    Con un marcador vigente (mismo hash, tamaño y fecha de modificación) no se
+    lee el archivo. Sin marcador, o si el archivo cambió, se calcula su hash:
+    si coincide (ej: ejecución interrumpida justo después de publicarlo) se
+    escribe el marcador.
+
+    Args:
+        archivo_salida: Archivo original restaurado
+        hash_esperado: SHA-256 del .hash.txt, o None (entonces nunca se omite)
+
+    Returns:
+        bool: True si el archivo puede omitirse
+    """
+    archivo_salida = Path(archivo_salida)
+    if not hash_esperado:
+        return False
+    try:
+        stat = archivo_salida.stat()
+    except OSError:
+        return False
+
+    marca = leer_sidecar(archivo_marca(archivo_salida))
+    if marca.get("SHA-256") == hash_esperado and (
+        marca.get("Tamano"), marca.get("Modificado")
+    ) == (str(stat.st_size), str(stat.st_mtime_ns)):
+        return True
+
+    sha256 = hashlib.sha256()
+    try:
+        with open(archivo_salida, "rb") as f:
+            while bloque := f.read(TAMANO_LECTURA):
+                sha256.update(bloque)
+    except OSError:
+        return False
+    if sha256.hexdigest() != hash_esperado:
         return False
+    marcar_completo(archivo_salida, hash_esperado)
+    return True
 
 
-def procesar_directorio(directorio):
+class MiembroZip(namedtuple("MiembroZip", "archivo_zip miembro directorio")):
+    """Un .enc dentro de un ZIP subido, que se descifra sin extraerlo en ``directorio``."""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return PurePosixPath(self.miembro).name
+
+
+def directorio_de_zip(archivo_zip):
+    """Directorio donde se restauran los archivos de un ZIP (su nombre sin .zip)."""
+    archivo_zip = Path(archivo_zip)
+    return archivo_zip.with_name(archivo_zip.name.replace(".zip", ""))
+
+
+def procesar_enc(archivo_enc):
+    """
+    Descifra, verifica y restaura un archivo .enc
+
+    Args:
+        archivo_enc: Archivo cifrado (.enc) junto a su .hash.txt, o MiembroZip
+
+    Returns:
+        dict: Resultado del archivo (ver nuevo_resultado)
+    """
+    if isinstance(archivo_enc, MiembroZip):
+        return _procesar_miembro_zip(archivo_enc)
+
+    archivo_enc = Path(archivo_enc)
+    archivo_hash = archivo_enc.parent / f"{archivo_enc.stem}.hash.txt"
+    return _restaurar(
+        archivo_enc.parent,
+        archivo_enc.stem,
+        leer_sidecar(archivo_hash),
+        archivo_hash.exists(),
+        lambda archivo_salida, *opciones: descifrar_archivo(archivo_enc, archivo_salida, *opciones),
+    )
+
+
+def _procesar_miembro_zip(origen):
+    """procesar_enc de un .enc leído directamente del ZIP, sin extraerlo."""
+    miembro = PurePosixPath(origen.miembro)
+    nombre_base = miembro.stem
+    nombre_hash = str(miembro.with_name(f"{nombre_base}.hash.txt"))
+
+    with zipfile.ZipFile(origen.archivo_zip) as zipf:
+        tiene_hash = nombre_hash in zipf.NameToInfo
+        sidecar = (
+            campos_sidecar(zipf.read(nombre_hash).decode("utf-8").splitlines())
+            if tiene_hash
+            else {"Duplicados": []}
+        )
+        info = zipf.getinfo(origen.miembro)
+        posicion = posicion_en_zip(zipf, info)
+
+        def descifrar(archivo_salida, *opciones):
+            with zipf.open(info) as f:
+                return descifrar_flujo(
+                    f,
+                    info.file_size,
+                    archivo_salida,
+                    *opciones,
+                    nombre=f"{Path(origen.archivo_zip).name}:{origen.miembro}",
+                    ubicacion=None if posicion is None else (zipf.fp.fileno(), posicion),
+                )
+
+        return _restaurar(Path(origen.directorio), nombre_base, sidecar, tiene_hash, descifrar)
+
+
+def _restaurar(directorio, nombre_base, sidecar, tiene_hash, descifrar):
+    """
+    Restaura un .enc en ``directorio`` según su .hash.txt
+
+    Args:
+        directorio: Directorio de salida
+        nombre_base: Nombre del .enc sin extensión
+        sidecar: Campos del .hash.txt (ver leer_sidecar)
+        tiene_hash: True si el .hash.txt existe
+        descifrar: Función (archivo_salida, compresion, formato, hash_esperado,
+            resultado) que descifra el .enc y devuelve True si tuvo éxito
+
+    Returns:
+        dict: Resultado del archivo (ver nuevo_resultado)
+    """
+    resultado = nuevo_resultado(f"{nombre_base}.enc")
+
+    # Obtener nombre original con extensión y formato desde hash.txt
+    nombre_original = sidecar.get("Archivo")
+
+    # Si se pudo obtener el nombre original, usarlo
+    if nombre_original:
+        archivo_salida = directorio / nombre_original
+        print(f"[INFO] Nombre original: {nombre_original}")
+    else:
+        archivo_salida = directorio / nombre_base
+        print(f"[!] No se pudo determinar nombre original, usando: {nombre_base}")
+    resultado["original"] = archivo_salida.name
+
+    hash_esperado = sidecar.get("SHA-256")
+    if tiene_hash and not hash_esperado:
+        print(f"  [!] No se pudo extraer hash de {nombre_base}.hash.txt, se omite")
+        resultado["error"] = f"sin SHA-256 en {nombre_base}.hash.txt"
+        return resultado
+
+    # Restaurado y verificado en una ejecución anterior: solo faltan, si
+    # acaso, las copias idénticas que no llegaron a crearse
+    if REANUDAR and ya_restaurado(archivo_salida, hash_esperado):
+        print(f"  [OK] Ya restaurado y verificado, se omite: {archivo_salida.name}")
+        resultado.update(
+            exito=True,
+            omitido=True,
+            tamano=archivo_salida.stat().st_size,
+            hash_verificado=True,
+        )
+        faltantes = [
+            nombre
+            for nombre in sidecar["Duplicados"]
+            if not (archivo_salida.parent / Path(nombre).name).exists()
+        ]
+        resultado["copias"] = restaurar_duplicados(archivo_salida, faltantes)
+        return resultado
+
+    # Descifrar verificando el hash mientras se escribe: con hash
+    # incorrecto no se crea el archivo de salida
+    inicio = time.perf_counter()
+    exito = descifrar(
+        archivo_salida,
+        sidecar.get("Compresion"),
+        sidecar.get("Formato"),
+        hash_esperado,
+        resultado,
+    )
+    resultado["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    if not exito:
+        if hash_esperado:
+            print(f"  [!] Archivo no restaurado (descifrado o hash no válido)")
+        resultado["error"] = resultado["error"] or "descifrado no válido"
+        return resultado
+
+    resultado["exito"] = True
+    if not hash_esperado:
+        print(f"  [!] No hay archivo hash para verificar")
+        return resultado
+
+    marcar_completo(archivo_salida, hash_esperado)
+    print(f"  [***] Archivo restaurado exitosamente")
+    resultado["copias"] = restaurar_duplicados(archivo_salida, sidecar["Duplicados"])
+    return resultado
+
+
+def _procesar_enc_capturando(archivo_enc):
+    """
+    procesar_enc en un worker: devuelve su salida de consola en lugar de
+    imprimirla, para mostrarla completa y sin mezclarse con la de otros workers.
+
+    Returns:
+        tuple: (resultado del archivo, texto de salida)
+    """
+    salida = io.StringIO()
+    with redirect_stdout(salida), redirect_stderr(salida):
+        try:
+            resultado = procesar_enc(archivo_enc)
+        except Exception as e:
+            print(f"  [X] Error inesperado: {e}")
+            resultado = nuevo_resultado(archivo_enc.name)
+            resultado["error"] = f"Error inesperado: {e}"
+    return resultado, salida.getvalue()
+
+
+def _configurar_worker(hilos, reanudar):
+    """Initializer del pool: reparte los hilos de v3 entre los workers."""
+    global HILOS_DESCIFRADO, REANUDAR
+    HILOS_DESCIFRADO = hilos
+    REANUDAR = reanudar
+
+
+def procesar_directorio(directorio, workers=1, al_terminar=None):
     """
     Procesa todos los archivos .enc en un directorio
 
+    Con ``workers`` > 1 los archivos se descifran en paralelo en un pool de
+    procesos. La salida de cada archivo se muestra completa, en el orden de
+    los archivos, a medida que terminan.
+
     Args:
         directorio: Directorio con archivos extraídos
+        workers: Procesos de descifrado (0 = uno por CPU)
+        al_terminar: Función llamada con el resultado de cada archivo (ver
+            nuevo_resultado) al terminarlo
+
+    Returns:
+        list: Archivos .enc que no se pudieron restaurar
     """
     directorio = Path(directorio)
 
     if not directorio.exists():
         print(f"[X] Directorio no existe: {directorio}")
-        return
+        return []
 
     print("\n" + "=" * 60)
     print("DESENCRIPTACION AUTOMATICA - SERVIDOR ESICORP")
@@ -165,68 +1049,317 @@ def procesar_directorio(directorio):
     print()
 
     # Buscar archivos .enc
-    archivos_enc = list(directorio.glob("*.enc"))
+    return _procesar_origenes(sorted(directorio.glob("*.enc")), workers, al_terminar)
+
+
+def procesar_zip(archivo_zip, workers=1, al_terminar=None, destino=None):
+    """
+    Descifra los .enc de un ZIP subido sin extraerlos
+
+    Cada .enc se lee del ZIP en streaming y se descifra directamente al
+    archivo final, en ``<ZIP sin .zip>/``, junto con los demás miembros
+    (.hash.txt, metadata, índice del lote). No hace falta unzip y los .enc
+    no pasan por el disco: los grandes se descifran en paralelo leyendo por
+    posición del propio ZIP (ver posicion_en_zip). Solo un .enc grande
+    guardado con compresión se extrae antes a un temporal.
+
+    Args:
+        archivo_zip: ZIP individual o contenedor de lote
+        workers: Procesos de descifrado (0 = uno por CPU)
+        al_terminar: Ver procesar_directorio
+        destino: Directorio de salida en lugar de ``<ZIP sin .zip>/`` (ej: el
+            de un ZIP anterior, al reenviar solo los .enc que fallaron)
+
+    Returns:
+        list: Archivos .enc que no se pudieron restaurar
+    """
+    archivo_zip = Path(archivo_zip)
+    directorio = Path(destino) if destino else directorio_de_zip(archivo_zip)
+
+    print("\n" + "=" * 60)
+    print("DESENCRIPTACION AUTOMATICA - SERVIDOR ESICORP")
+    print("=" * 60)
+    print(f"[INFO] ZIP: {archivo_zip}")
+    print(f"[INFO] Directorio de salida: {directorio}")
+    print()
+
+    origenes = []
+    try:
+        with zipfile.ZipFile(archivo_zip) as zipf:
+            directorio.mkdir(exist_ok=True)
+            for info in zipf.infolist():
+                if info.is_dir():
+                    continue
+                if info.filename.endswith(".enc"):
+                    origenes.append(MiembroZip(str(archivo_zip), info.filename, str(directorio)))
+                elif PurePosixPath(info.filename).name != info.filename:
+                    # Solo nombres simples: nunca escribir fuera del directorio
+                    print(f"[!] Miembro no válido, se omite: {info.filename}")
+                else:
+                    with zipf.open(info) as origen:
+                        publicar(
+                            directorio / info.filename,
+                            lambda f: shutil.copyfileobj(origen, f),
+                        )
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"[X] No se pudo leer el ZIP: {e}")
+        return [archivo_zip.name]
 
+    return _procesar_origenes(sorted(origenes), workers, al_terminar)
+
+
+def procesar_ruta(ruta, workers=1, al_terminar=None, destino=None):
+    """procesar_zip si ``ruta`` es un .zip; si no, procesar_directorio."""
+    if str(ruta).endswith(".zip"):
+        return procesar_zip(ruta, workers, al_terminar, destino)
+    return procesar_directorio(ruta, workers, al_terminar)
+
+
+def _procesar_origenes(archivos_enc, workers, al_terminar):
+    """
+    Restaura una lista de .enc (Path o MiembroZip) y muestra el resumen
+
+    Returns:
+        list: Nombres de los .enc que no se pudieron restaurar
+    """
     if not archivos_enc:
         print("[i] No se encontraron archivos cifrados (.enc)")
-        return
+        return []
 
     print(f"[INFO] Encontrados {len(archivos_enc)} archivo(s) cifrado(s)")
+    workers = min(workers or os.cpu_count() or 1, len(archivos_enc))
+    if workers > 1:
+        print(f"[INFO] Descifrando con {workers} procesos")
     print()
 
     exitos = 0
-    for archivo_enc in archivos_enc:
-        # Determinar nombre del archivo original
-        nombre_base = archivo_enc.stem
-        archivo_hash = directorio / f"{nombre_base}.hash.txt"
-
-        # Obtener nombre original con extensión desde hash.txt
-        nombre_original = None
-        if archivo_hash.exists():
-            try:
-                with open(archivo_hash, "r") as f:
-                    contenido = f.read()
-                for linea in contenido.split("\n"):
-                    if linea.startswith("Archivo:"):
-                        nombre_original = linea.split(":", 1)[1].strip()
-                        break
-            except:
-                pass
-
-        # Si se pudo obtener el nombre original, usarlo
-        if nombre_original:
-            archivo_salida = directorio / nombre_original
-            print(f"[INFO] Nombre original: {nombre_original}")
-        else:
-            archivo_salida = directorio / nombre_base
-            print(f"[!] No se pudo determinar nombre original, usando: {nombre_base}")
-
-        # Descifrar
-        if descifrar_archivo(archivo_enc, archivo_salida):
-            # Verificar hash si existe
-            if archivo_hash.exists():
-                if verificar_hash(archivo_salida, archivo_hash):
-                    exitos += 1
-                    print(f"  [***] Archivo restaurado exitosamente")
-                else:
-                    print(f"  [!] Archivo descifrado pero hash no coincide")
-                    # Eliminar archivo con hash incorrecto
-                    archivo_salida.unlink()
-            else:
-                print(f"  [!] No hay archivo hash para verificar")
-                exitos += 1
+    omitidos = 0
+    copias = 0
+    fallidos = []
 
+    def registrar(resultado):
+        nonlocal exitos, omitidos, copias
         print()
+        if al_terminar:
+            al_terminar(resultado)
+        if resultado["exito"]:
+            exitos += 1
+            omitidos += resultado["omitido"]
+            copias += resultado["copias"]
+        else:
+            fallidos.append(resultado["archivo"])
+
+    if workers > 1:
+        hilos = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_configurar_worker, initargs=(hilos, REANUDAR)
+        ) as pool:
+            for resultado, texto in pool.map(_procesar_enc_capturando, archivos_enc):
+                print(texto, end="", flush=True)
+                registrar(resultado)
+    else:
+        for archivo_enc in archivos_enc:
+            registrar(procesar_enc(archivo_enc))
 
     print("=" * 60)
     print(f"[OK] Procesados: {exitos}/{len(archivos_enc)} archivos")
+    if omitidos:
+        print(f"[OK] Ya restaurados en una ejecución anterior (omitidos): {omitidos}")
+    if copias:
+        print(f"[OK] Copias idénticas restauradas: {copias}")
+    if fallidos:
+        print(f"[X] No restaurados: {', '.join(fallidos)}")
     print("=" * 60)
+    return fallidos
+
+
+def _descifrar_capturando(ruta, workers, al_terminar, destino, consola):
+    """
+    procesar_ruta con la consola redirigida a ``consola``
+
+    Returns:
+        tuple: (True si la ruta existe y se restauraron todos los .enc,
+        nombres de los .enc no restaurados)
+    """
+    with redirect_stdout(consola), redirect_stderr(consola):
+        try:
+            fallidos = procesar_ruta(ruta, workers, al_terminar, destino)
+            return Path(ruta).exists() and not fallidos, fallidos
+        except Exception as e:
+            print(f"[X] Error inesperado: {e}")
+            return False, []
+
+
+def modo_json(ruta, workers=1, destino=None, salida=None):
+    """
+    Descifra ``ruta`` informando el resultado en JSON Lines (--json)
+
+    stdout lleva solo registros JSON, uno por línea; la consola de cada
+    archivo viaja en su registro:
+        {"tipo": "archivo", ...resultado (ver nuevo_resultado)..., "salida": texto}
+        (uno por .enc, a medida que terminan)
+        {"tipo": "fin", "ok": ..., "fallidos": [...], "salida": resumen}
+
+    Args:
+        ruta: ZIP o directorio (ver procesar_ruta)
+        workers: Procesos de descifrado (ver procesar_directorio)
+        destino: Directorio de salida del ZIP (ver procesar_zip)
+        salida: Flujo de texto de los registros (por defecto, stdout)
+
+    Returns:
+        bool: True si se restauraron todos los .enc
+    """
+    salida = salida or sys.stdout
+    consola = io.StringIO()
+
+    def emitir(registro):
+        registro["salida"] = consola.getvalue()
+        consola.seek(0)
+        consola.truncate()
+        salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        salida.flush()
+
+    ok, fallidos = _descifrar_capturando(
+        ruta,
+        workers,
+        lambda resultado: emitir({"tipo": "archivo", **resultado}),
+        destino,
+        consola,
+    )
+    emitir({"tipo": "fin", "ok": ok, "fallidos": fallidos})
+    return ok
+
+
+# Modo worker (--worker): un proceso por sesión SSH que recibe trabajos por
+# stdin y responde por stdout, sin pagar el arranque de python3 en cada ZIP.
+# Cada mensaje es [longitud 4 bytes big-endian][JSON UTF-8]
+# (ver src/worker_remoto.py, el lado cliente):
+#   <- {"tipo": "listo", "version": 3}                   al iniciar
+#   -> {"id": n, "accion": "descifrar", "ruta": directorio o .zip,
+#       "destino": directorio de salida o null}
+#   <- {"id": n, "tipo": "archivo", ...resultado (ver nuevo_resultado)}
+#      (uno por .enc, a medida que terminan)
+#   <- {"id": n, "tipo": "fin", "ok": ..., "fallidos": [...], "salida": texto}
+#   -> {"accion": "salir"}                               (o cerrar stdin)
+LONGITUD_MENSAJE = struct.Struct(">I")
+VERSION_PROTOCOLO = 3
+
+
+def leer_mensaje(entrada):
+    """
+    Lee un mensaje del protocolo del modo worker
+
+    Args:
+        entrada: Flujo binario
+
+    Returns:
+        dict: Mensaje, o None si el flujo terminó
+    """
+    cabecera = entrada.read(LONGITUD_MENSAJE.size)
+    if len(cabecera) < LONGITUD_MENSAJE.size:
+        return None
+    (longitud,) = LONGITUD_MENSAJE.unpack(cabecera)
+    datos = entrada.read(longitud)
+    if len(datos) < longitud:
+        return None
+    return json.loads(datos.decode("utf-8"))
+
+
+def escribir_mensaje(salida, mensaje):
+    """Escribe un mensaje del protocolo del modo worker en un flujo binario."""
+    datos = json.dumps(mensaje, ensure_ascii=False).encode("utf-8")
+    salida.write(LONGITUD_MENSAJE.pack(len(datos)) + datos)
+    salida.flush()
+
+
+def modo_worker(workers=1, entrada=None, salida=None):
+    """
+    Atiende trabajos de descifrado hasta recibir "salir" o fin de stdin
+
+    La consola de cada trabajo se captura y viaja en el mensaje "fin"; stdout
+    queda reservado para los mensajes.
+
+    Args:
+        workers: Procesos de descifrado por trabajo (ver procesar_directorio)
+        entrada: Flujo binario de mensajes (por defecto, stdin)
+        salida: Flujo binario de respuestas (por defecto, stdout)
+    """
+    entrada = entrada or sys.stdin.buffer
+    salida = salida or sys.stdout.buffer
+    escribir_mensaje(salida, {"tipo": "listo", "version": VERSION_PROTOCOLO})
+
+    while (mensaje := leer_mensaje(entrada)) is not None:
+        accion = mensaje.get("accion")
+        if accion == "salir":
+            break
+        id_ = mensaje.get("id")
+        if accion != "descifrar":
+            escribir_mensaje(
+                salida,
+                {"id": id_, "tipo": "fin", "ok": False, "fallidos": [],
+                 "salida": f"[X] Acción desconocida: {accion}"},
+            )
+            continue
+
+        def informar(resultado):
+            escribir_mensaje(salida, {"id": id_, "tipo": "archivo", **resultado})
+
+        consola = io.StringIO()
+        ok, fallidos = _descifrar_capturando(
+            mensaje.get("ruta"), workers, informar, mensaje.get("destino"), consola
+        )
+        escribir_mensaje(
+            salida,
+            {"id": id_, "tipo": "fin", "ok": ok, "fallidos": fallidos,
+             "salida": consola.getvalue()},
+        )
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso: python3 decrypt_esicorp.py <directorio>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Descifra y verifica los archivos .enc de un directorio"
+    )
+    parser.add_argument(
+        "ruta", nargs="?", help="ZIP subido o directorio con archivos .enc extraídos"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Archivos descifrados en paralelo (0 = uno por CPU, default: 1)",
+    )
+    parser.add_argument(
+        "--destino",
+        metavar="DIR",
+        help="Directorio de salida de un ZIP (default: el nombre del ZIP sin .zip)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Informa un registro JSON por archivo en stdout (ver modo_json)",
+    )
+    parser.add_argument(
+        "--forzar",
+        action="store_true",
+        help="Descifra de nuevo aunque el archivo ya esté restaurado y verificado",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Modo worker: recibe trabajos por stdin (ver modo_worker)",
+    )
+    args = parser.parse_args()
+    if args.workers < 0:
+        parser.error("--workers debe ser 0 o mayor")
+    REANUDAR = not args.forzar
 
-    directorio = sys.argv[1]
-    procesar_directorio(directorio)
+    if args.worker:
+        modo_worker(args.workers)
+    elif not args.ruta:
+        parser.error("indique un ZIP, un directorio o --worker")
+    elif args.json:
+        sys.exit(0 if modo_json(args.ruta, args.workers, args.destino) else 1)
+    else:
+        fallidos = procesar_ruta(args.ruta, args.workers, destino=args.destino)
+        sys.exit(0 if Path(args.ruta).exists() and not fallidos else 1)
@@ -11,10 +11,23 @@ from src.utils import print_banner, print_error, print_info
 class ESICORPApp:
     """Aplicación ESICORP - Transferencia segura vía SFTP/SSH."""
 
-    def __init__(self):
-        self.sftp_mgr = SFTPManager(keys_dir=config.KEYS_DIR)
+    def __init__(
+        self,
+        workers_remoto=config.DECRYPT_WORKERS_REMOTO,
+        worker_residente=config.DECRYPT_WORKER_RESIDENTE,
+        reintentos_remoto=config.DECRYPT_REINTENTOS,
+        **opciones_procesador,
+    ):
+        self.sftp_mgr = SFTPManager(
+            keys_dir=config.KEYS_DIR,
+            workers_remoto=workers_remoto,
+            worker_residente=worker_residente,
+            reintentos_remoto=reintentos_remoto,
+        )
         self.processor = ESICORPProcessor(
-            salida_dir=config.SALIDA_DIR, procesados_dir=config.PROCESADOS_DIR
+            salida_dir=config.SALIDA_DIR,
+            procesados_dir=config.PROCESADOS_DIR,
+            **opciones_procesador,
         )
 
     # ==========================================
@@ -80,6 +93,7 @@ class ESICORPApp:
         else:
             # Procesar desde ./salida
             archivos_procesados = self.processor.procesar_todos()
+        self.processor.cerrar_metricas()
 
         if not archivos_procesados:
             print_info("No hay archivos para enviar.")
@@ -142,6 +156,7 @@ class ESICORPApp:
             for zip_file in archivos_procesados:
                 remote_file = remote_path + zip_file.name
                 if self.sftp_mgr.subir_archivo(sftp_client, zip_file, remote_file):
+                    self.processor.marcar_subido(zip_file)
                     exitosos += 1
 
             print("\n" + "=" * 60)
@@ -154,6 +169,7 @@ class ESICORPApp:
                 print("\n[***] ¡PROCESO COMPLETADO EXITOSAMENTE!")
 
         finally:
+            self.processor.guardar_manifiesto()
             self.sftp_mgr.cerrar_conexion(sftp_client, ssh_client)
 
         input("\nPresione Enter para continuar...")
@@ -436,7 +452,35 @@ if __name__ == "__main__":
         parser = crear_parser()
         args = parser.parse_args()
 
-        app = ESICORPApp()
+        if args.max_memory:
+            from src import memoria
+
+            memoria.configurar(args.max_memory)
+            print_info(f"Presupuesto de memoria: {args.max_memory / (1024 * 1024):,.0f} MB")
+
+        app = ESICORPApp(
+            jobs=args.jobs,
+            executor=args.executor,
+            max_bytes_en_vuelo=args.max_en_vuelo * 1024 * 1024,
+            compresion=args.comprimir,
+            formato=args.formato,
+            incremental=not args.forzar,
+            deduplicar=not args.sin_dedup,
+            metricas_out=args.metrics_out,
+            orden=args.orden,
+            areas_prioritarias=args.prioridad_area,
+            workers_remoto=args.workers_remoto,
+            worker_residente=not args.sin_worker_remoto,
+            reintentos_remoto=args.reintentos_remoto,
+            recursivo=args.recursivo,
+            lote=args.lote,
+            filtros={
+                "area": args.area,
+                "sede": args.sede,
+                "desde": args.desde,
+                "hasta": args.hasta,
+            },
+        )
 
         # Modo Interactivo
         if args.interactivo:
@@ -455,41 +499,136 @@ if __name__ == "__main__":
                     print_error("No se pudieron generar las llaves.")
                     sys.exit(1)
 
-            # Procesar archivos
-            archivos_procesados = app.processor.procesar_todos()
-            if not archivos_procesados:
-                print_info("No hay archivos para procesar.")
-                sys.exit(0)
-
             # Configuración SFTP
             hostname = args.sftp_host or config.SFTP_CONFIG["hostname"]
             username = args.sftp_user or config.SFTP_CONFIG["username"]
             port = args.sftp_port or config.SFTP_CONFIG["port"]
             remote_path = args.sftp_path or config.SFTP_CONFIG["remote_path"]
 
-            # Conectar y enviar
-            sftp_client, ssh_client = app.sftp_mgr.conectar_sftp(
-                hostname=hostname, username=username, port=port
-            )
+            from src.enrutamiento import Destino, agrupar_por_destino, enviar_a_destinos
+
+            por_defecto = Destino(hostname, port, username, remote_path)
 
-            if not sftp_client:
-                print_error("No se pudo establecer conexión SFTP.")
+            # Pipeline: proceso, subida y descifrado remoto solapados
+            if args.pipeline:
+                if args.lote:
+                    print_error("--pipeline no es compatible con --lote.")
+                    sys.exit(1)
+
+                from src.pipeline import PipelineEnvio
+
+                seleccion = app.processor.seleccionar_archivos()
+                if seleccion is None or not any(seleccion):
+                    print_info("No hay archivos para procesar.")
+                    sys.exit(0)
+
+                pipeline = PipelineEnvio(
+                    app.processor,
+                    app.sftp_mgr,
+                    por_defecto,
+                    hilos_subida=args.hilos_subida,
+                    hilos_remoto=args.hilos_remoto,
+                    capacidad=args.cola,
+                )
+                terminados = pipeline.ejecutar(*seleccion)
+                app.processor.cerrar_metricas()
+
+                if all(trabajo.subido and trabajo.descifrado for trabajo in terminados):
+                    print("\n[***] ¡PROCESO COMPLETADO EXITOSAMENTE!")
+                    sys.exit(0)
                 sys.exit(1)
 
-            try:
-                exitosos = 0
-                for zip_file in archivos_procesados:
-                    remote_file = remote_path + zip_file.name
-                    if app.sftp_mgr.subir_archivo(sftp_client, zip_file, remote_file):
-                        exitosos += 1
+            # Procesar archivos
+            archivos_procesados = app.processor.procesar_todos()
+            app.processor.cerrar_metricas()
+            if not archivos_procesados:
+                print_info("No hay archivos para procesar.")
+                sys.exit(0)
+
+            # Repartir por destino (config.SFTP_RUTAS) y agrupar en contenedores:
+            # (ZIP a subir, ZIP individuales incluidos)
+            grupos = agrupar_por_destino(archivos_procesados, por_defecto)
+
+            envios_por_destino = {}
+            for destino, zips in grupos.items():
+                if args.lote:
+                    from src.lotes import empaquetar_lotes
+
+                    inicio = 1 + sum(len(e) for e in envios_por_destino.values())
+                    envios_por_destino[destino] = empaquetar_lotes(
+                        zips,
+                        args.lote,
+                        args.lote_max_mb * 1024 * 1024,
+                        app.processor.procesados_dir,
+                        inicio=inicio,
+                    )
+                else:
+                    envios_por_destino[destino] = [(z, [z.name]) for z in zips]
 
-                if exitosos == len(archivos_procesados):
+            # Enviar (un hilo y una conexión SFTP por destino)
+            try:
+                resultados = enviar_a_destinos(app.sftp_mgr, envios_por_destino)
+                for _, subidos in resultados.values():
+                    for nombre in subidos:
+                        app.processor.marcar_subido(nombre)
+
+                if all(
+                    exitosos == len(envios_por_destino[destino])
+                    for destino, (exitosos, _) in resultados.items()
+                ):
                     print("\n[***] ¡PROCESO COMPLETADO EXITOSAMENTE!")
                     sys.exit(0)
                 else:
                     sys.exit(1)
             finally:
-                app.sftp_mgr.cerrar_conexion(sftp_client, ssh_client)
+                app.processor.guardar_manifiesto()
+
+        # Modo vigilancia: procesar y enviar archivos a medida que llegan
+        elif args.watch:
+            from src.watcher import VigilanteSalida
+
+            print_banner()
+            print("=== MODO ESICORP SFTP (VIGILANCIA) ===\n")
+
+            no_soportadas = [
+                opcion
+                for opcion, valor in (
+                    ("--recursivo", args.recursivo),
+                    ("--area", args.area),
+                    ("--sede", args.sede),
+                    ("--from", args.desde),
+                    ("--to", args.hasta),
+                    ("--lote", args.lote),
+                    ("--pipeline", args.pipeline),
+                )
+                if valor
+            ]
+            if no_soportadas:
+                print_error(f"--watch no es compatible con {', '.join(no_soportadas)}.")
+                sys.exit(1)
+            if config.SFTP_RUTAS:
+                print("[!]  --watch no aplica config.SFTP_RUTAS: todo va al destino por defecto")
+
+            if not app.sftp_mgr.verificar_llaves():
+                print("[!]  Generando llaves RSA...")
+                priv, pub = app.sftp_mgr.generar_llaves()
+                if not priv:
+                    print_error("No se pudieron generar las llaves.")
+                    sys.exit(1)
+
+            vigilante = VigilanteSalida(
+                app.processor,
+                app.sftp_mgr,
+                hostname=args.sftp_host or config.SFTP_CONFIG["hostname"],
+                username=args.sftp_user or config.SFTP_CONFIG["username"],
+                port=args.sftp_port or config.SFTP_CONFIG["port"],
+                remote_path=args.sftp_path or config.SFTP_CONFIG["remote_path"],
+                intervalo=args.intervalo,
+                espera_estable=args.espera_estable,
+            )
+            vigilante.ejecutar()
+            app.processor.cerrar_metricas()
+            sys.exit(0)
 
         # Mostrar información del servidor
         elif hasattr(args, "info") and args.info:
@@ -0,0 +1,278 @@
+"""
+Cifrado autenticado por bloques (construcción STREAM sobre AES-256-GCM)
+
+Los datos se dividen en bloques que se cifran de forma independiente, por lo
+que el cifrado y el descifrado pueden repartirse entre varios hilos y no
+requieren tener todo el contenido en memoria.
+
+Nonce de cada bloque (12 bytes):
+    [prefijo aleatorio 7 bytes][índice 4 bytes big-endian][último 1 byte]
+
+- El índice en el nonce detecta bloques reordenados, duplicados u omitidos
+- El indicador de último bloque detecta truncamientos: un bloque intermedio
+  no se autentica si se descifra como último
+- Los datos asociados (AAD) ligan cada bloque a la cabecera del archivo
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from . import config
+
+TAMANO_PREFIJO = 7
+TAMANO_TAG = 16
+MAX_BLOQUES = 2**32
+
+
+class ErrorBloque(ValueError):
+    """Un bloque no superó la verificación de autenticidad."""
+
+
+def generar_prefijo():
+    """Prefijo de nonce aleatorio para un nuevo flujo."""
+    return os.urandom(TAMANO_PREFIJO)
+
+
+def nonce_bloque(prefijo, indice, ultimo):
+    """
+    Nonce del bloque ``indice`` de un flujo.
+
+    Args:
+        prefijo (bytes): Prefijo de TAMANO_PREFIJO bytes del flujo
+        indice (int): Posición del bloque (desde 0)
+        ultimo (bool): True si es el último bloque del flujo
+
+    Returns:
+        bytes: Nonce de 12 bytes
+    """
+    if indice >= MAX_BLOQUES:
+        raise ValueError("demasiados bloques para un mismo flujo")
+    return prefijo + indice.to_bytes(4, "big") + (b"\x01" if ultimo else b"\x00")
+
+
+def cifrar_bloque(aead, prefijo, indice, datos, ultimo, aad=None):
+    """
+    Cifra un bloque. Devuelve len(datos) + TAMANO_TAG bytes.
+
+    Args:
+        aead (AESGCM): Cifrador con la clave del flujo
+        prefijo (bytes): Prefijo de nonce del flujo
+        indice (int): Posición del bloque
+        datos (bytes): Texto plano del bloque
+        ultimo (bool): True si es el último bloque
+        aad (bytes): Datos asociados autenticados (ej: cabecera del archivo)
+    """
+    return aead.encrypt(nonce_bloque(prefijo, indice, ultimo), datos, aad)
+
+
+def descifrar_bloque(aead, prefijo, indice, datos, ultimo, aad=None):
+    """
+    Descifra y verifica un bloque.
+
+    Raises:
+        ErrorBloque: Si el bloque fue alterado, está fuera de orden o el flujo
+            fue truncado
+    """
+    try:
+        return aead.decrypt(nonce_bloque(prefijo, indice, ultimo), datos, aad)
+    except InvalidTag:
+        raise ErrorBloque(
+            f"bloque {indice}: autenticación fallida "
+            "(datos alterados, reordenados o truncados)"
+        ) from None
+
+
+def con_ultimo(bloques):
+    """
+    Numera los bloques e indica cuál es el último.
+
+    Un flujo vacío produce un único bloque vacío marcado como último.
+
+    Args:
+        bloques: Iterable de bloques
+
+    Yields:
+        tuple: (índice, bloque, es el último)
+    """
+    anterior = None
+    indice = 0
+    for bloque in bloques:
+        if anterior is not None:
+            yield indice, anterior, False
+            indice += 1
+        anterior = bloque
+    yield indice, anterior if anterior is not None else b"", True
+
+
+def mapear_en_orden(pool, funcion, tareas, ventana):
+    """
+    Aplica ``funcion`` a cada tarea en un pool y devuelve los resultados en
+    orden, con como mucho ``ventana`` tareas en curso.
+
+    Args:
+        pool (Executor): Pool donde ejecutar
+        funcion: Función a aplicar
+        tareas: Iterable de tuplas de argumentos
+        ventana (int): Máximo de tareas en curso
+
+    Yields:
+        Resultado de cada tarea, en el orden de ``tareas``
+    """
+    en_curso = deque()
+    for argumentos in tareas:
+        en_curso.append(pool.submit(funcion, *argumentos))
+        if len(en_curso) >= ventana:
+            yield en_curso.popleft().result()
+    while en_curso:
+        yield en_curso.popleft().result()
+
+
+def _trocear(datos, tamano_bloque):
+    vista = memoryview(datos)
+    for inicio in range(0, len(datos), tamano_bloque):
+        yield vista[inicio : inicio + tamano_bloque]
+
+
+def reagrupar(trozos, tamano_bloque):
+    """
+    Reparte un flujo de trozos de cualquier tamaño en bloques de
+    ``tamano_bloque`` bytes (el último puede ser menor).
+
+    Args:
+        trozos: Iterable de bytes
+        tamano_bloque (int): Tamaño de cada bloque
+
+    Yields:
+        bytes: Bloques consecutivos
+    """
+    pendiente = bytearray()
+    for trozo in trozos:
+        if not pendiente and len(trozo) == tamano_bloque:
+            # Ya es un bloque: sin pasar por el búfer (bytes() solo copia
+            # si es una vista, ej: de un mmap)
+            yield bytes(trozo)
+            continue
+        pendiente += trozo
+        while len(pendiente) >= tamano_bloque:
+            yield bytes(pendiente[:tamano_bloque])
+            del pendiente[:tamano_bloque]
+    if pendiente:
+        yield bytes(pendiente)
+
+
+def memoria_flujo(tamano_bloque=config.AEAD_TAMANO_BLOQUE, hilos=None):
+    """
+    Memoria aproximada de cifrar_flujo / descifrar_flujo: hasta 2 bloques por
+    hilo en curso, en claro y cifrados.
+
+    Returns:
+        int: Bytes
+    """
+    hilos = hilos or os.cpu_count() or 1
+    return 2 * hilos * 2 * (tamano_bloque + TAMANO_TAG)
+
+
+def cifrar_flujo(clave, prefijo, bloques, escribir, hilos=None, aad=None):
+    """
+    Cifra un flujo de bloques en paralelo, con memoria acotada.
+
+    Args:
+        clave (bytes): Clave AES-256 de 32 bytes
+        prefijo (bytes): Prefijo de nonce del flujo (ver generar_prefijo)
+        bloques: Iterable de bloques en claro, todos del mismo tamaño salvo
+            el último
+        escribir: Función que recibe cada bloque cifrado, en orden
+        hilos (int): Hilos de cifrado (por defecto, uno por CPU)
+        aad (bytes): Datos asociados autenticados en cada bloque
+    """
+    aead = AESGCM(clave)
+    hilos = hilos or os.cpu_count() or 1
+    tareas = (
+        (aead, prefijo, indice, bloque, ultimo, aad)
+        for indice, bloque, ultimo in con_ultimo(bloques)
+    )
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for cifrado in mapear_en_orden(pool, cifrar_bloque, tareas, 2 * hilos):
+            escribir(cifrado)
+
+
+def descifrar_flujo(clave, prefijo, bloques, escribir, hilos=None, aad=None):
+    """
+    Descifra y verifica un flujo de bloques cifrados con cifrar_flujo.
+
+    Args:
+        clave (bytes): Clave AES-256 de 32 bytes
+        prefijo (bytes): Prefijo de nonce del flujo
+        bloques: Iterable de bloques cifrados (tamaño de bloque + TAMANO_TAG)
+        escribir: Función que recibe cada bloque en claro, en orden
+        hilos (int): Hilos de descifrado (por defecto, uno por CPU)
+        aad (bytes): Datos asociados usados al cifrar
+
+    Raises:
+        ErrorBloque: Si algún bloque no se autentica
+    """
+    aead = AESGCM(clave)
+    hilos = hilos or os.cpu_count() or 1
+    tareas = (
+        (aead, prefijo, indice, bloque, ultimo, aad)
+        for indice, bloque, ultimo in con_ultimo(bloques)
+    )
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for claro in mapear_en_orden(pool, descifrar_bloque, tareas, 2 * hilos):
+            escribir(claro)
+
+
+def cifrar_datos(clave, datos, tamano_bloque=config.AEAD_TAMANO_BLOQUE, hilos=None, aad=None):
+    """
+    Cifra ``datos`` por bloques en paralelo.
+
+    Args:
+        clave (bytes): Clave AES-256 de 32 bytes
+        datos (bytes): Texto plano
+        tamano_bloque (int): Bytes de texto plano por bloque
+        hilos (int): Hilos de cifrado (por defecto, uno por CPU)
+        aad (bytes): Datos asociados autenticados en cada bloque
+
+    Returns:
+        tuple: (prefijo de nonce, bloques cifrados concatenados)
+    """
+    prefijo = generar_prefijo()
+    partes = []
+    cifrar_flujo(clave, prefijo, _trocear(datos, tamano_bloque), partes.append, hilos, aad)
+    return prefijo, b"".join(partes)
+
+
+def descifrar_datos(
+    clave, prefijo, cifrado, tamano_bloque=config.AEAD_TAMANO_BLOQUE, hilos=None, aad=None
+):
+    """
+    Descifra y verifica el resultado de cifrar_datos.
+
+    Args:
+        clave (bytes): Clave AES-256 de 32 bytes
+        prefijo (bytes): Prefijo de nonce devuelto por cifrar_datos
+        cifrado (bytes): Bloques cifrados concatenados
+        tamano_bloque (int): Bytes de texto plano por bloque (igual al cifrado)
+        hilos (int): Hilos de descifrado (por defecto, uno por CPU)
+        aad (bytes): Datos asociados usados al cifrar
+
+    Returns:
+        bytes: Texto plano
+
+    Raises:
+        ErrorBloque: Si algún bloque no se autentica
+    """
+    partes = []
+    descifrar_flujo(
+        clave,
+        prefijo,
+        _trocear(cifrado, tamano_bloque + TAMANO_TAG),
+        partes.append,
+        hilos,
+        aad,
+    )
+    return b"".join(partes)
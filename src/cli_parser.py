@@ -1,5 +1,29 @@
 import argparse
+from datetime import date
 from . import config
+from .memoria import parsear_tamano
+from .planificacion import POLITICAS
+
+
+def tamano_memoria(valor):
+    """Tipo argparse: convierte un tamaño como 512M o 2G a bytes."""
+    try:
+        return parsear_tamano(valor)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def lista_areas(valor):
+    """Tipo argparse: "Finanzas,Ventas" -> ["Finanzas", "Ventas"]."""
+    return [area.strip() for area in valor.split(",") if area.strip()]
+
+
+def fecha_iso(valor):
+    """Tipo argparse: valida una fecha AAAA-MM-DD y la devuelve como texto."""
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida (use AAAA-MM-DD): {valor}")
 
 
 def crear_parser():
@@ -17,6 +41,16 @@ EJEMPLOS DE USO:
   Modo ESICORP SFTP (Envío automático):
     python main.py --esicorp --sftp-host 192.168.1.100 --sftp-user grupo1
     python main.py --esicorp --sftp-host 10.0.0.5 --sftp-user admin --sftp-port 2222
+    python main.py --esicorp --jobs 16 --executor process
+    python main.py --esicorp --lote sede --lote-max-mb 64
+    python main.py --esicorp --pipeline --jobs 4 --hilos-subida 2 --hilos-remoto 2
+    python main.py --esicorp --jobs 8 --max-memory 512M
+    python main.py --esicorp --orden recientes --prioridad-area Finanzas
+    python main.py --esicorp --lote sede --workers-remoto 0
+    python main.py --esicorp --recursivo --area Ventas --sede lima --from 2025-01-01 --to 2025-03-31
+
+  Modo vigilancia (procesa y envía cada archivo que llega a ./salida):
+    python main.py --watch --sftp-host 192.168.1.100 --sftp-user grupo1
 
   Verificar/Configurar SSH:
     python main.py --check-ssh
@@ -41,6 +75,7 @@ NOTAS:
   - Los archivos deben estar en ./salida con formato: Area-DD-MM-AAAA.Sede
   - Las llaves RSA se generan automáticamente en ./keys
   - Los archivos procesados se guardan en ./procesados
+  - ./procesados/manifiesto.json evita reprocesar archivos ya enviados (--forzar lo ignora)
   - Se requiere configurar la llave pública en el servidor Linux
         """,
     )
@@ -61,6 +96,12 @@ NOTAS:
         help="Modo ESICORP: procesar y enviar archivos vía SFTP",
     )
 
+    grupo_modo.add_argument(
+        "--watch",
+        action="store_true",
+        help="Modo ESICORP continuo: vigilar ./salida y enviar cada archivo nuevo",
+    )
+
     grupo_modo.add_argument(
         "--info",
         action="store_true",
@@ -102,6 +143,168 @@ NOTAS:
     )
     parser.add_argument("--sftp-path", type=str, help="Ruta remota en servidor SFTP")
 
+    # Argumentos de rendimiento para modo ESICORP
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Archivos a procesar en paralelo (default: 1, secuencial)",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=["thread", "process"],
+        default="thread",
+        help="Tipo de pool para --jobs > 1: thread o process (default: thread)",
+    )
+    parser.add_argument(
+        "--max-en-vuelo",
+        type=int,
+        default=config.ESICORP_MAX_BYTES_EN_VUELO // (1024 * 1024),
+        help="MB de archivos procesándose a la vez con --jobs (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--comprimir",
+        action="store_true",
+        help="Comprimir con zlib antes de Base64/AES (reportes de texto/CSV)",
+    )
+    parser.add_argument(
+        "--formato",
+        type=int,
+        choices=[1, 2, 3],
+        default=config.ESICORP_FORMATO,
+        help="Formato del .enc: 1 (Base64 + AES), 2 (binario, sin Base64) "
+        "o 3 (AES-GCM por bloques, en paralelo)",
+    )
+    # Selección de archivos para modo ESICORP
+    parser.add_argument("--area", type=str, help="Procesar solo esta Area (ej: Ventas)")
+    parser.add_argument("--sede", type=str, help="Procesar solo esta Sede (ej: lima)")
+    parser.add_argument(
+        "--from",
+        dest="desde",
+        type=fecha_iso,
+        help="Procesar archivos con fecha desde AAAA-MM-DD (inclusive)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="hasta",
+        type=fecha_iso,
+        help="Procesar archivos con fecha hasta AAAA-MM-DD (inclusive)",
+    )
+    parser.add_argument(
+        "--recursivo",
+        action="store_true",
+        help="Buscar archivos también en subdirectorios de ./salida",
+    )
+    parser.add_argument(
+        "--orden",
+        type=str,
+        choices=list(POLITICAS),
+        default=config.ESICORP_ORDEN,
+        help="Orden de proceso y envío: nombre, recientes (fecha del reporte), "
+        "pequenos o grandes primero (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prioridad-area",
+        type=lista_areas,
+        default=config.ESICORP_AREAS_PRIORITARIAS,
+        metavar="AREAS",
+        help="Areas que se procesan y envían primero, separadas por coma (ej: Finanzas,Ventas)",
+    )
+    parser.add_argument(
+        "--lote",
+        type=str,
+        choices=["sede", "fecha", "tamano"],
+        help="Agrupar los ZIP en contenedores por sede, fecha o tamaño (un envío por lote)",
+    )
+    parser.add_argument(
+        "--lote-max-mb",
+        type=int,
+        default=config.ESICORP_LOTE_MAX_BYTES // (1024 * 1024),
+        help="Tamaño máximo de cada lote en MB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=tamano_memoria,
+        default=config.MAX_MEMORIA,
+        metavar="TAMANO",
+        help="Memoria máxima para buffers de cifrado/descifrado, ej: 512M o 2G "
+        "(default: sin límite)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Solapar proceso, subida y descifrado remoto (no compatible con --lote)",
+    )
+    parser.add_argument(
+        "--hilos-subida",
+        type=int,
+        default=config.PIPELINE_HILOS_SUBIDA,
+        help="Subidas simultáneas con --pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hilos-remoto",
+        type=int,
+        default=config.PIPELINE_HILOS_REMOTO,
+        help="Descifrados simultáneos en el servidor con --pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cola",
+        type=int,
+        default=config.PIPELINE_CAPACIDAD,
+        help="Archivos en espera entre dos etapas de --pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers-remoto",
+        type=int,
+        default=config.DECRYPT_WORKERS_REMOTO,
+        metavar="N",
+        help="Procesos de descifrado en el servidor para los .enc de cada ZIP "
+        "(0 = uno por CPU, default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sin-worker-remoto",
+        action="store_true",
+        help="Lanza decrypt_esicorp.py por cada ZIP en lugar de un worker "
+        "residente por conexión",
+    )
+    parser.add_argument(
+        "--reintentos-remoto",
+        type=int,
+        default=config.DECRYPT_REINTENTOS,
+        metavar="N",
+        help="Reenvíos de los .enc que no se restauraron en el servidor; se "
+        "suben solo esos, no el ZIP completo (0 = no reintentar, default: %(default)s)",
+    )
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=config.WATCH_INTERVALO,
+        help="Segundos entre revisiones de ./salida en --watch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--espera-estable",
+        type=float,
+        default=config.WATCH_ESPERA_ESTABLE,
+        help="Segundos sin cambios antes de procesar un archivo en --watch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        metavar="ARCHIVO",
+        help="Exportar tiempos por etapa y rendimiento como JSON lines",
+    )
+    parser.add_argument(
+        "--sin-dedup",
+        action="store_true",
+        help="Cifrar y enviar por separado las copias idénticas de un mismo archivo",
+    )
+    parser.add_argument(
+        "--forzar",
+        action="store_true",
+        help="Procesar todos los archivos, aunque el manifiesto indique que ya se enviaron",
+    )
+
     # Argumentos para intercambio de llaves
     parser.add_argument(
         "--mode",
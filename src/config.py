@@ -9,6 +9,15 @@ BASE_DIR = "transfers"
 KDF_ITERATIONS = 100000
 KEY_LENGTH = 32
 
+# Cifrado AES-GCM por bloques (cifrado_bloques.py): texto plano por bloque
+AEAD_TAMANO_BLOQUE = 1024 * 1024
+# Hilos de cifrado/descifrado por bloques (None = uno por CPU)
+AEAD_HILOS = None
+# Paquetes TCP (Sender) cifrados por bloques en lugar de un único AES-GCM.
+# Solo los descifra un Receiver de esta versión: activarlo solo si todos los
+# receptores están actualizados.
+TCP_CIFRADO_POR_BLOQUES = False
+
 # Configuración de Red
 DEFAULT_PORT = 5000
 BUFFER_SIZE = 4096
@@ -26,7 +35,81 @@ SFTP_CONFIG = {
     "remote_path": "/home/grupo1/upload/",  # Ruta remota
 }
 
+# Enrutamiento por Sede o Area (src/enrutamiento.py). Claves "sede:<Sede>" o
+# "area:<Area>" (area tiene prioridad); los campos omitidos se toman del
+# destino por defecto. Los archivos sin ruta van a SFTP_CONFIG.
+SFTP_RUTAS = {
+    # "sede:lima": {"hostname": "10.0.1.10", "remote_path": "/srv/esicorp/lima/"},
+    # "sede:santiago": {"hostname": "10.0.2.10", "username": "esicorp-cl"},
+    # "area:Finanzas": {"hostname": "10.0.0.5", "remote_path": "/srv/finanzas/"},
+}
+
 # Directorios ESICORP
 KEYS_DIR = "./keys"
 SALIDA_DIR = "./salida"
 PROCESADOS_DIR = "./procesados"
+
+# Procesamiento ESICORP
+# Tamaño de bloque para el cifrado en streaming (se ajusta a múltiplo de 3
+# para que cada bloque Base64 se codifique de forma independiente)
+ESICORP_CHUNK_SIZE = 1024 * 1024
+
+# Tamaño de bloque mínimo al que se reduce ESICORP_CHUNK_SIZE cuando el
+# presupuesto de memoria (--max-memory) no alcanza
+ESICORP_CHUNK_MINIMO = 64 * 1024
+
+# Tamaño desde el que los archivos de entrada se leen con mmap (lectura.py)
+ESICORP_UMBRAL_MMAP = 64 * 1024 * 1024
+
+# Tope de bytes de entrada procesándose a la vez en modo paralelo (--jobs)
+ESICORP_MAX_BYTES_EN_VUELO = 256 * 1024 * 1024
+
+# Nivel zlib para el modo de compresión previa al cifrado (--comprimir)
+ESICORP_NIVEL_COMPRESION = 6
+
+# Formato del .enc por defecto: 1 (Base64 + AES-CBC), 2 (binario con
+# cabecera) o 3 (AES-GCM por bloques, cifrado y descifrado en paralelo)
+ESICORP_FORMATO = 1
+
+# Cifrar y enviar una sola vez los archivos de contenido idéntico (SHA-256)
+ESICORP_DEDUPLICAR = True
+
+# Orden de proceso y envío (src/planificacion.py): "nombre", "recientes",
+# "pequenos" o "grandes"; las Areas listadas van primero, en ese orden
+ESICORP_ORDEN = "nombre"
+ESICORP_AREAS_PRIORITARIAS = []
+
+# Manifiesto de archivos procesados/subidos (dentro de PROCESADOS_DIR)
+ESICORP_MANIFIESTO = "manifiesto.json"
+
+# Índice en caché de SALIDA_DIR (dentro de PROCESADOS_DIR)
+ESICORP_INDICE = "indice_salida.json"
+
+# Tamaño máximo de cada contenedor en modo lote (--lote)
+ESICORP_LOTE_MAX_BYTES = 64 * 1024 * 1024
+
+# Presupuesto de memoria del proceso en bytes (--max-memory); None = sin límite
+MAX_MEMORIA = None
+
+# Modo pipeline (--pipeline): etapas búsqueda -> proceso -> subida -> descifrado
+# remoto solapadas, con colas acotadas entre ellas
+PIPELINE_CAPACIDAD = 4  # trabajos en espera entre dos etapas (contrapresión)
+PIPELINE_HILOS_SUBIDA = 1  # subidas simultáneas (cada hilo con su conexión SFTP)
+PIPELINE_HILOS_REMOTO = 2  # descifrados simultáneos en el servidor
+
+# Procesos de decrypt_esicorp.py en el servidor (--workers-remoto): archivos
+# .enc de un mismo ZIP descifrados en paralelo; 0 = uno por CPU del servidor
+DECRYPT_WORKERS_REMOTO = 1
+
+# Descifrar con un decrypt_esicorp.py --worker residente por sesión SSH en lugar
+# de lanzar python3 por cada ZIP (--sin-worker-remoto lo desactiva)
+DECRYPT_WORKER_RESIDENTE = True
+
+# Reenvíos de los .enc que no se restauraron en el servidor: se suben solo esos
+# (con su .hash.txt) en un ZIP parcial, no el ZIP completo (--reintentos-remoto)
+DECRYPT_REINTENTOS = 1
+
+# Modo vigilancia (--watch)
+WATCH_INTERVALO = 1.0  # segundos entre revisiones de SALIDA_DIR
+WATCH_ESPERA_ESTABLE = 2.0  # segundos sin cambios antes de procesar un archivo
+WATCH_KEEPALIVE = 30  # segundos entre keepalives de la sesión SSH
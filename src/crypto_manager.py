@@ -1,12 +1,25 @@
 import os
 import base64
 import hashlib
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from . import config
+from .cifrado_bloques import (
+    ErrorBloque,
+    TAMANO_TAG,
+    cifrar_datos,
+    cifrar_flujo,
+    descifrar_datos,
+    descifrar_flujo,
+    generar_prefijo,
+)
 from .utils import print_crypto, print_error
 
+# Marca en el campo nonce del paquete: el resto son 7 bytes de prefijo STREAM
+MARCA_BLOQUES = b"STRM\x01"
+
 
 class CryptoManager:
     def __init__(self):
@@ -59,6 +72,126 @@ class CryptoManager:
 
         return nonce, ciphertext
 
+    def encrypt_stream(self, nonce: bytes, blocks, write):
+        """
+        Igual que encrypt_data, pero sobre un flujo: entrega a ``write`` el
+        criptograma de cada bloque y, al final, el tag (16 bytes). El
+        resultado es idéntico al de encrypt_data con el mismo nonce.
+        """
+        print_crypto("Iniciando proceso de cifrado simétrico (streaming)...")
+        print_crypto(f"  1. Nonce aleatorio (12 bytes): {nonce.hex()}")
+        encryptor = Cipher(
+            algorithms.AES(base64.urlsafe_b64decode(self.key)), modes.GCM(nonce)
+        ).encryptor()
+        for block in blocks:
+            write(encryptor.update(block))
+        write(encryptor.finalize())
+        write(encryptor.tag)
+        print_crypto("  2. Tag de Autenticación (16 bytes) al final del criptograma.")
+
+    def encrypt_data_chunked(self, data: bytes) -> tuple[bytes, bytes]:
+        """
+        Cifra por bloques AES-GCM en paralelo (ver cifrado_bloques).
+
+        El nonce devuelto (12 bytes) es MARCA_BLOQUES + prefijo del flujo, así
+        que el paquete .enc conserva su estructura [Nonce][Hash][Ciphertext].
+        """
+        print_crypto("Iniciando cifrado simétrico por bloques...")
+        print_crypto(
+            f"  1. Bloques de {config.AEAD_TAMANO_BLOQUE} bytes, "
+            f"{config.AEAD_HILOS or os.cpu_count()} hilo(s)"
+        )
+        prefijo, ciphertext = cifrar_datos(
+            base64.urlsafe_b64decode(self.key),
+            data,
+            hilos=config.AEAD_HILOS,
+        )
+        print_crypto(f"  2. Prefijo de nonce aleatorio (7 bytes): {prefijo.hex()}")
+        print_crypto("  3. Tag de autenticación (16 bytes) por bloque, con índice y marca final.")
+        print_crypto(f"  - Resultado: {len(ciphertext)} bytes")
+        return MARCA_BLOQUES + prefijo, ciphertext
+
+    def new_chunked_nonce(self) -> bytes:
+        """Nonce de paquete (MARCA_BLOQUES + prefijo) para encrypt_stream_chunked."""
+        return MARCA_BLOQUES + generar_prefijo()
+
+    def is_chunked(self, nonce: bytes) -> bool:
+        """True si el paquete se cifró por bloques (y se puede descifrar en streaming)."""
+        return nonce.startswith(MARCA_BLOQUES)
+
+    def encrypt_stream_chunked(self, nonce: bytes, blocks, write):
+        """
+        Igual que encrypt_data_chunked, pero sobre un flujo: recibe bloques en
+        claro de config.AEAD_TAMANO_BLOQUE bytes (el último puede ser menor) y
+        entrega cada bloque cifrado a ``write``, sin reunir los datos en memoria.
+        """
+        print_crypto("Iniciando cifrado simétrico por bloques (streaming)...")
+        print_crypto(
+            f"  - Prefijo de nonce aleatorio (7 bytes): {nonce[len(MARCA_BLOQUES):].hex()}"
+        )
+        cifrar_flujo(
+            base64.urlsafe_b64decode(self.key),
+            nonce[len(MARCA_BLOQUES) :],
+            blocks,
+            write,
+            hilos=config.AEAD_HILOS,
+        )
+
+    def decrypt_stream_chunked(self, nonce: bytes, read, write):
+        """
+        Descifra en streaming un paquete cifrado por bloques.
+
+        Args:
+            nonce: Nonce del paquete (MARCA_BLOQUES + prefijo)
+            read: Función read(n) del archivo, posicionada al inicio del criptograma
+            write: Función que recibe cada bloque en claro, en orden
+        """
+        print_crypto("Iniciando descifrado por bloques (streaming) y verificación...")
+        tamano_cifrado = config.AEAD_TAMANO_BLOQUE + TAMANO_TAG
+        try:
+            descifrar_flujo(
+                base64.urlsafe_b64decode(self.key),
+                nonce[len(MARCA_BLOQUES) :],
+                iter(lambda: read(tamano_cifrado), b""),
+                write,
+                hilos=config.AEAD_HILOS,
+            )
+        except ErrorBloque as e:
+            print_error(
+                "Fallo en descifrado: La integridad del archivo está comprometida o la clave es incorrecta."
+            )
+            print_crypto(f"     ❌ {e}. ¡ALERTA DE SEGURIDAD!")
+            raise
+        print_crypto("     ✅ Todos los bloques autenticados, en orden y completos.")
+
+    def decrypt_package_data(self, nonce: bytes, ciphertext: bytes) -> bytes:
+        """
+        Descifra un paquete, detectando si fue cifrado por bloques o con
+        encrypt_data.
+        """
+        if not nonce.startswith(MARCA_BLOQUES):
+            return self.decrypt_data(nonce, ciphertext)
+
+        print_crypto("Iniciando descifrado por bloques y verificación...")
+        print_crypto(f"  - Prefijo de nonce: {nonce[len(MARCA_BLOQUES):].hex()}")
+        print_crypto(f"  - Tamaño del criptograma: {len(ciphertext)} bytes")
+        try:
+            plaintext = descifrar_datos(
+                base64.urlsafe_b64decode(self.key),
+                nonce[len(MARCA_BLOQUES) :],
+                ciphertext,
+                hilos=config.AEAD_HILOS,
+            )
+        except ErrorBloque as e:
+            print_error(
+                "Fallo en descifrado: La integridad del archivo está comprometida o la clave es incorrecta."
+            )
+            print_crypto(f"     ❌ {e}. ¡ALERTA DE SEGURIDAD!")
+            raise
+        print_crypto("     ✅ Todos los bloques autenticados, en orden y completos.")
+        print_crypto(f"     ✅ Datos recuperados: {len(plaintext)} bytes.")
+        return plaintext
+
     def decrypt_data(self, nonce: bytes, ciphertext: bytes) -> bytes:
         """
         Descifra los datos usando AES-GCM.
@@ -0,0 +1,283 @@
+"""
+Enrutamiento ESICORP - Envío de cada archivo al servidor de su Sede o Area
+
+Usa la tabla config.SFTP_RUTAS para decidir a qué servidor SFTP va cada ZIP
+procesado, según el Area o la Sede del archivo original (Area-DD-MM-AAAA.Sede).
+Los archivos sin ruta van al destino por defecto (SFTP_CONFIG o --sftp-*).
+
+Cada destino se atiende en su propio hilo con su propia conexión SFTP, por lo
+que el tiempo total lo marca el destino más lento y no la suma de todos. La
+salida de cada hilo se guarda aparte y se muestra en un solo bloque al terminar
+su destino, para que los mensajes de varios servidores no se mezclen.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import io
+import sys
+import threading
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+from .file_index import IndiceArchivos
+from .lotes import leer_hash_txt
+
+Destino = namedtuple("Destino", "hostname port username remote_path")
+
+
+def crear_destino(ruta, por_defecto):
+    """
+    Completa una entrada de SFTP_RUTAS con los valores del destino por defecto.
+
+    Args:
+        ruta (dict): hostname, port, username y/o remote_path
+        por_defecto (Destino): Destino usado para los campos que falten
+
+    Returns:
+        Destino: Destino con remote_path terminado en "/"
+    """
+    campos = por_defecto._asdict()
+    campos.update({clave: valor for clave, valor in ruta.items() if clave in campos})
+    if not campos["remote_path"].endswith("/"):
+        campos["remote_path"] += "/"
+    return Destino(**campos)
+
+
+def resolver_destino(nombre_original, por_defecto, rutas=None):
+    """
+    Destino de un archivo según su Area o Sede.
+
+    Una ruta "area:<Area>" tiene prioridad sobre "sede:<Sede>". La comparación
+    no distingue mayúsculas.
+
+    Args:
+        nombre_original (str): Nombre del archivo original
+        por_defecto (Destino): Destino si no hay ruta aplicable
+        rutas (dict): Tabla de rutas (por defecto, config.SFTP_RUTAS)
+
+    Returns:
+        Destino: Destino del archivo
+    """
+    rutas = config.SFTP_RUTAS if rutas is None else rutas
+    coincidencia = IndiceArchivos.FILE_PATTERN.match(nombre_original or "")
+    if not rutas or not coincidencia:
+        return por_defecto
+
+    tabla = {clave.casefold(): ruta for clave, ruta in rutas.items()}
+    for clave in (f"area:{coincidencia['area']}", f"sede:{coincidencia['sede']}"):
+        ruta = tabla.get(clave.casefold())
+        if ruta is not None:
+            return crear_destino(ruta, por_defecto)
+    return por_defecto
+
+
+def clave_de_destino(nombre_original, rutas=None):
+    """
+    Identifica el destino de un archivo sin conocer el destino por defecto.
+
+    Dos archivos con la misma clave van al mismo servidor y ruta remota.
+
+    Args:
+        nombre_original (str): Nombre del archivo original
+        rutas (dict): Tabla de rutas (por defecto, config.SFTP_RUTAS)
+
+    Returns:
+        Destino: Destino de su ruta, o uno vacío si va al destino por defecto
+    """
+    return resolver_destino(nombre_original, Destino(None, None, None, ""), rutas)
+
+
+def destino_de_zip(zip_file, por_defecto, rutas=None):
+    """
+    Destino de un ZIP procesado, según el archivo original de su .hash.txt.
+
+    Args:
+        zip_file (Path): ZIP generado por ESICORPProcessor
+        por_defecto (Destino): Destino si no hay ruta aplicable
+        rutas (dict): Tabla de rutas (por defecto, config.SFTP_RUTAS)
+
+    Returns:
+        Destino: Destino del ZIP
+    """
+    rutas = config.SFTP_RUTAS if rutas is None else rutas
+    if not rutas:
+        return por_defecto
+    with zipfile.ZipFile(zip_file) as zipf:
+        _, campos = leer_hash_txt(zipf)
+    return resolver_destino(campos.get("Archivo"), por_defecto, rutas)
+
+
+def agrupar_por_destino(zips, por_defecto, rutas=None):
+    """
+    Reparte los ZIP procesados entre sus destinos.
+
+    Args:
+        zips (list): ZIP Path generados por ESICORPProcessor
+        por_defecto (Destino): Destino de los archivos sin ruta
+        rutas (dict): Tabla de rutas (por defecto, config.SFTP_RUTAS)
+
+    Returns:
+        dict: Destino -> lista de ZIP, en el orden recibido
+    """
+    por_defecto = crear_destino({}, por_defecto)
+    grupos = {}
+    for zip_file in zips:
+        destino = destino_de_zip(zip_file, por_defecto, rutas)
+        grupos.setdefault(destino, []).append(zip_file)
+    return grupos
+
+
+class _SalidaPorHilo:
+    """
+    Sustituto de sys.stdout que separa la salida de cada hilo de envío.
+
+    contextlib.redirect_stdout no sirve aquí: cambia sys.stdout para todo el
+    proceso, no para un hilo. Este objeto se instala una sola vez y reparte
+    cada write() al búfer del hilo que lo llama; los hilos sin búfer escriben
+    directamente en la salida original.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.buferes = {}
+        self.cerrojo = threading.Lock()
+
+    def write(self, texto):
+        bufer = self.buferes.get(threading.get_ident())
+        if bufer is None:
+            with self.cerrojo:
+                return self.original.write(texto)
+        return bufer.write(texto)
+
+    def flush(self):
+        if threading.get_ident() not in self.buferes:
+            self.original.flush()
+
+    def __getattr__(self, nombre):
+        return getattr(self.original, nombre)
+
+    def ejecutar(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) guardando su salida y la muestra en un bloque.
+
+        Returns:
+            Lo que devuelva funcion
+        """
+        hilo = threading.get_ident()
+        self.buferes[hilo] = io.StringIO()
+        try:
+            return funcion(*args)
+        finally:
+            texto = self.buferes.pop(hilo).getvalue()
+            with self.cerrojo:
+                self.original.write(texto)
+                self.original.flush()
+
+
+def _restaurados(resultado, incluidos):
+    """
+    ZIP individuales de un envío cuyos .enc se restauraron en el servidor.
+
+    Args:
+        resultado: Valor de SFTPManager.subir_archivo
+        incluidos (list): Nombres de los ZIP individuales del envío
+
+    Returns:
+        list: Todos si el envío se restauró completo; si falló en parte (un
+            contenedor de lote), solo los ZIP cuyo .enc se restauró
+    """
+    if resultado:
+        return list(incluidos)
+    if resultado is False or resultado.error:
+        return []
+    restaurados = {
+        archivo["archivo"] for archivo in resultado.archivos if archivo.get("exito")
+    }
+    return [
+        nombre for nombre in incluidos if nombre[: -len(".zip")] + ".enc" in restaurados
+    ]
+
+
+def _enviar_a_destino(sftp_mgr, destino, envios):
+    """
+    Sube los envíos de un destino por una conexión propia.
+
+    Un envío cuenta como exitoso solo si el servidor restauró todos sus .enc.
+
+    Returns:
+        tuple: (envíos exitosos, nombres de ZIP individuales subidos y restaurados)
+    """
+    print(f"\n[>>] Destino {destino.username}@{destino.hostname}:{destino.remote_path}")
+    sftp_client, ssh_client = sftp_mgr.conectar_sftp(
+        hostname=destino.hostname, username=destino.username, port=destino.port
+    )
+    if not sftp_client:
+        print(f"[X] No se pudo conectar a {destino.hostname}")
+        return 0, []
+
+    exitosos = 0
+    subidos = []
+    try:
+        for zip_file, incluidos in envios:
+            remote_file = destino.remote_path + zip_file.name
+            resultado = sftp_mgr.subir_archivo(sftp_client, zip_file, remote_file)
+            if resultado:
+                exitosos += 1
+            subidos.extend(_restaurados(resultado, incluidos))
+    finally:
+        sftp_mgr.cerrar_conexion(sftp_client, ssh_client)
+    return exitosos, subidos
+
+
+def enviar_a_destinos(sftp_mgr, envios_por_destino):
+    """
+    Sube los envíos de todos los destinos en paralelo, un hilo por destino.
+
+    Args:
+        sftp_mgr (SFTPManager): Gestor de conexiones SFTP
+        envios_por_destino (dict): Destino -> lista de tuplas
+            (ZIP a subir, nombres de ZIP individuales incluidos)
+
+    Returns:
+        dict: Destino -> (envíos exitosos, nombres de ZIP individuales subidos y
+            restaurados)
+    """
+    if len(envios_por_destino) > 1:
+        print(f"\n[>>] Enviando a {len(envios_por_destino)} destinos en paralelo:")
+        for destino, envios in envios_por_destino.items():
+            print(
+                f"   • {destino.username}@{destino.hostname}:{destino.remote_path} "
+                f"({len(envios)} envío(s))"
+            )
+
+    resultados = {}
+    salida = _SalidaPorHilo(sys.stdout)
+    sys.stdout = salida
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(envios_por_destino))) as pool:
+            futuros = {
+                destino: pool.submit(
+                    salida.ejecutar, _enviar_a_destino, sftp_mgr, destino, envios
+                )
+                for destino, envios in envios_por_destino.items()
+            }
+            for destino, futuro in futuros.items():
+                try:
+                    resultados[destino] = futuro.result()
+                except Exception as e:
+                    print(f"[X] Error enviando a {destino.hostname}: {e}")
+                    resultados[destino] = (0, [])
+    finally:
+        sys.stdout = salida.original
+
+    if len(envios_por_destino) > 1:
+        print("\n" + "=" * 60)
+        print("RESUMEN POR DESTINO")
+        print("=" * 60)
+        for destino, (exitosos, _) in resultados.items():
+            total = len(envios_por_destino[destino])
+            marca = "[OK]" if exitosos == total else "[X]"
+            print(f"   {marca} {destino.hostname}: {exitosos}/{total} envío(s)")
+        print("=" * 60)
+    return resultados
@@ -13,33 +13,137 @@ Autor: Grupo ESICORP - UNAD
 
 import os
 import re
+import struct
 import hashlib
 import base64
 import zipfile
+import zlib
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
 from pathlib import Path
 from datetime import datetime
+from time import perf_counter
+from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
+from . import config, memoria, planificacion
+from .cifrado_bloques import TAMANO_TAG, cifrar_flujo, generar_prefijo, reagrupar
+from .enrutamiento import clave_de_destino
+from .file_index import IndiceArchivos
+from .lotes import clave_grupo
+from .lectura import leer_bloques
+from .manifest import ManifiestoProcesamiento
+from .memoria import presupuesto
+from .metricas import MetricasArchivo, RegistroMetricas
 
 
 class ESICORPProcessor:
     """Procesador de archivos con seguridad ESICORP."""
 
-    # Regex para archivos ESICORP: Area-DD-MM-AAAA.Sede
-    FILE_PATTERN = re.compile(r"^[A-Za-z]+-\d{2}-\d{2}-\d{4}\.[A-Za-z]+$")
-
-    def __init__(self, salida_dir="./salida", procesados_dir="./procesados"):
+    # Regex para archivos ESICORP: Area-DD-MM-AAAA.Sede (con grupos nombrados)
+    FILE_PATTERN = IndiceArchivos.FILE_PATTERN
+
+    # Formato v2 del .enc: [Cabecera 18 bytes][IV 16][Clave 32][Datos cifrados]
+    # Formato v3 del .enc: [Cabecera 18 bytes][Prefijo nonce 7][Clave 32]
+    #                      [Bloques AES-GCM de tamaño de bloque + 16 bytes]
+    # Cabecera: magic, versión, flags, tamaño original, tamaño de bloque
+    MAGIC_V2 = b"ESIC"
+    CABECERA_V2 = struct.Struct(">4sBBQI")
+    FLAG_ZLIB = 0x01
+
+    DESCRIPCION_FORMATOS = {
+        1: "v1 (Base64)",
+        2: "v2 (binario, sin Base64)",
+        3: "v3 (binario, AES-GCM por bloques)",
+    }
+
+    def __init__(
+        self,
+        salida_dir="./salida",
+        procesados_dir="./procesados",
+        chunk_size=config.ESICORP_CHUNK_SIZE,
+        jobs=1,
+        executor="thread",
+        max_bytes_en_vuelo=config.ESICORP_MAX_BYTES_EN_VUELO,
+        compresion=False,
+        nivel_compresion=config.ESICORP_NIVEL_COMPRESION,
+        formato=config.ESICORP_FORMATO,
+        hilos_cifrado=config.AEAD_HILOS,
+        incremental=True,
+        recursivo=False,
+        filtros=None,
+        deduplicar=config.ESICORP_DEDUPLICAR,
+        umbral_mmap=config.ESICORP_UMBRAL_MMAP,
+        metricas_out=None,
+        orden=config.ESICORP_ORDEN,
+        areas_prioritarias=config.ESICORP_AREAS_PRIORITARIAS,
+        lote=None,
+    ):
         """
         Inicializa el procesador ESICORP.
 
         Args:
             salida_dir (str): Directorio de archivos de entrada
             procesados_dir (str): Directorio de archivos procesados
+            chunk_size (int): Tamaño de bloque para el cifrado en streaming
+            jobs (int): Archivos procesados en paralelo (1 = secuencial)
+            executor (str): Tipo de pool para jobs > 1: "thread" o "process"
+            max_bytes_en_vuelo (int): Tope de bytes de entrada en proceso a la vez
+            compresion (bool): Comprimir con zlib antes de Base64/AES
+            nivel_compresion (int): Nivel zlib (1-9) cuando compresion=True
+            formato (int): Formato del .enc: 1 (Base64 + AES), 2 (binario) o
+                3 (AES-GCM por bloques)
+            hilos_cifrado (int): Hilos para cifrar bloques en formato 3
+                (None = uno por CPU)
+            incremental (bool): En procesar_todos, omitir archivos sin cambios
+                según el manifiesto de ./procesados
+            recursivo (bool): Buscar también en subdirectorios de salida_dir
+            filtros (dict): Filtros de IndiceArchivos.filtrar (area, sede,
+                desde, hasta) aplicados en buscar_archivos
+            deduplicar (bool): En procesar_lote, cifrar y enviar una sola vez
+                los archivos con contenido idéntico
+            umbral_mmap (int): Tamaño desde el que los archivos se leen con
+                mmap en lugar de read (ver lectura.leer_bloques)
+            metricas_out (str): Archivo JSON lines donde exportar las métricas
+                por archivo y por lote (ver metricas.RegistroMetricas)
+            orden (str): Política de orden de proceso y envío (ver
+                planificacion.POLITICAS)
+            areas_prioritarias (list): Areas que se procesan y envían primero
+            lote (str): Criterio de lotes.empaquetar_lotes con el que se
+                agruparán los ZIP ("sede", "fecha", "tamano"), o None
         """
         self.salida_dir = Path(salida_dir)
         self.procesados_dir = Path(procesados_dir)
+        # Múltiplo de 3: cada bloque produce Base64 sin relleno intermedio
+        self.chunk_size = max(3, chunk_size - chunk_size % 3)
+        self.jobs = max(1, jobs)
+        self.executor = executor
+        self.max_bytes_en_vuelo = max_bytes_en_vuelo
+        self.compresion = compresion
+        self.nivel_compresion = nivel_compresion
+        self.formato = formato
+        self.hilos_cifrado = hilos_cifrado or os.cpu_count() or 1
         self.salida_dir.mkdir(exist_ok=True)
         self.procesados_dir.mkdir(exist_ok=True)
+        self.incremental = incremental
+        self.recursivo = recursivo
+        self.filtros = {k: v for k, v in (filtros or {}).items() if v}
+        self.deduplicar = deduplicar
+        self.umbral_mmap = umbral_mmap
+        self.metricas = RegistroMetricas(metricas_out)
+        self.orden = orden
+        self.areas_prioritarias = list(areas_prioritarias or [])
+        self.lote = lote
+        self.copias_deduplicadas = 0  # copias omitidas en el último lote
+        self.zip_por_archivo = {}  # archivo -> ZIP del último lote (None si falló)
+        self.manifiesto = ManifiestoProcesamiento(
+            self.procesados_dir / config.ESICORP_MANIFIESTO
+        )
 
     @staticmethod
     def calcular_hash_sha256(file_path):
@@ -53,9 +157,8 @@ class ESICORPProcessor:
             str: Hash SHA-256 en formato hexadecimal
         """
         sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+        for byte_block in leer_bloques(file_path):
+            sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
     @staticmethod
@@ -95,10 +198,274 @@ class ESICORPProcessor:
 
         return encrypted_data
 
+    def construir_cabecera(self, tamano_original, chunk_size=None):
+        """
+        Construye la cabecera de los formatos v2 y v3 del .enc.
+
+        Args:
+            tamano_original (int): Tamaño en bytes del archivo sin cifrar
+            chunk_size (int): Tamaño de bloque usado (por defecto, chunk_size)
+
+        Returns:
+            bytes: Cabecera de CABECERA_V2.size bytes
+        """
+        flags = self.FLAG_ZLIB if self.compresion else 0
+        return self.CABECERA_V2.pack(
+            self.MAGIC_V2, self.formato, flags, tamano_original, chunk_size or self.chunk_size
+        )
+
+    def memoria_necesaria(self, chunk_size=None):
+        """
+        Memoria aproximada para cifrar un archivo, sin importar su tamaño.
+
+        Formatos 1 y 2: el bloque leído, comprimido, en Base64 y cifrado.
+        Formato 3: hasta 2 bloques por hilo en curso, en claro y cifrados.
+
+        Args:
+            chunk_size (int): Tamaño de bloque (por defecto, chunk_size)
+
+        Returns:
+            int: Bytes
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if self.formato == 3:
+            return (4 * self.hilos_cifrado + 2) * (chunk_size + 16)
+        return 5 * chunk_size
+
+    def _reservar_memoria(self):
+        """
+        Reserva en el presupuesto de memoria lo necesario para cifrar un archivo.
+
+        Si no alcanza con ``chunk_size``, prueba con bloques más chicos (hasta
+        ESICORP_CHUNK_MINIMO); con el mínimo, espera a que se libere memoria.
+
+        Returns:
+            int: Tamaño de bloque reservado (liberar con memoria_necesaria)
+        """
+        chunk_size = self.chunk_size
+        while True:
+            necesario = self.memoria_necesaria(chunk_size)
+            if chunk_size <= config.ESICORP_CHUNK_MINIMO:
+                presupuesto.reservar(necesario)
+                return chunk_size
+            if presupuesto.cabe(necesario) and presupuesto.intentar_reservar(necesario):
+                return chunk_size
+            chunk_size = max(config.ESICORP_CHUNK_MINIMO, chunk_size // 2)
+            chunk_size -= chunk_size % 3
+
+    def _algoritmo_cifrado(self):
+        return "AES-256-GCM por bloques" if self.formato == 3 else "AES-256-CBC"
+
+    def cifrar_archivo_streaming(
+        self, file_path, destino, clave, iv, tamano_esperado=None, metricas=None, chunk_size=None
+    ):
+        """
+        CONFIDENCIALIDAD: Hash, Base64 y AES-256-CBC en una sola lectura.
+
+        Lee el archivo en bloques de ``chunk_size`` bytes, por lo que la memoria
+        usada no depende del tamaño del archivo. Desde ``umbral_mmap`` bytes
+        los bloques son vistas de un mmap del archivo, sin copias intermedias. Sin compresión, el criptograma
+        resultante es idéntico al de
+        ``cifrar_aes_256_cbc(base64.b64encode(datos), clave, iv)``. Con
+        ``compresion`` activa, los datos se comprimen con zlib antes de Base64.
+        En formato 2 se omite Base64 y se cifran los bytes tal cual.
+
+        Args:
+            file_path (Path): Ruta al archivo a cifrar
+            destino: Archivo binario abierto donde se escriben los datos cifrados
+            clave (bytes): Clave AES de 32 bytes
+            iv (bytes): Vector de inicialización de 16 bytes
+            tamano_esperado (int): Si se indica, falla si el archivo no mide eso
+            metricas (MetricasArchivo): Donde acumular el tiempo de cada etapa
+            chunk_size (int): Tamaño de bloque (por defecto, chunk_size)
+
+        Returns:
+            tuple: (hash SHA-256 hexadecimal, bytes codificados, bytes cifrados)
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if metricas is None:
+            metricas = MetricasArchivo(file_path.name)
+        sha256_hash = hashlib.sha256()
+        cipher = Cipher(algorithms.AES(clave), modes.CBC(iv), backend=default_backend())
+        encryptor = cipher.encryptor()
+        padder = padding.PKCS7(128).padder()
+        compresor = (
+            zlib.compressobj(self.nivel_compresion) if self.compresion else None
+        )
+        resto = b""  # Base64 codifica en grupos de 3 bytes
+        total_leido = 0
+        total_base64 = 0
+        total_cifrado = 0
+
+        def codificar_y_cifrar(datos, final=False):
+            nonlocal resto, total_base64, total_cifrado
+            t = perf_counter()
+            if self.formato == 2:
+                bloque_base64 = datos
+            else:
+                if resto:
+                    datos = resto + datos
+                corte = len(datos) if final else len(datos) - len(datos) % 3
+                # Copia: datos puede ser una vista del mmap, válida solo
+                # hasta el siguiente bloque
+                resto = bytes(datos[corte:])
+                bloque_base64 = base64.b64encode(datos[:corte])
+                t = metricas.etapa("base64", t, corte, len(bloque_base64))
+            total_base64 += len(bloque_base64)
+            cifrado = encryptor.update(padder.update(bloque_base64))
+            if final:
+                cifrado += encryptor.update(padder.finalize()) + encryptor.finalize()
+            t = metricas.etapa("aes", t, len(bloque_base64), len(cifrado))
+            total_cifrado += len(cifrado)
+            destino.write(cifrado)
+            metricas.etapa("zip", t, len(cifrado))
+
+        t = perf_counter()
+        for bloque in leer_bloques(file_path, chunk_size, self.umbral_mmap):
+            t = metricas.etapa("lectura", t, len(bloque))
+            total_leido += len(bloque)
+            sha256_hash.update(bloque)
+            t = metricas.etapa("sha256", t, len(bloque))
+            if compresor:
+                entrada = len(bloque)
+                bloque = compresor.compress(bloque)
+                metricas.etapa("zlib", t, entrada, len(bloque))
+            codificar_y_cifrar(bloque)
+            t = perf_counter()
+
+        if tamano_esperado is not None and total_leido != tamano_esperado:
+            raise ValueError(
+                f"el archivo cambió durante el cifrado ({total_leido} bytes leídos, "
+                f"{tamano_esperado} esperados)"
+            )
+        if compresor:
+            t = perf_counter()
+            resto_zlib = compresor.flush()
+            metricas.etapa("zlib", t, 0, len(resto_zlib))
+        codificar_y_cifrar(resto_zlib if compresor else b"", final=True)
+
+        return sha256_hash.hexdigest(), total_base64, total_cifrado
+
+    def cifrar_archivo_por_bloques(
+        self,
+        file_path,
+        destino,
+        clave,
+        prefijo,
+        aad,
+        tamano_esperado=None,
+        metricas=None,
+        chunk_size=None,
+    ):
+        """
+        CONFIDENCIALIDAD: Hash y AES-256-GCM por bloques (formato 3).
+
+        El archivo (comprimido con zlib si ``compresion``) se divide en bloques
+        de ``chunk_size`` bytes que se cifran en paralelo en ``hilos_cifrado``
+        hilos y se escriben en orden (ver cifrado_bloques). Cada bloque queda
+        autenticado junto con su posición, la marca de último bloque y la
+        cabecera (``aad``).
+
+        Args:
+            file_path (Path): Ruta al archivo a cifrar
+            destino: Archivo binario abierto donde se escriben los bloques
+            clave (bytes): Clave AES de 32 bytes
+            prefijo (bytes): Prefijo de nonce del flujo
+            aad (bytes): Cabecera del .enc, autenticada en cada bloque
+            tamano_esperado (int): Si se indica, falla si el archivo no mide eso
+            metricas (MetricasArchivo): Donde acumular el tiempo de cada etapa
+            chunk_size (int): Tamaño de bloque (por defecto, chunk_size); debe
+                coincidir con el de la cabecera
+
+        Returns:
+            tuple: (hash SHA-256 hexadecimal, bytes en claro cifrados,
+                    bytes cifrados)
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if metricas is None:
+            metricas = MetricasArchivo(file_path.name)
+        sha256_hash = hashlib.sha256()
+        compresor = (
+            zlib.compressobj(self.nivel_compresion) if self.compresion else None
+        )
+        total_leido = 0
+        total_claro = 0
+        total_cifrado = 0
+        # Fin de la última etapa medida en el hilo principal: lo que pasa
+        # entre ella y escribir() es la espera a los hilos de cifrado
+        marca = perf_counter()
+
+        def trozos():
+            nonlocal total_leido, marca
+            t = perf_counter()
+            for bloque in leer_bloques(file_path, chunk_size, self.umbral_mmap):
+                t = metricas.etapa("lectura", t, len(bloque))
+                total_leido += len(bloque)
+                sha256_hash.update(bloque)
+                t = metricas.etapa("sha256", t, len(bloque))
+                datos = bloque
+                if compresor:
+                    datos = compresor.compress(bloque)
+                    metricas.etapa("zlib", t, len(bloque), len(datos))
+                marca = perf_counter()
+                yield datos
+                t = perf_counter()
+
+            if tamano_esperado is not None and total_leido != tamano_esperado:
+                raise ValueError(
+                    f"el archivo cambió durante el cifrado ({total_leido} bytes "
+                    f"leídos, {tamano_esperado} esperados)"
+                )
+            if compresor:
+                t = perf_counter()
+                resto = compresor.flush()
+                metricas.etapa("zlib", t, 0)
+                marca = perf_counter()
+                yield resto
+
+        def escribir(cifrado):
+            nonlocal total_claro, total_cifrado, marca
+            claro = len(cifrado) - TAMANO_TAG
+            t = metricas.etapa("aes", marca, claro, len(cifrado))
+            destino.write(cifrado)
+            marca = metricas.etapa("zip", t, len(cifrado))
+            total_claro += claro
+            total_cifrado += len(cifrado)
+
+        cifrar_flujo(
+            clave,
+            prefijo,
+            reagrupar(trozos(), chunk_size),
+            escribir,
+            hilos=self.hilos_cifrado,
+            aad=aad,
+        )
+        return sha256_hash.hexdigest(), total_claro, total_cifrado
+
+    def ordenar(self, elementos, ruta=lambda elemento: elemento):
+        """
+        Ordena archivos o ZIP según ``orden`` y ``areas_prioritarias``.
+
+        Args:
+            elementos: Archivos Path (u objetos con un Path, ver ``ruta``)
+            ruta: Función que devuelve el Path de cada elemento
+
+        Returns:
+            list: Elementos en el orden en que deben procesarse y enviarse
+        """
+        return planificacion.ordenar(elementos, self.orden, self.areas_prioritarias, ruta)
+
     def buscar_archivos(self, strict=True):
         """
         Busca archivos que cumplan con el patrón ESICORP.
 
+        En modo estricto usa el índice en caché de ./procesados (ver
+        IndiceArchivos), con recursión y filtros según la configuración
+        del procesador. Con ``recursivo``, un nombre repetido en varias
+        subcarpetas se rechaza salvo la primera aparición (por ruta): todos los
+        ZIP van a ./procesados y el manifiesto los identifica por nombre (ver
+        _descartar_colisiones).
+
         Args:
             strict (bool): Si True, solo acepta archivos con el patrón correcto.
                           Si False, acepta cualquier archivo.
@@ -111,15 +478,20 @@ class ESICORPProcessor:
         if not self.salida_dir.exists():
             return archivos
 
-        for file_path in self.salida_dir.iterdir():
-            if not file_path.is_file():
-                continue
+        if strict:
+            indice = IndiceArchivos(
+                self.salida_dir,
+                cache_path=self.procesados_dir / config.ESICORP_INDICE,
+                recursivo=self.recursivo,
+            )
+            indice.actualizar()
+            return self._descartar_colisiones(
+                [registro.ruta for registro in indice.filtrar(**self.filtros)]
+            )
 
-            if strict:
-                if self.FILE_PATTERN.match(file_path.name):
-                    archivos.append(file_path)
-            else:
-                # Modo no estricto: acepta cualquier archivo
+        # Modo no estricto: acepta cualquier archivo
+        for file_path in self.salida_dir.iterdir():
+            if file_path.is_file():
                 archivos.append(file_path)
 
         return archivos
@@ -130,10 +502,15 @@ class ESICORPProcessor:
 
         Flujo:
         1. INTEGRIDAD: Calcular hash SHA-256
-        2. CODIFICACIÓN: Convertir a Base64
+        2. CODIFICACIÓN: Convertir a Base64 (previa compresión zlib si
+           compresion=True)
         3. CONFIDENCIALIDAD: Cifrar con AES-256-CBC
         4. EMPAQUETADO: Crear ZIP con .enc + .hash.txt + metadata
 
+        Los pasos 1-3 se ejecutan en una sola lectura por bloques
+        (ver cifrar_archivo_streaming), con memoria acotada por chunk_size, y
+        el criptograma se escribe directamente en el miembro .enc del ZIP.
+
         Args:
             file_path (Path): Ruta al archivo a procesar
             verbose (bool): Mostrar mensajes de progreso
@@ -141,87 +518,441 @@ class ESICORPProcessor:
         Returns:
             Path: Ruta al archivo ZIP final, o None si falla
         """
+        zip_file, _, _, _ = self._procesar_archivo(file_path, verbose)
+        return zip_file
+
+    def _procesar_archivo(self, file_path, verbose=True, duplicados=()):
+        """
+        Igual que procesar_archivo, pero devuelve también el hash, el error y
+        las métricas.
+
+        Args:
+            duplicados (list): Nombres de archivos con el mismo contenido, que
+                el servidor restaura como copias del archivo descifrado
+
+        Returns:
+            tuple: (Path del ZIP o None, hash SHA-256 o None, error o None,
+                    MetricasArchivo o None)
+        """
         if verbose:
             print(f"\n📄 Procesando: {file_path.name}")
             print("-" * 60)
 
         try:
-            base_name = file_path.stem
-
-            # PASO 1: INTEGRIDAD - Calcular hash SHA-256
-            if verbose:
-                print("[FIND] [INTEGRIDAD] Calculando hash SHA-256...")
-            hash_original = self.calcular_hash_sha256(file_path)
-            hash_file = self.procesados_dir / f"{base_name}.hash.txt"
-
-            with open(hash_file, "w") as f:
-                f.write(f"SHA-256: {hash_original}\n")
-                f.write(f"Archivo: {file_path.name}\n")
-                f.write(f"Fecha: {datetime.now().isoformat()}\n")
-
-            if verbose:
-                print(f"   [OK] Hash: {hash_original[:32]}...")
-
-            # PASO 2: CODIFICACIÓN - Convertir a Base64
-            if verbose:
-                print("[EDIT] [CODIFICACIÓN] Convirtiendo a Base64...")
-            with open(file_path, "rb") as f:
-                file_data = f.read()
-            file_base64 = base64.b64encode(file_data)
-
-            if verbose:
-                print(f"   [OK] Codificado ({len(file_base64)} bytes)")
-
-            # PASO 3: CONFIDENCIALIDAD - Cifrar con AES-256-CBC
-            if verbose:
-                print("[SEC] [CONFIDENCIALIDAD] Cifrando con AES-256-CBC...")
-            clave, iv = self.generar_clave_aes()
-            encrypted_data = self.cifrar_aes_256_cbc(file_base64, clave, iv)
-
-            # Guardar archivo cifrado (con IV y clave para demostración)
-            enc_file = self.procesados_dir / f"{base_name}.enc"
-            with open(enc_file, "wb") as f:
-                # Formato: [IV 16 bytes][Clave 32 bytes][Datos cifrados]
-                # NOTA: En producción, la clave se intercambiaría por canal separado
-                f.write(iv)
-                f.write(clave)
-                f.write(encrypted_data)
-
-            if verbose:
-                print(f"   [OK] Cifrado ({len(encrypted_data)} bytes)")
-
-            # PASO 4: EMPAQUETADO - Crear ZIP
-            if verbose:
-                print("📦 [EMPAQUETADO] Creando archivo ZIP...")
-            zip_file = self.procesados_dir / f"{base_name}.zip"
+            metricas = MetricasArchivo(file_path.name)
+            zip_file, hash_original = self._empaquetar_archivo(
+                file_path, verbose, duplicados, metricas
+            )
+            return zip_file, hash_original, None, metricas
+        except Exception as e:
+            print(f"[X] ERROR al procesar {file_path.name}: {e}")
+            return None, None, str(e), None
+
+    def _empaquetar_archivo(self, file_path, verbose, duplicados=(), metricas=None):
+        """
+        Ejecuta el flujo de procesar_archivo sin capturar excepciones.
+
+        Returns:
+            tuple: (Path del ZIP final, hash SHA-256 del archivo original)
+        """
+        if metricas is None:
+            metricas = MetricasArchivo(file_path.name)
+        base_name = self.nombre_salida(file_path)
+
+        # Memoria acotada por el presupuesto del proceso (--max-memory)
+        chunk_size = self._reservar_memoria()
 
+        # PASOS 1-3: INTEGRIDAD + CODIFICACIÓN + CONFIDENCIALIDAD
+        # Una sola lectura en bloques: SHA-256, Base64 y AES-256-CBC
+        # (en formato 3: SHA-256 y AES-256-GCM por bloques en paralelo)
+        if verbose:
+            print(
+                f"[SEC] [STREAMING] SHA-256 + {'zlib + ' if self.compresion else ''}"
+                f"{'Base64 + ' if self.formato == 1 else ''}"
+                f"{self._algoritmo_cifrado()} "
+                f"(formato v{self.formato}, bloques de {chunk_size:,} bytes)..."
+            )
+        clave, iv = self.generar_clave_aes()
+        tamano_original = file_path.stat().st_size
+        zip_file = self.procesados_dir / f"{base_name}.zip"
+
+        try:
             with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(enc_file, enc_file.name)
-                zipf.write(hash_file, hash_file.name)
+                # El criptograma se escribe directo en el miembro del ZIP, sin
+                # archivo temporal. No es comprimible: se guarda sin deflate
+                info_enc = zipfile.ZipInfo(
+                    f"{base_name}.enc", date_time=datetime.now().timetuple()[:6]
+                )
+                info_enc.compress_type = zipfile.ZIP_STORED
+                # Base64 + relleno pueden superar 4/3 del original
+                zip64 = tamano_original * 3 // 2 + 1024 > zipfile.ZIP64_LIMIT
+
+                with zipf.open(info_enc, "w", force_zip64=zip64) as f:
+                    # Formato v1: [IV 16 bytes][Clave 32 bytes][Datos cifrados]
+                    # Formato v2: [Cabecera 18 bytes] + lo anterior, sin Base64
+                    # Formato v3: [Cabecera 18 bytes][Prefijo 7][Clave 32][Bloques]
+                    # NOTA: En producción, la clave se intercambiaría por canal separado
+                    if self.formato == 3:
+                        cabecera = self.construir_cabecera(tamano_original, chunk_size)
+                        prefijo = generar_prefijo()
+                        f.write(cabecera)
+                        f.write(prefijo)
+                        f.write(clave)
+                        hash_original, tamano_base64, tamano_cifrado = (
+                            self.cifrar_archivo_por_bloques(
+                                file_path,
+                                f,
+                                clave,
+                                prefijo,
+                                cabecera,
+                                tamano_esperado=tamano_original,
+                                metricas=metricas,
+                                chunk_size=chunk_size,
+                            )
+                        )
+                    else:
+                        if self.formato == 2:
+                            f.write(self.construir_cabecera(tamano_original, chunk_size))
+                        f.write(iv)
+                        f.write(clave)
+                        hash_original, tamano_base64, tamano_cifrado = (
+                            self.cifrar_archivo_streaming(
+                                file_path,
+                                f,
+                                clave,
+                                iv,
+                                tamano_esperado=(
+                                    tamano_original if self.formato == 2 else None
+                                ),
+                                metricas=metricas,
+                                chunk_size=chunk_size,
+                            )
+                        )
+
+                if verbose:
+                    print(f"   [OK] Hash: {hash_original[:32]}...")
+                    if self.formato == 1:
+                        print(f"   [OK] Codificado ({tamano_base64} bytes)")
+                    print(f"   [OK] Cifrado ({tamano_cifrado} bytes)")
+
+                # PASO 4: EMPAQUETADO - hash y metadata junto al criptograma
+                if verbose:
+                    print("📦 [EMPAQUETADO] Creando archivo ZIP...")
+
+                t = perf_counter()
+                hash_txt = (
+                    f"SHA-256: {hash_original}\n"
+                    f"Archivo: {file_path.name}\n"
+                    f"Fecha: {datetime.now().isoformat()}\n"
+                    f"Formato: {self.formato}\n"
+                )
+                if self.compresion:
+                    # Marca para decrypt_esicorp.py: descomprimir tras Base64
+                    hash_txt += "Compresion: zlib\n"
+                for nombre in duplicados:
+                    # decrypt_esicorp.py copia el archivo restaurado a cada nombre
+                    hash_txt += f"Duplicado: {nombre}\n"
+                zipf.writestr(f"{base_name}.hash.txt", hash_txt)
 
                 # Añadir metadata
                 metadata = f"""ESICORP - Archivo Seguro
 Archivo Original: {file_path.name}
 Procesado: {datetime.now().isoformat()}
 Hash SHA-256: {hash_original}
-Algoritmo Cifrado: AES-256-CBC
+Algoritmo Cifrado: {self._algoritmo_cifrado()}
+Formato: {self.DESCRIPCION_FORMATOS[self.formato]}
+Compresion: {"zlib (antes de Base64/AES)" if self.compresion else "ninguna"}
 """
                 zipf.writestr("metadata.txt", metadata)
+                t = metricas.etapa("metadatos", t, len(hash_txt) + len(metadata))
+            metricas.etapa("cierre", t)
+        except BaseException:
+            # No dejar un ZIP incompleto en ./procesados
+            zip_file.unlink(missing_ok=True)
+            raise
+        finally:
+            presupuesto.liberar(self.memoria_necesaria(chunk_size))
+
+        metricas.finalizar(tamano_original, zip_file.stat().st_size)
+        if verbose:
+            print(f"   [OK] ZIP creado: {zip_file.name}")
+            print(f"   Tamaño: {metricas.tamano_zip} bytes")
+            print("[OK] Procesamiento completado\n")
+
+        return zip_file, hash_original
+
+    @staticmethod
+    def nombre_salida(file_path):
+        """
+        Nombre base del ZIP, del .enc y del .hash.txt de un archivo.
 
-            # Limpiar archivos temporales
-            enc_file.unlink()
-            hash_file.unlink()
+        Es el nombre completo, con la Sede: los reportes de una misma Area y
+        fecha de distintas Sedes (Ventas-20-02-2025.lima y
+        Ventas-20-02-2025.santiago) generan ZIP distintos.
+        """
+        return file_path.name
 
-            if verbose:
-                print(f"   [OK] ZIP creado: {zip_file.name}")
-                print(f"   Tamaño: {zip_file.stat().st_size} bytes")
-                print("[OK] Procesamiento completado\n")
+    def _descartar_colisiones(self, archivos):
+        """
+        Quita los archivos cuyo ZIP tendría el mismo nombre que el de un
+        archivo anterior de la lista (mismo nombre en distintas carpetas).
 
-            return zip_file
+        Dos archivos así escribirían el mismo ZIP en ./procesados, a la vez con
+        jobs > 1, y el manifiesto los confundiría.
 
-        except Exception as e:
-            print(f"[X] ERROR al procesar {file_path.name}: {e}")
-            return None
+        Args:
+            archivos (list): Archivos Path, en orden de proceso
+
+        Returns:
+            list: Archivos sin colisiones, en el mismo orden
+        """
+        vistos = {}
+        unicos = []
+        for file_path in archivos:
+            # Sin distinguir mayúsculas: en Windows serían el mismo archivo
+            nombre = self.nombre_salida(file_path).casefold()
+            if nombre in vistos:
+                print(
+                    f"[X] Se omite {file_path}: su ZIP tendría el mismo nombre que el "
+                    f"de {vistos[nombre]} ({self.nombre_salida(file_path)}.zip). "
+                    "Renombre uno de los dos."
+                )
+                continue
+            vistos[nombre] = file_path
+            unicos.append(file_path)
+        return unicos
+
+    def procesar_lote(self, archivos):
+        """
+        Procesa una lista de archivos, en paralelo si jobs > 1.
+
+        Con jobs > 1 los archivos se reparten en un pool de hilos o procesos
+        según ``executor``. Los resultados se muestran y se devuelven en el
+        orden de ``archivos`` y un error en un archivo no detiene el lote.
+        No se envía un archivo nuevo al pool mientras los que están en curso
+        sumen más de ``max_bytes_en_vuelo`` (siempre se admite al menos uno).
+
+        Con ``deduplicar`` activo, los archivos de contenido idéntico se cifran
+        una sola vez: el ZIP del primero lleva los nombres de las copias.
+
+        Los archivos se procesan en el orden de ``orden`` y
+        ``areas_prioritarias`` (ver ordenar). Si dos archivos generarían el
+        mismo ZIP, se omite el segundo (ver _descartar_colisiones).
+
+        El ZIP de cada archivo (None si falló o se omitió) queda en
+        ``zip_por_archivo``; las copias deduplicadas apuntan al ZIP del
+        primero.
+
+        Args:
+            archivos (list): Lista de archivos Path a procesar
+
+        Returns:
+            list: Lista de archivos ZIP procesados exitosamente, en el orden
+            de proceso
+        """
+        archivos = self.ordenar(archivos)
+        copias = {}
+        self.copias_deduplicadas = 0
+        self.zip_por_archivo = {}
+        if self.deduplicar and len(archivos) > 1:
+            archivos, copias = self._agrupar_duplicados(archivos)
+        archivos = self._descartar_colisiones(archivos)
+
+        def nombres_copias(file_path):
+            return [
+                copia.name for copia in copias.get(file_path, ()) if copia.name != file_path.name
+            ]
+
+        if self.jobs <= 1 or len(archivos) <= 1:
+            resultados = [
+                self._procesar_archivo(file_path, duplicados=nombres_copias(file_path))
+                for file_path in archivos
+            ]
+            self._registrar_resultados(archivos, resultados, copias)
+            return [zip_file for zip_file, _, _, _ in resultados if zip_file]
+
+        print(
+            f"\n[PROC] Procesando {len(archivos)} archivo(s) con "
+            f"{self.jobs} worker(s) ({self.executor})..."
+        )
+
+        if self.executor == "process":
+            # Cada proceso tiene su propio presupuesto: se reparte el total
+            pool_cls = partial(
+                ProcessPoolExecutor,
+                initializer=memoria.configurar,
+                initargs=(memoria.limite_por_proceso(self.jobs),),
+            )
+        else:
+            pool_cls = ThreadPoolExecutor
+        resultados = [None] * len(archivos)
+        pendientes = {}  # future -> (índice, tamaño)
+        en_vuelo = 0
+        siguiente = 0  # próximo archivo a enviar al pool
+        mostrado = 0  # próximo resultado a mostrar
+
+        with pool_cls(max_workers=self.jobs) as pool:
+            while siguiente < len(archivos) or pendientes:
+                # Enviar mientras haya workers libres y bytes disponibles
+                while siguiente < len(archivos) and len(pendientes) < self.jobs:
+                    tamano = self._tamano_archivo(archivos[siguiente])
+                    if pendientes and en_vuelo + tamano > self.max_bytes_en_vuelo:
+                        break
+                    future = pool.submit(
+                        _procesar_en_worker,
+                        self,
+                        archivos[siguiente],
+                        nombres_copias(archivos[siguiente]),
+                    )
+                    pendientes[future] = (siguiente, tamano)
+                    en_vuelo += tamano
+                    siguiente += 1
+
+                terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for future in terminados:
+                    indice, tamano = pendientes.pop(future)
+                    en_vuelo -= tamano
+                    try:
+                        resultados[indice] = future.result()
+                    except Exception as e:
+                        resultados[indice] = (None, None, str(e), None)
+
+                # Mostrar en orden los resultados ya disponibles
+                while mostrado < len(archivos) and resultados[mostrado] is not None:
+                    zip_file, _, error, _ = resultados[mostrado]
+                    if zip_file:
+                        print(f"   [OK] {archivos[mostrado].name} -> {zip_file.name}")
+                    else:
+                        print(f"   [X] {archivos[mostrado].name}: {error}")
+                    mostrado += 1
+
+        self._registrar_resultados(archivos, resultados, copias)
+        return [zip_file for zip_file, _, _, _ in resultados if zip_file]
+
+    def _agrupar_duplicados(self, archivos):
+        """
+        Agrupa los archivos de contenido idéntico por su SHA-256.
+
+        Solo se calcula el hash de los archivos que comparten tamaño con otro;
+        el resto no puede tener duplicados. Las copias viajan en el ZIP del
+        primero, así que solo se agrupan archivos que van al mismo destino
+        (config.SFTP_RUTAS) y al mismo lote (``lote``).
+
+        Args:
+            archivos (list): Lista de archivos Path a procesar
+
+        Returns:
+            tuple: (archivos a procesar, en el orden original,
+                    dict archivo representante -> lista de copias)
+        """
+        por_tamano = {}
+        for file_path in archivos:
+            por_tamano.setdefault(self._tamano_archivo(file_path), []).append(file_path)
+
+        representante_de = {}  # copia -> primer archivo con el mismo contenido
+        for grupo in por_tamano.values():
+            if len(grupo) < 2:
+                continue
+            por_hash = {}
+            for file_path in grupo:
+                try:
+                    sha256 = self.calcular_hash_sha256(file_path)
+                except OSError:
+                    continue
+                clave = (sha256, *self._clave_envio(file_path))
+                por_hash.setdefault(clave, []).append(file_path)
+            for iguales in por_hash.values():
+                for copia in iguales[1:]:
+                    representante_de[copia] = iguales[0]
+
+        if not representante_de:
+            return archivos, {}
+
+        copias = {}
+        ahorrados = 0
+        for file_path in archivos:
+            if file_path in representante_de:
+                copias.setdefault(representante_de[file_path], []).append(file_path)
+                ahorrados += self._tamano_archivo(file_path)
+
+        self.copias_deduplicadas = len(representante_de)
+        print(
+            f"[i] Deduplicación: {len(representante_de)} copia(s) idéntica(s), "
+            f"{ahorrados:,} bytes que no se cifran ni se envían"
+        )
+        for representante, iguales in copias.items():
+            print(f"   • {representante.name} = {', '.join(c.name for c in iguales)}")
+
+        return [f for f in archivos if f not in representante_de], copias
+
+    def _clave_envio(self, file_path):
+        """
+        Destino y lote de un archivo: las copias de otro destino o de otro
+        lote no pueden viajar en el mismo ZIP.
+
+        Returns:
+            tuple: (clave de destino, clave de lote o None)
+        """
+        lote = clave_grupo(file_path.name, self.lote) if self.lote else None
+        return clave_de_destino(file_path.name), lote
+
+    def _registrar_resultados(self, archivos, resultados, copias=None):
+        """Registra en el manifiesto y en las métricas los archivos procesados."""
+        copias = copias or {}
+        for file_path, (zip_file, _, _, metricas) in zip(archivos, resultados):
+            self.zip_por_archivo[file_path] = zip_file
+            for copia in copias.get(file_path, ()):
+                self.zip_por_archivo[copia] = zip_file
+            if metricas is not None and self.metricas is not None:
+                self.metricas.agregar(metricas)
+
+        if self.manifiesto is None:
+            return
+        for file_path, (zip_file, hash_original, _, _) in zip(archivos, resultados):
+            if zip_file:
+                self.manifiesto.registrar_procesado(file_path, zip_file, hash_original)
+                # Las copias quedan asociadas al mismo ZIP
+                for copia in copias.get(file_path, ()):
+                    self.manifiesto.registrar_procesado(copia, zip_file, hash_original)
+        self.manifiesto.guardar()
+
+    def marcar_subido(self, zip_file):
+        """
+        Registra en el manifiesto que un ZIP se subió exitosamente.
+
+        Args:
+            zip_file (Path): ZIP subido
+        """
+        if self.manifiesto is not None:
+            self.manifiesto.marcar_subido(zip_file)
+
+    def guardar_manifiesto(self):
+        """Persiste el manifiesto, si está activo."""
+        if self.manifiesto is not None:
+            self.manifiesto.guardar()
+
+    def cerrar_metricas(self):
+        """Exporta y muestra el resumen de métricas, si se pidió metricas_out."""
+        if self.metricas is None or self.metricas.ruta is None:
+            return
+        self.metricas.mostrar_resumen(self.metricas.cerrar())
+        print(f"[i] Métricas exportadas a: {self.metricas.ruta}")
+
+    def __getstate__(self):
+        # El manifiesto se actualiza solo en el proceso principal: no se copia
+        # a los workers de ProcessPoolExecutor
+        estado = self.__dict__.copy()
+        estado["manifiesto"] = None
+        estado["metricas"] = None
+        return estado
+
+    @staticmethod
+    def _tamano_archivo(file_path):
+        """Tamaño en bytes de un archivo, o 0 si no se puede leer."""
+        try:
+            return file_path.stat().st_size
+        except OSError:
+            return 0
 
     def procesar_desde_ruta(self, ruta, es_carpeta=False):
         """
@@ -260,11 +991,7 @@ Algoritmo Cifrado: AES-256-CBC
             print(f"📄 Procesando archivo: {ruta.name}")
 
         # Procesar cada archivo
-        archivos_procesados = []
-        for file_path in archivos_a_procesar:
-            zip_file = self.procesar_archivo(file_path)
-            if zip_file:
-                archivos_procesados.append(zip_file)
+        archivos_procesados = self.procesar_lote(archivos_a_procesar)
 
         if archivos_procesados:
             print("\n" + "=" * 60)
@@ -287,6 +1014,39 @@ Algoritmo Cifrado: AES-256-CBC
         Returns:
             list: Lista de archivos ZIP procesados exitosamente
         """
+        seleccion = self.seleccionar_archivos(permitir_seleccion)
+        if seleccion is None:
+            return []
+        archivos_encontrados, reutilizados = seleccion
+
+        # Procesar cada archivo; los ZIP reutilizados se intercalan según el orden
+        archivos_procesados = self.ordenar(
+            reutilizados + self.procesar_lote(archivos_encontrados)
+        )
+
+        print("=" * 60)
+        print(
+            f"[OK] Procesamiento completado: {len(archivos_procesados)}/{len(archivos_encontrados) + len(reutilizados) - self.copias_deduplicadas} archivos"
+        )
+        print("=" * 60)
+
+        return archivos_procesados
+
+    def seleccionar_archivos(self, permitir_seleccion=True):
+        """
+        Busca los archivos a procesar (primera etapa de procesar_todos).
+
+        Con ``incremental`` activo se consulta el manifiesto: los archivos ya
+        subidos y sin cambios se omiten, y los ya procesados pero no subidos
+        reutilizan su ZIP existente.
+
+        Args:
+            permitir_seleccion (bool): Permitir procesar archivos sin patrón
+
+        Returns:
+            tuple: (archivos Path a procesar, ZIP ya procesados pendientes de
+                    subir), o None si no hay nada que procesar
+        """
         print("\n" + "=" * 60)
         print("BÚSQUEDA Y PROCESAMIENTO DE ARCHIVOS ESICORP")
         print("=" * 60)
@@ -294,6 +1054,11 @@ Algoritmo Cifrado: AES-256-CBC
         # Buscar archivos con patrón estricto
         archivos_encontrados = self.buscar_archivos(strict=True)
 
+        if not archivos_encontrados and self.filtros:
+            print(f"[!]  Ningún archivo coincide con los filtros: {self.filtros}")
+            print(f"   Directorio: {self.salida_dir.absolute()}")
+            return None
+
         if not archivos_encontrados:
             print("[!]  No se encontraron archivos con el patrón: Area-DD-MM-AAAA.Sede")
             print(f"   Directorio: {self.salida_dir.absolute()}")
@@ -316,7 +1081,7 @@ Algoritmo Cifrado: AES-256-CBC
 
                     if not archivos_encontrados:
                         print("\n[!]  No hay archivos en el directorio ./salida")
-                        return []
+                        return None
 
                     print(
                         f"\n[!]  Procesando {len(archivos_encontrados)} archivo(s) SIN validar patrón:"
@@ -324,9 +1089,9 @@ Algoritmo Cifrado: AES-256-CBC
                     for f in archivos_encontrados:
                         print(f"   • {f.name}")
                 else:
-                    return []
+                    return None
             else:
-                return []
+                return None
 
         else:
             print(
@@ -335,17 +1100,38 @@ Algoritmo Cifrado: AES-256-CBC
             for f in archivos_encontrados:
                 print(f"   • {f.name}")
 
-        # Procesar cada archivo
-        archivos_procesados = []
-        for file_path in archivos_encontrados:
-            zip_file = self.procesar_archivo(file_path)
-            if zip_file:
-                archivos_procesados.append(zip_file)
+        # Omitir archivos sin cambios desde la última ejecución
+        reutilizados = []
+        if self.incremental:
+            archivos_encontrados, reutilizados, omitidos = self.manifiesto.filtrar(
+                archivos_encontrados, self.calcular_hash_sha256, self.procesados_dir
+            )
+            self.manifiesto.guardar()
+            if omitidos or reutilizados:
+                print(
+                    f"[i] Manifiesto: {omitidos} ya enviado(s), "
+                    f"{len(reutilizados)} procesado(s) pendiente(s) de envío, "
+                    f"{len(archivos_encontrados)} nuevo(s) o modificado(s)"
+                )
 
-        print("=" * 60)
-        print(
-            f"[OK] Procesamiento completado: {len(archivos_procesados)}/{len(archivos_encontrados)} archivos"
-        )
-        print("=" * 60)
+        return archivos_encontrados, reutilizados
 
-        return archivos_procesados
+
+def _procesar_en_worker(processor, file_path, duplicados=()):
+    """
+    Procesa un archivo dentro de un worker de procesar_lote.
+
+    Se define a nivel de módulo para que ProcessPoolExecutor pueda serializarla.
+
+    Returns:
+        tuple: (Path del ZIP o None, hash SHA-256 o None, mensaje de error o None,
+                MetricasArchivo o None)
+    """
+    try:
+        metricas = MetricasArchivo(file_path.name)
+        zip_file, hash_original = processor._empaquetar_archivo(
+            file_path, verbose=False, duplicados=duplicados, metricas=metricas
+        )
+        return zip_file, hash_original, None, metricas
+    except Exception as e:
+        return None, None, str(e), None
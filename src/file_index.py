@@ -0,0 +1,192 @@
+"""
+Índice de archivos ESICORP - Descubrimiento con caché y filtros
+
+Recorre ./salida con os.scandir (opcionalmente de forma recursiva), extrae
+Area, fecha y Sede del nombre Area-DD-MM-AAAA.Sede y guarda el resultado en
+un índice en disco. En ejecuciones siguientes solo se vuelven a listar los
+directorios cuyo mtime cambió (alta o baja de archivos); del resto basta
+un stat del directorio.
+
+Nota: modificar un archivo existente no cambia el mtime de su directorio, por
+lo que tamaño y mtime de los registros pueden estar desactualizados. El
+manifiesto de procesamiento hace su propio stat antes de decidir.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+# fecha en ISO (AAAA-MM-DD) para que los filtros comparen como texto
+RegistroArchivo = namedtuple(
+    "RegistroArchivo", "ruta area fecha sede tamano mtime_ns"
+)
+
+VERSION_INDICE = 1
+
+
+class IndiceArchivos:
+    """Índice en caché de los archivos ESICORP de un directorio."""
+
+    # Area-DD-MM-AAAA.Sede con grupos (mismo patrón que ESICORPProcessor)
+    FILE_PATTERN = re.compile(
+        r"^(?P<area>[A-Za-z]+)-(?P<dia>\d{2})-(?P<mes>\d{2})-(?P<anio>\d{4})"
+        r"\.(?P<sede>[A-Za-z]+)$"
+    )
+
+    def __init__(self, raiz, cache_path=None, recursivo=False):
+        """
+        Inicializa el índice.
+
+        Args:
+            raiz (str/Path): Directorio a indexar
+            cache_path (str/Path): Archivo JSON de caché, o None para no persistir
+            recursivo (bool): Incluir subdirectorios
+        """
+        self.raiz = Path(raiz)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.recursivo = recursivo
+        self.directorios = self._cargar_cache()
+
+    def _cargar_cache(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (
+            cache.get("version") != VERSION_INDICE
+            or cache.get("raiz") != str(self.raiz.resolve())
+            or cache.get("recursivo") != self.recursivo
+        ):
+            return {}
+        return cache["directorios"]
+
+    def _guardar_cache(self):
+        if self.cache_path is None:
+            return
+        cache = {
+            "version": VERSION_INDICE,
+            "raiz": str(self.raiz.resolve()),
+            "recursivo": self.recursivo,
+            "directorios": self.directorios,
+        }
+        temporal = self.cache_path.with_suffix(".tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(cache, f, separators=(",", ":"))
+        os.replace(temporal, self.cache_path)
+
+    def _listar_directorio(self, ruta):
+        """
+        Lista un directorio con os.scandir.
+
+        Returns:
+            dict: {"archivos": [[nombre, area, fecha, sede, tamaño, mtime_ns]],
+                   "subdirs": [nombres]}
+        """
+        archivos = []
+        subdirs = []
+        with os.scandir(ruta) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subdirs.append(entrada.name)
+                        continue
+                    coincidencia = self.FILE_PATTERN.match(entrada.name)
+                    if not coincidencia or not entrada.is_file():
+                        continue
+                    stat = entrada.stat()
+                except OSError:
+                    continue
+                archivos.append(
+                    [
+                        entrada.name,
+                        coincidencia["area"],
+                        f"{coincidencia['anio']}-{coincidencia['mes']}-{coincidencia['dia']}",
+                        coincidencia["sede"],
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    ]
+                )
+        return {"archivos": archivos, "subdirs": subdirs}
+
+    def actualizar(self):
+        """
+        Sincroniza el índice con el disco y guarda la caché.
+
+        Returns:
+            int: Cantidad de directorios que hubo que volver a listar
+        """
+        vigentes = {}
+        relistados = 0
+        pendientes = ["."]
+
+        while pendientes:
+            relativo = pendientes.pop()
+            ruta = self.raiz / relativo
+            try:
+                mtime_ns = ruta.stat().st_mtime_ns
+            except OSError:
+                continue
+
+            entrada = self.directorios.get(relativo)
+            if entrada is None or entrada["mtime_ns"] != mtime_ns:
+                try:
+                    entrada = self._listar_directorio(ruta)
+                except OSError:
+                    continue
+                entrada["mtime_ns"] = mtime_ns
+                relistados += 1
+            vigentes[relativo] = entrada
+
+            if self.recursivo:
+                for subdir in entrada["subdirs"]:
+                    pendientes.append(os.path.normpath(os.path.join(relativo, subdir)))
+
+        self.directorios = vigentes
+        self._guardar_cache()
+        return relistados
+
+    def registros(self):
+        """
+        Returns:
+            list: Todos los RegistroArchivo del índice, ordenados por ruta
+        """
+        resultado = []
+        for relativo, entrada in self.directorios.items():
+            directorio = self.raiz / relativo
+            for nombre, area, fecha, sede, tamano, mtime_ns in entrada["archivos"]:
+                resultado.append(
+                    RegistroArchivo(directorio / nombre, area, fecha, sede, tamano, mtime_ns)
+                )
+        resultado.sort(key=lambda registro: str(registro.ruta))
+        return resultado
+
+    def filtrar(self, area=None, sede=None, desde=None, hasta=None):
+        """
+        Selecciona registros por Area, Sede y rango de fechas.
+
+        Args:
+            area (str): Area exacta (sin distinguir mayúsculas)
+            sede (str): Sede exacta (sin distinguir mayúsculas)
+            desde (str): Fecha mínima AAAA-MM-DD, inclusive
+            hasta (str): Fecha máxima AAAA-MM-DD, inclusive
+
+        Returns:
+            list: RegistroArchivo que cumplen todos los filtros indicados
+        """
+        area = area.casefold() if area else None
+        sede = sede.casefold() if sede else None
+        return [
+            registro
+            for registro in self.registros()
+            if (area is None or registro.area.casefold() == area)
+            and (sede is None or registro.sede.casefold() == sede)
+            and (desde is None or registro.fecha >= desde)
+            and (hasta is None or registro.fecha <= hasta)
+        ]
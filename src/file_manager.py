@@ -209,6 +209,45 @@ class FileManager:
         print_file(f"  ✅ Paquete guardado en: {package_path}")
         return package_path
 
+    def save_package_stream(self, original_path: str, nonce: bytes, write_ciphertext) -> str:
+        """
+        Igual que save_package, pero el criptograma lo escribe
+        ``write_ciphertext(f)`` directamente en el archivo, que devuelve el hash.
+
+        El hash va antes del criptograma: se reserva su lugar y se completa al final.
+        """
+        if not self.sender_dir:
+            raise Exception("Sesión no iniciada")
+
+        print_file("Generando Paquete Seguro (.enc) en streaming...")
+        package_path = os.path.join(self.sender_dir, "payload.enc")
+
+        with open(package_path, "wb") as f:
+            f.write(nonce)
+            f.write(b"0" * 64)
+            file_hash = write_ciphertext(f)
+            f.seek(len(nonce))
+            f.write(file_hash.encode("utf-8"))
+            f.seek(0, os.SEEK_END)
+            print_file(
+                f"  [Nonce: 12b] + [Hash: 64b] + [Ciphertext: {f.tell() - len(nonce) - 64}b]"
+            )
+
+        print_file(f"  ✅ Paquete guardado en: {package_path}")
+        return package_path
+
+    def open_package(self, package_path: str):
+        """
+        Abre un paquete para leer el criptograma en streaming.
+
+        Returns:
+            tuple: (archivo abierto posicionado al inicio del criptograma, nonce, hash)
+        """
+        f = open(package_path, "rb")
+        nonce = f.read(12)
+        file_hash = f.read(64).decode("utf-8")
+        return f, nonce, file_hash
+
     def read_package(self, package_path: str) -> tuple[bytes, str, bytes]:
         print_file("Leyendo Paquete Seguro...")
         with open(package_path, "rb") as f:
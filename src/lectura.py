@@ -0,0 +1,73 @@
+"""
+Lectura por bloques de archivos de entrada ESICORP
+
+Lector común para el cálculo de SHA-256 y el cifrado en streaming:
+- Archivos grandes (>= ESICORP_UMBRAL_MMAP): se mapean en memoria con mmap y
+  se entregan como vistas (memoryview) sin copiar, con aviso de lectura
+  secuencial al kernel (madvise / posix_fadvise)
+- Archivos pequeños: lecturas normales de chunk_size bytes
+
+Las vistas entregadas solo son válidas hasta pedir el siguiente bloque: quien
+necesite conservar datos debe copiarlos (bytes(bloque)).
+
+Nota: si otro proceso trunca el archivo mientras está mapeado, el acceso a la
+zona truncada termina el proceso con SIGBUS. En modo --watch los archivos solo
+se procesan cuando dejaron de cambiar.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import mmap
+import os
+from . import config
+
+
+def _aviso_secuencial(f):
+    """Indica al kernel que el archivo se leerá de principio a fin."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def leer_bloques(
+    file_path,
+    chunk_size=config.ESICORP_CHUNK_SIZE,
+    umbral_mmap=config.ESICORP_UMBRAL_MMAP,
+):
+    """
+    Recorre un archivo en bloques de chunk_size bytes.
+
+    Args:
+        file_path (Path): Archivo a leer
+        chunk_size (int): Tamaño de cada bloque
+        umbral_mmap (int): Tamaño a partir del cual se usa mmap
+            (0 o None para no usarlo nunca)
+
+    Yields:
+        bytes o memoryview: Bloques consecutivos del archivo
+    """
+    with open(file_path, "rb") as f:
+        _aviso_secuencial(f)
+        tamano = os.fstat(f.fileno()).st_size
+
+        if not umbral_mmap or tamano < umbral_mmap:
+            for bloque in iter(lambda: f.read(chunk_size), b""):
+                yield bloque
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            if hasattr(mapa, "madvise"):
+                mapa.madvise(mmap.MADV_SEQUENTIAL)
+            vista = memoryview(mapa)
+            try:
+                for inicio in range(0, tamano, chunk_size):
+                    bloque = vista[inicio : inicio + chunk_size]
+                    try:
+                        yield bloque
+                    finally:
+                        # mmap no se puede cerrar mientras haya vistas vivas
+                        bloque.release()
+            finally:
+                vista.release()
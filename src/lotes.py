@@ -0,0 +1,154 @@
+"""
+Lotes ESICORP - Agrupación de ZIP procesados en contenedores
+
+Con miles de reportes pequeños, cada ZIP individual cuesta una subida SFTP,
+un unzip remoto y una ejecución de decrypt_esicorp.py. Este módulo reempaqueta
+los ZIP de ./procesados en contenedores por Sede, por fecha o por tamaño, para
+que un solo envío y una sola desencriptación remota atiendan todo el grupo.
+
+Estructura de un contenedor (se descifra igual que un ZIP individual):
+- <base>.enc, <base>.hash.txt  de cada archivo
+- <base>.metadata.txt          metadata.txt original de cada archivo
+- indice.json                  índice del lote
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import json
+import re
+import shutil
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+CRITERIOS = ("sede", "fecha", "tamano")
+
+FECHA_PATTERN = re.compile(r"-(\d{2}-\d{2}-\d{4})\.")
+
+
+def leer_hash_txt(zipf):
+    """
+    Lee los campos del .hash.txt de un ZIP procesado.
+
+    Returns:
+        tuple: (nombre del miembro .hash.txt, dict de campos)
+    """
+    for nombre in zipf.namelist():
+        if nombre.endswith(".hash.txt"):
+            campos = {}
+            for linea in zipf.read(nombre).decode("utf-8").splitlines():
+                if ":" in linea:
+                    clave, valor = linea.split(":", 1)
+                    campos[clave.strip()] = valor.strip()
+            return nombre, campos
+    raise ValueError("el ZIP no contiene un archivo .hash.txt")
+
+
+def clave_grupo(nombre_original, criterio):
+    """Clave de agrupación de un archivo según el criterio."""
+    if criterio == "sede":
+        return nombre_original.rsplit(".", 1)[-1] if "." in nombre_original else "sin-sede"
+    if criterio == "fecha":
+        coincidencia = FECHA_PATTERN.search(nombre_original)
+        return coincidencia.group(1) if coincidencia else "sin-fecha"
+    return "tamano"
+
+
+def _copiar_miembro(zin, zout, nombre_origen, nombre_destino):
+    """Copia un miembro entre ZIP en streaming, conservando su compresión."""
+    info_origen = zin.getinfo(nombre_origen)
+    info = zipfile.ZipInfo(nombre_destino, date_time=info_origen.date_time)
+    info.compress_type = info_origen.compress_type
+    with zin.open(info_origen) as origen, zout.open(info, "w", force_zip64=True) as destino:
+        shutil.copyfileobj(origen, destino, 1024 * 1024)
+
+
+def empaquetar_lotes(zips, criterio, max_bytes, destino_dir, inicio=1):
+    """
+    Agrupa ZIP procesados en contenedores, uno por grupo (y por tope de tamaño).
+
+    Los ZIP individuales se eliminan una vez copiados a su contenedor.
+
+    Args:
+        zips (list): ZIP Path generados por ESICORPProcessor
+        criterio (str): "sede", "fecha" o "tamano"
+        max_bytes (int): Tamaño máximo aproximado de cada contenedor
+        destino_dir (Path): Directorio donde crear los contenedores
+        inicio (int): Número del primer contenedor (para no repetir nombres
+            entre llamadas hechas en el mismo segundo)
+
+    Returns:
+        list: Tuplas (Path del contenedor, lista de nombres de ZIP incluidos)
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f"criterio de lote no válido: {criterio}")
+
+    print("\n" + "=" * 60)
+    print(f"EMPAQUETADO EN LOTES (por {criterio})")
+    print("=" * 60)
+
+    # Agrupar conservando el orden de llegada dentro de cada grupo
+    grupos = {}
+    for zip_file in zips:
+        with zipfile.ZipFile(zip_file) as zin:
+            _, campos = leer_hash_txt(zin)
+        nombre_original = campos.get("Archivo", Path(zip_file).stem)
+        clave = clave_grupo(nombre_original, criterio)
+        grupos.setdefault(clave, []).append(Path(zip_file))
+
+    # Partir cada grupo según el tope de tamaño
+    lotes = []
+    for clave, miembros in grupos.items():
+        actual, tamano = [], 0
+        for zip_file in miembros:
+            tamano_zip = zip_file.stat().st_size
+            if actual and tamano + tamano_zip > max_bytes:
+                lotes.append((clave, actual))
+                actual, tamano = [], 0
+            actual.append(zip_file)
+            tamano += tamano_zip
+        if actual:
+            lotes.append((clave, actual))
+
+    marca = datetime.now().strftime("%Y%m%d-%H%M%S")
+    contenedores = []
+    for numero, (clave, miembros) in enumerate(lotes, inicio):
+        contenedor = Path(destino_dir) / f"Lote-{clave}-{marca}-{numero:03d}.zip"
+        indice = {
+            "lote": contenedor.name,
+            "criterio": criterio,
+            "creado": datetime.now().isoformat(),
+            "archivos": [],
+        }
+
+        with zipfile.ZipFile(contenedor, "w", zipfile.ZIP_DEFLATED) as zout:
+            for zip_file in miembros:
+                with zipfile.ZipFile(zip_file) as zin:
+                    nombre_hash, campos = leer_hash_txt(zin)
+                    base = nombre_hash[: -len(".hash.txt")]
+                    for nombre in zin.namelist():
+                        destino = f"{base}.metadata.txt" if nombre == "metadata.txt" else nombre
+                        _copiar_miembro(zin, zout, nombre, destino)
+                indice["archivos"].append(
+                    {
+                        "archivo": campos.get("Archivo"),
+                        "enc": f"{base}.enc",
+                        "hash": nombre_hash,
+                        "sha256": campos.get("SHA-256"),
+                        "zip": zip_file.name,
+                    }
+                )
+            zout.writestr("indice.json", json.dumps(indice, indent=1))
+
+        for zip_file in miembros:
+            zip_file.unlink()
+
+        print(
+            f"   [OK] {contenedor.name}: {len(miembros)} archivo(s), "
+            f"{contenedor.stat().st_size:,} bytes"
+        )
+        contenedores.append((contenedor, [zip_file.name for zip_file in miembros]))
+
+    print(f"[OK] {len(zips)} archivo(s) en {len(contenedores)} lote(s)")
+    print("=" * 60)
+    return contenedores
@@ -0,0 +1,182 @@
+"""
+Manifiesto de procesamiento ESICORP
+
+Registro persistente (JSON) de los archivos de ./salida ya procesados y
+subidos, para que cada ejecución solo procese archivos nuevos o modificados.
+
+Cada entrada se indexa por la ruta absoluta del archivo y guarda:
+- tamano, mtime_ns: detección rápida de cambios con una llamada a stat
+- sha256: confirma que el contenido no cambió cuando solo cambió mtime
+- zip: nombre del ZIP generado en ./procesados
+- estado: "procesado" o "subido"
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+class ManifiestoProcesamiento:
+    """Registro persistente del estado de procesamiento y envío."""
+
+    def __init__(self, ruta):
+        """
+        Carga el manifiesto desde disco (vacío si no existe o está dañado).
+
+        Args:
+            ruta (str/Path): Ruta del archivo JSON del manifiesto
+        """
+        self.ruta = Path(ruta)
+        self.entradas = {}
+        self.modificado = False
+        self._por_zip = None  # nombre de ZIP -> claves, se construye al usarse
+
+        if self.ruta.exists():
+            try:
+                with open(self.ruta, "r", encoding="utf-8") as f:
+                    self.entradas = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[!]  Manifiesto ilegible, se reconstruirá: {e}")
+                self.entradas = {}
+
+    @staticmethod
+    def _clave(file_path):
+        return str(Path(file_path).resolve())
+
+    def _entradas_por_zip(self):
+        if self._por_zip is None:
+            self._por_zip = {}
+            for clave, entrada in self.entradas.items():
+                self._por_zip.setdefault(entrada["zip"], set()).add(clave)
+        return self._por_zip
+
+    def guardar(self):
+        """Escribe el manifiesto de forma atómica (archivo temporal + rename)."""
+        if not self.modificado:
+            return
+        temporal = self.ruta.with_suffix(".tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.entradas, f, indent=1)
+        os.replace(temporal, self.ruta)
+        self.modificado = False
+
+    def sin_cambios(self, file_path, calcular_hash):
+        """
+        Indica si el archivo coincide con lo registrado en el manifiesto.
+
+        Compara tamaño y mtime; si solo difiere mtime, recalcula el SHA-256
+        y, si coincide, actualiza mtime sin considerarlo modificado.
+
+        Args:
+            file_path (Path): Archivo a comprobar
+            calcular_hash: Función que recibe una ruta y devuelve su SHA-256
+
+        Returns:
+            bool: True si el archivo no cambió desde su registro
+        """
+        entrada = self.entradas.get(self._clave(file_path))
+        if not entrada:
+            return False
+
+        stat = file_path.stat()
+        if stat.st_size != entrada["tamano"]:
+            return False
+        if stat.st_mtime_ns == entrada["mtime_ns"]:
+            return True
+
+        if calcular_hash(file_path) != entrada["sha256"]:
+            return False
+        entrada["mtime_ns"] = stat.st_mtime_ns
+        self.modificado = True
+        return True
+
+    def filtrar(self, archivos, calcular_hash, zip_dir):
+        """
+        Separa los archivos según lo que falte hacer con ellos.
+
+        Args:
+            archivos (list): Archivos Path encontrados en ./salida
+            calcular_hash: Función que recibe una ruta y devuelve su SHA-256
+            zip_dir (Path): Directorio donde están los ZIP procesados
+
+        Returns:
+            tuple: (archivos a procesar, ZIP ya procesados pendientes de subir,
+                    cantidad de archivos ya subidos que se omiten)
+        """
+        pendientes = []
+        reutilizables = []
+        omitidos = 0
+
+        for file_path in archivos:
+            if not self.sin_cambios(file_path, calcular_hash):
+                pendientes.append(file_path)
+                continue
+
+            entrada = self.entradas[self._clave(file_path)]
+            zip_file = Path(zip_dir) / entrada["zip"]
+            if entrada["estado"] == "subido":
+                omitidos += 1
+            elif zip_file.exists():
+                # Varias copias idénticas comparten el mismo ZIP
+                if zip_file not in reutilizables:
+                    reutilizables.append(zip_file)
+            else:
+                pendientes.append(file_path)
+
+        return pendientes, reutilizables, omitidos
+
+    def registrar_procesado(self, file_path, zip_file, sha256):
+        """
+        Registra un archivo recién procesado.
+
+        Args:
+            file_path (Path): Archivo original
+            zip_file (Path): ZIP generado
+            sha256 (str): Hash SHA-256 del archivo original
+        """
+        clave = self._clave(file_path)
+        nombre_zip = Path(zip_file).name
+        # Un ZIP regenerado ya no representa a las copias que tenía antes de
+        # este lote: se olvidan para que la próxima ejecución las procese
+        por_zip = self._entradas_por_zip()
+        for otra in list(por_zip.get(nombre_zip, ())):
+            entrada = self.entradas[otra]
+            if (
+                otra != clave
+                and entrada["estado"] == "procesado"
+                and entrada["sha256"] != sha256
+            ):
+                del self.entradas[otra]
+                por_zip[nombre_zip].discard(otra)
+
+        anterior = self.entradas.get(clave)
+        if anterior is not None:
+            por_zip.get(anterior["zip"], set()).discard(clave)
+        por_zip.setdefault(nombre_zip, set()).add(clave)
+
+        stat = file_path.stat()
+        self.entradas[clave] = {
+            "tamano": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "zip": nombre_zip,
+            "estado": "procesado",
+            "procesado": datetime.now().isoformat(),
+        }
+        self.modificado = True
+
+    def marcar_subido(self, zip_file):
+        """
+        Marca como subidos los archivos cuyo ZIP es zip_file.
+
+        Args:
+            zip_file (Path): ZIP subido exitosamente
+        """
+        for clave in self._entradas_por_zip().get(Path(zip_file).name, ()):
+            entrada = self.entradas[clave]
+            entrada["estado"] = "subido"
+            entrada["subido"] = datetime.now().isoformat()
+            self.modificado = True
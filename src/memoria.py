@@ -0,0 +1,137 @@
+"""
+Presupuesto de memoria del proceso (--max-memory)
+
+Un semáforo de bytes compartido por todo el proceso: antes de reservar
+buffers, cada etapa (cifrado ESICORP, empaquetado y descifrado del modo TCP)
+pide los bytes que va a usar y los devuelve al terminar. Si no hay
+presupuesto, la etapa espera o pasa a una variante con menos memoria
+(bloques más chicos o procesamiento en streaming).
+
+Sin límite configurado, reservar no bloquea ni cuesta nada.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import re
+import threading
+from contextlib import contextmanager
+
+UNIDADES = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+PATRON_TAMANO = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+
+def parsear_tamano(texto):
+    """
+    Convierte un tamaño como "512M", "1.5G", "64KiB" o "1048576" a bytes.
+
+    Args:
+        texto (str): Número con sufijo opcional K, M, G o T (base 1024)
+
+    Returns:
+        int: Bytes
+
+    Raises:
+        ValueError: Si el texto no es un tamaño válido
+    """
+    coincidencia = PATRON_TAMANO.match(str(texto))
+    if not coincidencia:
+        raise ValueError(f"tamaño inválido: {texto!r} (ej: 512M, 2G)")
+    numero, unidad = coincidencia.groups()
+    return int(float(numero) * UNIDADES[unidad.upper()])
+
+
+class PresupuestoMemoria:
+    """Semáforo de bytes: limita la memoria reservada a la vez."""
+
+    def __init__(self, limite=None):
+        """
+        Args:
+            limite (int): Bytes disponibles en total, o None para no limitar
+        """
+        self.limite = limite
+        self.en_uso = 0
+        self.pico = 0
+        self._condicion = threading.Condition()
+
+    def _ajustar(self, bytes_):
+        # Una reserva mayor que el límite se admite sola, como si fuera el límite
+        return min(bytes_, self.limite)
+
+    def cabe(self, bytes_):
+        """True si ``bytes_`` no supera el límite (aunque ahora esté en uso)."""
+        return self.limite is None or bytes_ <= self.limite
+
+    def intentar_reservar(self, bytes_):
+        """
+        Reserva sin esperar.
+
+        Returns:
+            bool: True si se reservó; False si no hay presupuesto ahora
+        """
+        if self.limite is None:
+            return True
+        bytes_ = self._ajustar(bytes_)
+        with self._condicion:
+            if self.en_uso + bytes_ > self.limite:
+                return False
+            self.en_uso += bytes_
+            self.pico = max(self.pico, self.en_uso)
+            return True
+
+    def reservar(self, bytes_):
+        """Reserva, esperando a que otras etapas liberen lo necesario."""
+        if self.limite is None:
+            return
+        bytes_ = self._ajustar(bytes_)
+        with self._condicion:
+            self._condicion.wait_for(lambda: self.en_uso + bytes_ <= self.limite)
+            self.en_uso += bytes_
+            self.pico = max(self.pico, self.en_uso)
+
+    def liberar(self, bytes_):
+        """Devuelve bytes reservados con reservar o intentar_reservar."""
+        if self.limite is None:
+            return
+        with self._condicion:
+            self.en_uso -= self._ajustar(bytes_)
+            self._condicion.notify_all()
+
+    @contextmanager
+    def reserva(self, bytes_):
+        """``with presupuesto.reserva(n):`` reserva n bytes durante el bloque."""
+        self.reservar(bytes_)
+        try:
+            yield
+        finally:
+            self.liberar(bytes_)
+
+
+# Presupuesto único del proceso
+presupuesto = PresupuestoMemoria()
+
+
+def configurar(limite):
+    """
+    Fija el límite del presupuesto del proceso.
+
+    También sirve como ``initializer`` de ProcessPoolExecutor, para dar a cada
+    worker su parte del presupuesto (ver limite_por_proceso).
+
+    Args:
+        limite (int): Bytes, o None para no limitar
+    """
+    with presupuesto._condicion:
+        presupuesto.limite = limite
+        presupuesto._condicion.notify_all()
+
+
+def limite_por_proceso(procesos):
+    """
+    Parte del presupuesto que corresponde a cada worker de un pool de procesos.
+
+    Returns:
+        int: Bytes por proceso, o None si no hay límite
+    """
+    if presupuesto.limite is None:
+        return None
+    return max(1, presupuesto.limite // max(1, procesos))
@@ -0,0 +1,258 @@
+"""
+Métricas de procesamiento ESICORP
+
+Tiempos por etapa, bytes de entrada/salida y memoria pico por archivo, con
+agregados por lote (p50/p95/p99) y exportación como JSON lines (--metrics-out).
+
+Etapas medidas en cifrar_archivo_streaming / _empaquetar_archivo:
+- lectura:   obtener el siguiente bloque del archivo (read o mmap)
+- sha256:    hash del bloque
+- zlib:      compresión (solo con --comprimir)
+- base64:    codificación (solo formato 1)
+- aes:       padding + AES-256-CBC
+- zip:       escritura del criptograma en el miembro .enc
+- metadatos: .hash.txt y metadata.txt
+- cierre:    cierre del ZIP (directorio central)
+
+Como las etapas se ejecutan bloque a bloque, cada tiempo es la suma de todos
+los bloques del archivo.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import json
+import sys
+from datetime import datetime
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ETAPAS = ("lectura", "sha256", "zlib", "base64", "aes", "zip", "metadatos", "cierre")
+PERCENTILES = (50, 95, 99)
+
+
+def rss_pico_mb():
+    """
+    Memoria residente máxima del proceso actual.
+
+    Returns:
+        float: MB, o None si la plataforma no lo permite
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(pico / divisor, 1)
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano; None si no hay valores."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, -(-p * len(ordenados) // 100) - 1)
+    return ordenados[indice]
+
+
+class MetricasArchivo:
+    """Tiempos y bytes por etapa del procesamiento de un archivo."""
+
+    def __init__(self, archivo):
+        """
+        Args:
+            archivo (str): Nombre del archivo procesado
+        """
+        self.archivo = archivo
+        self.segundos = {}
+        self.bytes_entrada = {}
+        self.bytes_salida = {}
+        self.total = 0.0
+        self.tamano = 0
+        self.tamano_zip = 0
+        self.rss_pico_mb = None
+        self._inicio = perf_counter()
+
+    def etapa(self, nombre, inicio, entrada=0, salida=None):
+        """
+        Suma a una etapa el tiempo transcurrido desde ``inicio``.
+
+        Pensado para encadenar mediciones sin bloques with:
+        ``t = metricas.etapa("sha256", t, len(bloque))``
+
+        Args:
+            nombre (str): Etapa (ver ETAPAS)
+            inicio (float): Valor de perf_counter() al comenzar la etapa
+            entrada (int): Bytes que entraron a la etapa
+            salida (int): Bytes que salieron (por defecto, igual a entrada)
+
+        Returns:
+            float: perf_counter() actual, inicio de la etapa siguiente
+        """
+        ahora = perf_counter()
+        self.segundos[nombre] = self.segundos.get(nombre, 0.0) + ahora - inicio
+        self.bytes_entrada[nombre] = self.bytes_entrada.get(nombre, 0) + entrada
+        self.bytes_salida[nombre] = self.bytes_salida.get(nombre, 0) + (
+            entrada if salida is None else salida
+        )
+        return ahora
+
+    def finalizar(self, tamano, tamano_zip):
+        """
+        Cierra la medición del archivo.
+
+        Args:
+            tamano (int): Bytes del archivo original
+            tamano_zip (int): Bytes del ZIP generado
+        """
+        self.total = perf_counter() - self._inicio
+        self.tamano = tamano
+        self.tamano_zip = tamano_zip
+        self.rss_pico_mb = rss_pico_mb()
+
+    def como_dict(self):
+        """
+        Returns:
+            dict: Registro JSON del archivo
+        """
+        etapas = {}
+        for nombre in ETAPAS:
+            if nombre not in self.segundos:
+                continue
+            segundos = self.segundos[nombre]
+            etapas[nombre] = {
+                "segundos": round(segundos, 6),
+                "bytes_entrada": self.bytes_entrada[nombre],
+                "bytes_salida": self.bytes_salida[nombre],
+                "mb_s": (
+                    round(self.bytes_entrada[nombre] / segundos / 1e6, 1)
+                    if segundos > 0 and self.bytes_entrada[nombre]
+                    else None
+                ),
+            }
+        return {
+            "tipo": "archivo",
+            "archivo": self.archivo,
+            "tamano": self.tamano,
+            "tamano_zip": self.tamano_zip,
+            "segundos": round(self.total, 6),
+            "rss_pico_mb": self.rss_pico_mb,
+            "etapas": etapas,
+        }
+
+
+class RegistroMetricas:
+    """Acumula las métricas de los archivos de una ejecución."""
+
+    def __init__(self, ruta=None):
+        """
+        Args:
+            ruta (str/Path): Archivo JSON lines donde se agregan los registros,
+                o None para solo acumular en memoria
+        """
+        self.ruta = ruta
+        self.archivos = []
+
+    def _escribir(self, registro):
+        if self.ruta is None:
+            return
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def agregar(self, metricas):
+        """
+        Registra las métricas de un archivo (y las escribe si hay ruta).
+
+        Args:
+            metricas (MetricasArchivo): Métricas de un archivo procesado
+        """
+        registro = metricas.como_dict()
+        registro["fecha"] = datetime.now().isoformat()
+        self.archivos.append(registro)
+        self._escribir(registro)
+
+    def resumen(self):
+        """
+        Agregados de la ejecución.
+
+        Returns:
+            dict: Totales, latencia por archivo y por etapa (p50/p95/p99) y
+            rendimiento en MB/s de cada etapa
+        """
+        latencias = [registro["segundos"] for registro in self.archivos]
+        resumen = {
+            "tipo": "resumen",
+            "fecha": datetime.now().isoformat(),
+            "archivos": len(self.archivos),
+            "bytes": sum(registro["tamano"] for registro in self.archivos),
+            "bytes_zip": sum(registro["tamano_zip"] for registro in self.archivos),
+            "segundos": round(sum(latencias), 6),
+            "rss_pico_mb": max(
+                (r["rss_pico_mb"] for r in self.archivos if r["rss_pico_mb"]),
+                default=None,
+            ),
+            "latencia": {f"p{p}": percentil(latencias, p) for p in PERCENTILES},
+            "etapas": {},
+        }
+        for nombre in ETAPAS:
+            medidas = [r["etapas"][nombre] for r in self.archivos if nombre in r["etapas"]]
+            if not medidas:
+                continue
+            segundos = sum(m["segundos"] for m in medidas)
+            entrada = sum(m["bytes_entrada"] for m in medidas)
+            tiempos = [m["segundos"] for m in medidas]
+            resumen["etapas"][nombre] = {
+                "segundos": round(segundos, 6),
+                "bytes_entrada": entrada,
+                "mb_s": round(entrada / segundos / 1e6, 1) if segundos > 0 and entrada else None,
+                **{f"p{p}": percentil(tiempos, p) for p in PERCENTILES},
+            }
+        return resumen
+
+    def cerrar(self):
+        """
+        Escribe el resumen al final del archivo JSON lines y empieza un
+        registro nuevo.
+
+        Returns:
+            dict: Resumen de la ejecución (ver resumen)
+        """
+        resumen = self.resumen()
+        if self.archivos:
+            self._escribir(resumen)
+        self.archivos = []
+        return resumen
+
+    def mostrar_resumen(self, resumen=None):
+        """Imprime el tiempo y el rendimiento de cada etapa."""
+        resumen = resumen or self.resumen()
+        if not resumen["archivos"]:
+            return
+
+        print("\n" + "=" * 60)
+        print("MÉTRICAS DE PROCESAMIENTO")
+        print("=" * 60)
+        latencia = resumen["latencia"]
+        print(
+            f"[INFO] {resumen['archivos']} archivo(s), {resumen['bytes']:,} bytes -> "
+            f"{resumen['bytes_zip']:,} bytes ZIP"
+        )
+        print(
+            f"[INFO] Latencia por archivo: p50 {latencia['p50']:.3f}s  "
+            f"p95 {latencia['p95']:.3f}s  p99 {latencia['p99']:.3f}s"
+        )
+        if resumen["rss_pico_mb"] is not None:
+            print(f"[INFO] Memoria pico (RSS): {resumen['rss_pico_mb']} MB")
+
+        total = sum(etapa["segundos"] for etapa in resumen["etapas"].values()) or 1
+        print(f"\n   {'Etapa':<10} {'Segundos':>10} {'%':>6} {'MB/s':>10}")
+        for nombre, etapa in resumen["etapas"].items():
+            mb_s = f"{etapa['mb_s']:,.1f}" if etapa["mb_s"] else "-"
+            print(
+                f"   {nombre:<10} {etapa['segundos']:>10.3f} "
+                f"{100 * etapa['segundos'] / total:>5.1f}% {mb_s:>10}"
+            )
+        print("=" * 60)
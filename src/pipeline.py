@@ -0,0 +1,427 @@
+"""
+Pipeline ESICORP - Búsqueda, proceso, subida y descifrado remoto solapados
+
+En el flujo por fases de --esicorp cada etapa espera a que la anterior termine
+con todos los archivos. Con --pipeline las etapas corren a la vez, cada una en
+sus propios hilos: mientras el archivo N se sube, el N+1 se cifra y el N-1 se
+descifra en el servidor. En lotes grandes el tiempo total se acerca al de la
+etapa más lenta en lugar de a la suma de todas.
+
+Entre dos etapas hay una cola de capacidad fija (PIPELINE_CAPACIDAD): si una
+etapa se atrasa, la anterior se bloquea al llenar la cola (contrapresión) en
+lugar de acumular ZIP pendientes sin límite.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from . import config, memoria
+from .enrutamiento import crear_destino, destino_de_zip, resolver_destino
+from .esicorp_processor import _procesar_en_worker
+
+_FIN = object()
+
+
+class Etapa:
+    """Una etapa del pipeline: una función aplicada por uno o más hilos."""
+
+    def __init__(self, nombre, funcion, hilos=1):
+        """
+        Args:
+            nombre (str): Nombre de la etapa (para el resumen)
+            funcion: Recibe un Trabajo y devuelve True si la etapa tuvo éxito
+            hilos (int): Hilos que atienden la etapa
+        """
+        self.nombre = nombre
+        self.funcion = funcion
+        self.hilos = max(1, hilos)
+        self.procesados = 0
+        self.fallidos = 0
+        self.segundos = 0.0  # tiempo ocupado, sumado entre hilos
+        self.espera = 0.0  # tiempo bloqueado por la cola siguiente llena
+        self._lock = threading.Lock()
+        self._activos = self.hilos
+
+    def registrar(self, segundos, espera, exito):
+        with self._lock:
+            self.procesados += 1
+            self.fallidos += 0 if exito else 1
+            self.segundos += segundos
+            self.espera += espera
+
+    def terminar_hilo(self):
+        """Returns: True si era el último hilo activo de la etapa."""
+        with self._lock:
+            self._activos -= 1
+            return self._activos == 0
+
+
+class Trabajo:
+    """Un archivo que recorre el pipeline."""
+
+    def __init__(self, archivo=None, zip_file=None, duplicados=()):
+        """
+        Args:
+            archivo (Path): Archivo original (None si el ZIP se reutiliza)
+            zip_file (Path): ZIP ya procesado, si se reutiliza
+            duplicados (list): Nombres de las copias idénticas del archivo
+        """
+        self.archivo = archivo
+        self.zip_file = zip_file
+        self.duplicados = list(duplicados)
+        self.hash_original = None
+        self.metricas = None
+        self.destino = None
+        self.remote_file = None
+        self.subido = False
+        self.descifrado = False
+        self.error = None
+        self.etapa_error = None
+
+    @property
+    def nombre(self):
+        return (self.archivo or self.zip_file).name
+
+
+class Pipeline:
+    """Ejecuta etapas encadenadas por colas acotadas."""
+
+    def __init__(self, etapas, capacidad=config.PIPELINE_CAPACIDAD):
+        """
+        Args:
+            etapas (list): Etapas en orden
+            capacidad (int): Trabajos en espera como máximo entre dos etapas
+        """
+        self.etapas = etapas
+        self.capacidad = max(1, capacidad)
+        self.segundos = 0.0
+
+    def _atender(self, indice, entrada, siguiente, salida):
+        """Bucle de un hilo de la etapa ``indice``."""
+        etapa = self.etapas[indice]
+        ultima = indice == len(self.etapas) - 1
+        while True:
+            trabajo = entrada.get()
+            if trabajo is _FIN:
+                if etapa.terminar_hilo():
+                    if ultima:
+                        salida.put(_FIN)
+                    else:
+                        for _ in range(self.etapas[indice + 1].hilos):
+                            siguiente.put(_FIN)
+                return
+
+            inicio = perf_counter()
+            try:
+                exito = etapa.funcion(trabajo)
+            except Exception as e:
+                trabajo.error = str(e)
+                exito = False
+            if not exito:
+                trabajo.error = trabajo.error or f"falló la etapa {etapa.nombre}"
+                trabajo.etapa_error = etapa.nombre
+            ocupado = perf_counter() - inicio
+
+            # Los trabajos fallidos salen del pipeline sin pasar por el resto
+            if ultima or not exito:
+                salida.put(trabajo)
+                etapa.registrar(ocupado, 0.0, exito)
+            else:
+                inicio = perf_counter()
+                siguiente.put(trabajo)
+                etapa.registrar(ocupado, perf_counter() - inicio, exito)
+
+    def ejecutar(self, trabajos):
+        """
+        Hace pasar los trabajos por todas las etapas.
+
+        Args:
+            trabajos: Iterable de Trabajo; se consume a medida que la primera
+                etapa tiene lugar en su cola
+
+        Yields:
+            Trabajo: Cada trabajo al salir del pipeline (completo o fallido),
+            en orden de llegada
+        """
+        inicio = perf_counter()
+        colas = [queue.Queue(self.capacidad) for _ in self.etapas]
+        salida = queue.Queue()
+        errores = []
+
+        hilos = []
+        for indice, etapa in enumerate(self.etapas):
+            siguiente = colas[indice + 1] if indice + 1 < len(colas) else None
+            for numero in range(etapa.hilos):
+                hilo = threading.Thread(
+                    target=self._atender,
+                    args=(indice, colas[indice], siguiente, salida),
+                    name=f"pipeline-{etapa.nombre}-{numero}",
+                    daemon=True,
+                )
+                hilo.start()
+                hilos.append(hilo)
+
+        def alimentar():
+            try:
+                for trabajo in trabajos:
+                    colas[0].put(trabajo)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                for _ in range(self.etapas[0].hilos):
+                    colas[0].put(_FIN)
+
+        alimentador = threading.Thread(target=alimentar, name="pipeline-busqueda", daemon=True)
+        alimentador.start()
+
+        for trabajo in iter(salida.get, _FIN):
+            yield trabajo
+
+        alimentador.join()
+        for hilo in hilos:
+            hilo.join()
+        self.segundos = perf_counter() - inicio
+        if errores:
+            raise errores[0]
+
+    def mostrar_resumen(self):
+        """Imprime el tiempo de cada etapa frente al tiempo total."""
+        print("\n" + "=" * 60)
+        print("RESUMEN DEL PIPELINE")
+        print("=" * 60)
+        print(
+            f"   {'Etapa':<10} {'Hilos':>5} {'OK':>5} {'Error':>5} "
+            f"{'Ocupado':>9} {'Espera':>8}"
+        )
+        for etapa in self.etapas:
+            print(
+                f"   {etapa.nombre:<10} {etapa.hilos:>5} "
+                f"{etapa.procesados - etapa.fallidos:>5} {etapa.fallidos:>5} "
+                f"{etapa.segundos:>8.2f}s {etapa.espera:>7.2f}s"
+            )
+        # Tiempo de cada etapa como si tuviera un solo hilo repartido entre los suyos
+        por_etapa = [etapa.segundos / etapa.hilos for etapa in self.etapas]
+        print(f"\n[INFO] Suma de etapas (secuencial): {sum(por_etapa):.2f}s")
+        print(f"[INFO] Etapa más lenta: {max(por_etapa, default=0):.2f}s")
+        print(f"[INFO] Tiempo total del pipeline: {self.segundos:.2f}s")
+        print("   (Espera: tiempo bloqueado porque la etapa siguiente estaba llena)")
+        print("=" * 60)
+
+
+class _Conexiones:
+    """Conexiones SFTP por hilo y por destino, abiertas a demanda."""
+
+    def __init__(self, sftp_mgr):
+        self.sftp_mgr = sftp_mgr
+        self._locales = threading.local()
+        self._abiertas = []
+        self._lock = threading.Lock()
+
+    def obtener(self, destino):
+        """
+        Returns:
+            sftp_client: Cliente SFTP de este hilo para ``destino``
+
+        Raises:
+            ConnectionError: Si no se pudo conectar
+        """
+        propias = self._locales.__dict__.setdefault("conexiones", {})
+        conexion = propias.get(destino)
+        if conexion is not None:
+            transporte = conexion[1].get_transport()
+            if transporte is not None and transporte.is_active():
+                return conexion[0]
+            self.sftp_mgr.cerrar_conexion(*conexion)
+
+        sftp_client, ssh_client = self.sftp_mgr.conectar_sftp(
+            hostname=destino.hostname, username=destino.username, port=destino.port
+        )
+        if sftp_client is None:
+            propias.pop(destino, None)
+            raise ConnectionError(f"no se pudo conectar a {destino.hostname}")
+        propias[destino] = (sftp_client, ssh_client)
+        with self._lock:
+            self._abiertas.append((sftp_client, ssh_client))
+        return sftp_client
+
+    def cerrar(self):
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for sftp_client, ssh_client in abiertas:
+            self.sftp_mgr.cerrar_conexion(sftp_client, ssh_client)
+
+
+class PipelineEnvio:
+    """Flujo --esicorp con las etapas proceso, subida y descifrado remoto solapadas."""
+
+    def __init__(
+        self,
+        processor,
+        sftp_mgr,
+        por_defecto,
+        hilos_subida=config.PIPELINE_HILOS_SUBIDA,
+        hilos_remoto=config.PIPELINE_HILOS_REMOTO,
+        capacidad=config.PIPELINE_CAPACIDAD,
+        descifrar_remoto=True,
+    ):
+        """
+        Args:
+            processor (ESICORPProcessor): Procesador configurado; sus ``jobs``
+                y ``executor`` definen los workers de la etapa de proceso
+            sftp_mgr (SFTPManager): Gestor de conexiones SFTP
+            por_defecto (Destino): Destino de los archivos sin ruta en
+                config.SFTP_RUTAS
+            hilos_subida (int): Subidas simultáneas
+            hilos_remoto (int): Extracciones/descifrados simultáneos en el servidor
+            capacidad (int): Trabajos en espera entre dos etapas
+            descifrar_remoto (bool): Extraer y descifrar en el servidor
+        """
+        self.processor = processor
+        self.sftp_mgr = sftp_mgr
+        self.por_defecto = crear_destino({}, por_defecto)
+        self.conexiones = _Conexiones(sftp_mgr)
+        self._scripts = {}  # destino -> decrypt_esicorp.py copiado
+        self._scripts_lock = threading.Lock()
+        self._pool = None
+
+        etapas = [
+            Etapa("proceso", self._procesar, processor.jobs),
+            Etapa("subida", self._subir, hilos_subida),
+        ]
+        if descifrar_remoto:
+            etapas.append(Etapa("remoto", self._descifrar_remoto, hilos_remoto))
+        self.pipeline = Pipeline(etapas, capacidad)
+
+    def _procesar(self, trabajo):
+        if trabajo.zip_file is not None:
+            # ZIP reutilizado del manifiesto
+            trabajo.destino = destino_de_zip(trabajo.zip_file, self.por_defecto)
+            return True
+
+        if self._pool is not None:
+            resultado = self._pool.submit(
+                _procesar_en_worker, self.processor, trabajo.archivo, trabajo.duplicados
+            ).result()
+        else:
+            resultado = self.processor._procesar_archivo(
+                trabajo.archivo, verbose=False, duplicados=trabajo.duplicados
+            )
+        trabajo.zip_file, trabajo.hash_original, trabajo.error, trabajo.metricas = resultado
+        if trabajo.zip_file is None:
+            return False
+        trabajo.destino = resolver_destino(trabajo.archivo.name, self.por_defecto)
+        return True
+
+    def _subir(self, trabajo):
+        sftp_client = self.conexiones.obtener(trabajo.destino)
+        with self._scripts_lock:
+            if trabajo.destino not in self._scripts:
+                self._scripts[trabajo.destino] = self.sftp_mgr.copiar_script_descifrado(
+                    sftp_client, trabajo.destino.remote_path.rstrip("/")
+                )
+
+        trabajo.remote_file = trabajo.destino.remote_path + trabajo.zip_file.name
+        trabajo.subido = self.sftp_mgr.transferir_archivo(
+            sftp_client, trabajo.zip_file, trabajo.remote_file
+        )
+        return trabajo.subido
+
+    def _descifrar_remoto(self, trabajo):
+        sftp_client = self.conexiones.obtener(trabajo.destino)
+        resultado = self.sftp_mgr.extraer_y_descifrar(
+            sftp_client,
+            trabajo.remote_file,
+            copiar_script=not self._scripts.get(trabajo.destino),
+            local_path=trabajo.zip_file,
+        )
+        trabajo.descifrado = bool(resultado)
+        if not resultado:
+            trabajo.error = resultado.error or (
+                "no restaurados en el servidor: " + ", ".join(resultado.fallidos)
+                if resultado.fallidos
+                else None
+            )
+        return trabajo.descifrado
+
+    def _trabajos(self, archivos, reutilizados, copias):
+        """Trabajos en el orden de proceso y envío del procesador."""
+        trabajos = [Trabajo(zip_file=zip_file) for zip_file in reutilizados]
+        for file_path in archivos:
+            duplicados = [
+                copia.name for copia in copias.get(file_path, ()) if copia.name != file_path.name
+            ]
+            trabajos.append(Trabajo(archivo=file_path, duplicados=duplicados))
+        return self.processor.ordenar(
+            trabajos, ruta=lambda trabajo: trabajo.archivo or trabajo.zip_file
+        )
+
+    def ejecutar(self, archivos, reutilizados=()):
+        """
+        Procesa, sube y descifra en el servidor los archivos dados.
+
+        El manifiesto y las métricas se actualizan en el hilo principal al
+        terminar, como en ESICORPProcessor.procesar_lote.
+
+        Args:
+            archivos (list): Archivos Path a procesar
+            reutilizados (list): ZIP ya procesados pendientes de subir
+
+        Returns:
+            list: Trabajos terminados (con ``subido``, ``descifrado`` y ``error``)
+        """
+        processor = self.processor
+        archivos = processor.ordenar(archivos)
+        copias = {}
+        processor.copias_deduplicadas = 0
+        processor.zip_por_archivo = {}
+        if processor.deduplicar and len(archivos) > 1:
+            archivos, copias = processor._agrupar_duplicados(archivos)
+        archivos = processor._descartar_colisiones(archivos)
+
+        etapas = self.pipeline.etapas
+        print(
+            f"\n[PROC] Pipeline: {len(archivos) + len(reutilizados)} archivo(s), "
+            + ", ".join(f"{etapa.nombre} x{etapa.hilos}" for etapa in etapas)
+            + f", cola {self.pipeline.capacidad}"
+        )
+
+        if processor.executor == "process" and processor.jobs > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=processor.jobs,
+                initializer=memoria.configurar,
+                initargs=(memoria.limite_por_proceso(processor.jobs),),
+            )
+
+        terminados = []
+        try:
+            for trabajo in self.pipeline.ejecutar(self._trabajos(archivos, reutilizados, copias)):
+                terminados.append(trabajo)
+                if trabajo.error:
+                    print(f"   [X] {trabajo.nombre} ({trabajo.etapa_error}): {trabajo.error}")
+                else:
+                    print(f"   [OK] {trabajo.nombre} -> {trabajo.remote_file}")
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            self.conexiones.cerrar()
+            self._registrar(terminados, copias)
+
+        self.pipeline.mostrar_resumen()
+        return terminados
+
+    def _registrar(self, terminados, copias):
+        """Registra en el manifiesto los ZIP creados y luego los subidos y restaurados."""
+        procesados = [t for t in terminados if t.archivo is not None]
+        self.processor._registrar_resultados(
+            [t.archivo for t in procesados],
+            [(t.zip_file, t.hash_original, t.error, t.metricas) for t in procesados],
+            copias,
+        )
+        for trabajo in terminados:
+            if trabajo.subido and trabajo.descifrado:
+                self.processor.marcar_subido(trabajo.zip_file)
+        self.processor.guardar_manifiesto()
@@ -0,0 +1,120 @@
+"""
+Planificación ESICORP - Orden de proceso y envío de los archivos
+
+Define en qué orden se procesan y se suben los archivos (--orden):
+- nombre:    orden de búsqueda, por ruta (comportamiento por defecto)
+- recientes: fecha del reporte (Area-DD-MM-AAAA) más nueva primero; sin fecha
+             en el nombre, se usa la fecha de modificación
+- pequenos:  menor tamaño primero (el primer archivo útil llega antes)
+- grandes:   mayor tamaño primero; con --jobs reparte mejor la carga entre
+             workers, porque los archivos chicos rellenan al final
+             (planificación LPT)
+
+Además, --prioridad-area Finanzas,Ventas pone esas Areas por delante, en ese
+orden, y dentro de cada Area se respeta la política elegida.
+
+Nuevas políticas: registrar_politica("nombre", clave, descendente).
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import re
+from . import config
+
+# Area-DD-MM-AAAA al inicio del nombre: vale para el original y para su ZIP
+PATRON_NOMBRE = re.compile(
+    r"^(?P<area>[A-Za-z]+)-(?P<dia>\d{2})-(?P<mes>\d{2})-(?P<anio>\d{4})"
+)
+
+
+def _area(ruta):
+    coincidencia = PATRON_NOMBRE.match(ruta.name)
+    return coincidencia["area"].casefold() if coincidencia else ""
+
+
+def _fecha(ruta):
+    """Fecha del reporte en ISO (AAAA-MM-DD), o "" si el nombre no la tiene."""
+    coincidencia = PATRON_NOMBRE.match(ruta.name)
+    if not coincidencia:
+        return ""
+    return f"{coincidencia['anio']}-{coincidencia['mes']}-{coincidencia['dia']}"
+
+
+def _stat(ruta):
+    try:
+        return ruta.stat()
+    except OSError:
+        return None
+
+
+def _tamano(ruta):
+    stat = _stat(ruta)
+    return stat.st_size if stat else 0
+
+
+def _reciente(ruta):
+    stat = _stat(ruta)
+    return _fecha(ruta), stat.st_mtime_ns if stat else 0
+
+
+# nombre -> (función clave sobre un Path, orden descendente) o None
+POLITICAS = {
+    "nombre": None,
+    "recientes": (_reciente, True),
+    "pequenos": (_tamano, False),
+    "grandes": (_tamano, True),
+}
+
+
+def registrar_politica(nombre, clave, descendente=False):
+    """
+    Agrega una política de orden.
+
+    Args:
+        nombre (str): Nombre para --orden
+        clave: Función que recibe un Path y devuelve el valor a comparar
+        descendente (bool): Ordenar de mayor a menor
+    """
+    POLITICAS[nombre] = (clave, descendente)
+
+
+def ordenar(
+    elementos,
+    politica=config.ESICORP_ORDEN,
+    areas_prioritarias=config.ESICORP_AREAS_PRIORITARIAS,
+    ruta=lambda elemento: elemento,
+):
+    """
+    Ordena archivos (o elementos asociados a un archivo) según una política.
+
+    El orden es estable: los empates conservan el orden recibido.
+
+    Args:
+        elementos: Iterable a ordenar
+        politica (str): Clave de POLITICAS
+        areas_prioritarias (list): Areas que van primero, en ese orden
+        ruta: Función que devuelve el Path de cada elemento
+
+    Returns:
+        list: Elementos ordenados
+
+    Raises:
+        ValueError: Si la política no existe
+    """
+    if politica not in POLITICAS:
+        raise ValueError(
+            f"política de orden desconocida: {politica} (opciones: {', '.join(POLITICAS)})"
+        )
+    elementos = list(elementos)
+
+    criterio = POLITICAS[politica]
+    if criterio is not None:
+        clave, descendente = criterio
+        elementos.sort(key=lambda elemento: clave(ruta(elemento)), reverse=descendente)
+
+    if areas_prioritarias:
+        prioridad = {area.casefold(): i for i, area in enumerate(areas_prioritarias)}
+        elementos.sort(
+            key=lambda elemento: prioridad.get(_area(ruta(elemento)), len(prioridad))
+        )
+    return elementos
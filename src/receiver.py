@@ -1,6 +1,10 @@
 import os
 import base64
+import hashlib
 import traceback
+from . import config
+from .cifrado_bloques import memoria_flujo
+from .memoria import presupuesto
 from .utils import (
     print_banner,
     print_phase,
@@ -52,25 +56,19 @@ class Receiver:
         try:
             print_phase("DESENCRIPTADO AUTOMÁTICO")
             
-            print_action("1. Leyendo paquete...")
-            nonce, original_hash, ciphertext = self.file_manager.read_package(file_path)
-            
-            print_action("2. Descifrando (AES-GCM)...")
-            decrypted_data = self.crypto.decrypt_data(nonce, ciphertext)
-            zip_content = base64.b64decode(decrypted_data)
+            print_action("1-2. Leyendo y descifrando paquete (AES-GCM)...")
+            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_decrypted.zip")
+            original_hash, current_hash = self.recover_zip(file_path, temp_zip)
             
             print_action("3. Verificando integridad (SHA-256)...")
-            current_hash = self.crypto.generate_hash(zip_content)
-            
             if current_hash != original_hash:
+                self.file_manager.cleanup(temp_zip)
                 print_error("❌ ERROR DE INTEGRIDAD - Hash no coincide")
                 return False
             
             print_success("✅ Integridad verificada")
             
             print_action("4. Descomprimiendo...")
-            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_decrypted.zip")
-            self.file_manager.write_binary(temp_zip, zip_content)
             final_path = self.file_manager.decompress_file(temp_zip)
             self.file_manager.cleanup(temp_zip)
             
@@ -108,26 +106,18 @@ class Receiver:
             
             print_phase("PROCESO DE DESENCRIPTADO")
             
-            print_action("1. Leyendo paquete cifrado...")
-            nonce, original_hash, ciphertext = self.file_manager.read_package(enc_file_path)
-            print_info(f"   - Nonce: {nonce.hex()[:20]}...")
-            print_info(f"   - Hash original: {original_hash[:32]}...")
-            print_info(f"   - Tamaño cifrado: {len(ciphertext)} bytes")
-            
-            print_action("2. Descifrando con AES-256-GCM...")
-            decrypted_data = self.crypto.decrypt_data(nonce, ciphertext)
+            print_action("1-3. Leyendo, descifrando (AES-256-GCM) y decodificando Base64...")
+            print_info(f"   - Tamaño del paquete: {os.path.getsize(enc_file_path)} bytes")
+            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_local_decrypt.zip")
+            original_hash, current_hash = self.recover_zip(enc_file_path, temp_zip)
             print_success("   ✓ Descifrado exitoso")
             
-            print_action("3. Decodificando Base64...")
-            zip_content = base64.b64decode(decrypted_data)
-            print_info(f"   - Tamaño descomprimido: {len(zip_content)} bytes")
-            
             print_action("4. Verificando integridad (SHA-256)...")
-            current_hash = self.crypto.generate_hash(zip_content)
             print_info(f"   - Hash calculado: {current_hash[:32]}...")
             print_info(f"   - Hash esperado:  {original_hash[:32]}...")
             
             if current_hash != original_hash:
+                self.file_manager.cleanup(temp_zip)
                 print_error("❌ ERROR DE INTEGRIDAD - Los hashes no coinciden")
                 print_info("El archivo puede estar corrupto o haber sido modificado")
                 return False
@@ -135,8 +125,6 @@ class Receiver:
             print_success("   ✓ Integridad verificada correctamente")
             
             print_action("5. Descomprimiendo archivos...")
-            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_local_decrypt.zip")
-            self.file_manager.write_binary(temp_zip, zip_content)
             final_path = self.file_manager.decompress_file(temp_zip)
             self.file_manager.cleanup(temp_zip)
             
@@ -165,22 +153,18 @@ class Receiver:
             print("\n[DESENCRIPTANDO...]")
             print_phase("1. LECTURA DEL PAQUETE")
             print_action("Extrayendo componentes del archivo cifrado...")
-            nonce, original_hash, ciphertext = self.file_manager.read_package(file_path)
-
             print_phase("2. DESCIFRADO (AES-GCM)")
             print_action("Verificando autenticidad y descifrando...")
-            decrypted_data = self.crypto.decrypt_data(nonce, ciphertext)
+            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_decrypted.zip")
+            original_hash, current_hash = self.recover_zip(file_path, temp_zip)
             print_success("Descifrado exitoso. La clave es correcta y el Tag GCM es válido.")
 
-            zip_content = base64.b64decode(decrypted_data)
-
             print_phase("3. VERIFICACIÓN DE INTEGRIDAD")
-            print_action("Recalculando hash SHA-256...")
-            current_hash = self.crypto.generate_hash(zip_content)
             print_info(f"Hash calculado: {current_hash}")
             print_info(f"Hash original : {original_hash}")
 
             if current_hash != original_hash:
+                self.file_manager.cleanup(temp_zip)
                 print_error("¡ERROR DE INTEGRIDAD! Hash no coincide.")
                 print_info("Esto indica que el archivo fue modificado después de ser generado por el emisor.")
                 return False
@@ -189,8 +173,6 @@ class Receiver:
 
             print_phase("4. DESCOMPRESIÓN")
             print_action("Restaurando archivos originales...")
-            temp_zip = os.path.join(self.file_manager.receiver_dir, "temp_decrypted.zip")
-            self.file_manager.write_binary(temp_zip, zip_content)
             final_path = self.file_manager.decompress_file(temp_zip)
             self.file_manager.cleanup(temp_zip)
 
@@ -206,15 +188,8 @@ class Receiver:
         try:
             print("\n[VALIDANDO...]")
             print_phase("VALIDACIÓN DE INTEGRIDAD")
-            print_action("Leyendo paquete...")
-            nonce, original_hash, ciphertext = self.file_manager.read_package(file_path)
-
-            print_action("Descifrando para obtener contenido original...")
-            decrypted_data = self.crypto.decrypt_data(nonce, ciphertext)
-            zip_content = base64.b64decode(decrypted_data)
-
-            print_action("Recalculando Hash...")
-            current_hash = self.crypto.generate_hash(zip_content)
+            print_action("Leyendo y descifrando para obtener contenido original...")
+            original_hash, current_hash = self.recover_zip(file_path)
 
             if current_hash == original_hash:
                 print_success("✅ INTEGRIDAD OK.")
@@ -227,3 +202,78 @@ class Receiver:
         except Exception as e:
             print_error(f"Error: {e}")
             return False
+
+    def recover_zip(self, file_path, temp_zip=None):
+        """
+        Descifra un paquete y recupera el ZIP original.
+
+        En memoria, el criptograma, el Base64 y el ZIP ocupan unas 4 veces el
+        tamaño del paquete. Si el presupuesto de memoria (--max-memory) no
+        alcanza y el paquete está cifrado por bloques, se descifra en
+        streaming; los paquetes AES-GCM de un solo bloque esperan presupuesto.
+
+        Args:
+            file_path (str): Paquete .enc
+            temp_zip (str): Dónde escribir el ZIP recuperado (None para solo
+                verificar). Solo queda escrito si el hash coincide.
+
+        Returns:
+            tuple: (hash original del paquete, hash calculado)
+        """
+        necesario = 4 * os.path.getsize(file_path)
+        if presupuesto.cabe(necesario) and presupuesto.intentar_reservar(necesario):
+            try:
+                return self._recover_zip_in_memory(file_path, temp_zip)
+            finally:
+                presupuesto.liberar(necesario)
+
+        f, nonce, original_hash = self.file_manager.open_package(file_path)
+        with f:
+            if self.crypto.is_chunked(nonce):
+                print_info("Presupuesto de memoria insuficiente: descifrando en streaming")
+                with presupuesto.reserva(memoria_flujo(hilos=config.AEAD_HILOS)):
+                    return original_hash, self._recover_zip_streaming(f, nonce, temp_zip)
+
+        print_info("Esperando presupuesto de memoria para descifrar el paquete...")
+        with presupuesto.reserva(necesario):
+            return self._recover_zip_in_memory(file_path, temp_zip)
+
+    def _recover_zip_in_memory(self, file_path, temp_zip):
+        nonce, original_hash, ciphertext = self.file_manager.read_package(file_path)
+        decrypted_data = self.crypto.decrypt_package_data(nonce, ciphertext)
+        del ciphertext
+        zip_content = base64.b64decode(decrypted_data)
+        del decrypted_data
+        current_hash = self.crypto.generate_hash(zip_content)
+        if temp_zip and current_hash == original_hash:
+            self.file_manager.write_binary(temp_zip, zip_content)
+        return original_hash, current_hash
+
+    def _recover_zip_streaming(self, f, nonce, temp_zip):
+        """Descifra, decodifica y calcula el hash bloque a bloque; devuelve el hash."""
+        sha256 = hashlib.sha256()
+        resto = b""  # Base64 decodifica en grupos de 4 caracteres
+        salida = open(temp_zip, "wb") if temp_zip else None
+
+        def write(claro):
+            nonlocal resto
+            datos = resto + claro
+            corte = len(datos) - len(datos) % 4
+            resto = datos[corte:]
+            crudo = base64.b64decode(datos[:corte])
+            sha256.update(crudo)
+            if salida:
+                salida.write(crudo)
+
+        try:
+            self.crypto.decrypt_stream_chunked(nonce, f.read, write)
+            if resto:
+                raise ValueError("Base64 incompleto al final del paquete")
+        except BaseException:
+            if salida:
+                salida.close()
+                self.file_manager.cleanup(temp_zip)
+            raise
+        if salida:
+            salida.close()
+        return sha256.hexdigest()
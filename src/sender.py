@@ -1,7 +1,11 @@
 import os
 import base64
+import hashlib
 import traceback
 from datetime import datetime
+from . import config
+from .cifrado_bloques import memoria_flujo, reagrupar
+from .memoria import presupuesto
 from .utils import (
     print_banner,
     print_phase,
@@ -43,17 +47,7 @@ class Sender:
             print_phase("1. PREPARACIÓN Y COMPRESIÓN")
             zip_path = self.file_manager.compress_path(archivo)
             
-            print_phase("2. INTEGRIDAD (HASHING)")
-            zip_content = self.file_manager.read_binary(zip_path)
-            file_hash = self.crypto.generate_hash(zip_content)
-            print_info(f"Hash SHA-256: {file_hash}")
-            
-            print_phase("3. CONFIDENCIALIDAD (CIFRADO)")
-            encoded_content = base64.b64encode(zip_content)
-            nonce, ciphertext = self.crypto.encrypt_data(encoded_content)
-            
-            print_phase("4. EMPAQUETADO")
-            pkg_path = self.file_manager.save_package(archivo, nonce, file_hash, ciphertext)
+            pkg_path = self.build_package(archivo, zip_path)
             self.file_manager.cleanup(zip_path)
             
             print_phase("5. TRANSMISIÓN POR RED")
@@ -80,18 +74,33 @@ class Sender:
             traceback.print_exc()
             return False
 
-    def send_interactive(self, get_input_path_func, dest_ip, dest_port, security_code, session_id):
-        """Modo emisor interactivo (usado por el menú)."""
-        path = get_input_path_func()
-        if not path:
-            return False
+    def build_package(self, original_path, zip_path):
+        """
+        Fases 2-4: hash, cifrado y empaquetado del ZIP.
 
-        try:
-            print("\n[PROCESANDO ARCHIVO...]")
-            print_phase("1. PREPARACIÓN Y COMPRESIÓN")
-            print_action("Iniciando compresión y sanitización...")
-            zip_path = self.file_manager.compress_path(path)
+        En memoria, el ZIP, su Base64 y el criptograma ocupan unas 4 veces el
+        tamaño del ZIP. Si el presupuesto de memoria (--max-memory) no alcanza,
+        el paquete se genera en streaming, con memoria acotada por bloque. Los
+        dos caminos producen el mismo formato de paquete.
+
+        Por defecto el criptograma es un único AES-GCM (encrypt_data), el
+        formato que entienden todos los receptores. Con
+        config.TCP_CIFRADO_POR_BLOQUES se cifra por bloques en paralelo
+        (encrypt_data_chunked), que solo descifra un Receiver actualizado.
+        """
+        por_bloques = config.TCP_CIFRADO_POR_BLOQUES
+        necesario = 4 * os.path.getsize(zip_path)
+        if not (presupuesto.cabe(necesario) and presupuesto.intentar_reservar(necesario)):
+            print_info("Presupuesto de memoria insuficiente: cifrando en streaming")
+            memoria = (
+                memoria_flujo(hilos=config.AEAD_HILOS)
+                if por_bloques
+                else 2 * config.AEAD_TAMANO_BLOQUE
+            )
+            with presupuesto.reserva(memoria):
+                return self._build_package_streaming(original_path, zip_path, por_bloques)
 
+        try:
             print_phase("2. INTEGRIDAD (HASHING)")
             print_action("Calculando hash SHA-256 del archivo comprimido...")
             zip_content = self.file_manager.read_binary(zip_path)
@@ -99,15 +108,66 @@ class Sender:
             print_info(f"Hash SHA-256 original: {file_hash}")
 
             print_phase("3. CONFIDENCIALIDAD (CIFRADO)")
-            print_action("Cifrando datos con AES-256-GCM...")
             encoded_content = base64.b64encode(zip_content)
-            nonce, ciphertext = self.crypto.encrypt_data(encoded_content)
+            del zip_content
+            if por_bloques:
+                print_action("Cifrando datos con AES-256-GCM por bloques...")
+                nonce, ciphertext = self.crypto.encrypt_data_chunked(encoded_content)
+            else:
+                print_action("Cifrando datos con AES-256-GCM...")
+                nonce, ciphertext = self.crypto.encrypt_data(encoded_content)
+            del encoded_content
 
             print_phase("4. EMPAQUETADO")
             print_action("Generando estructura de transporte (.enc)...")
-            pkg_path = self.file_manager.save_package(path, nonce, file_hash, ciphertext)
+            pkg_path = self.file_manager.save_package(original_path, nonce, file_hash, ciphertext)
+        finally:
+            presupuesto.liberar(necesario)
+        print_success(f"Paquete seguro listo en: {pkg_path}")
+        return pkg_path
+
+    def _build_package_streaming(self, original_path, zip_path, por_bloques):
+        """Hash, Base64 y cifrado en una sola lectura del ZIP."""
+        print_phase("2-4. INTEGRIDAD, CIFRADO Y EMPAQUETADO (STREAMING)")
+        sha256 = hashlib.sha256()
+        # Múltiplo de 3: el Base64 de cada lectura no lleva relleno intermedio
+        lectura = max(3, config.AEAD_TAMANO_BLOQUE // 4 * 3)
+
+        def bloques_base64():
+            with open(zip_path, "rb") as f:
+                for trozo in iter(lambda: f.read(lectura), b""):
+                    sha256.update(trozo)
+                    yield base64.b64encode(trozo)
+
+        def write_ciphertext(f):
+            if por_bloques:
+                self.crypto.encrypt_stream_chunked(
+                    nonce, reagrupar(bloques_base64(), config.AEAD_TAMANO_BLOQUE), f.write
+                )
+            else:
+                self.crypto.encrypt_stream(nonce, bloques_base64(), f.write)
+            return sha256.hexdigest()
+
+        nonce = self.crypto.new_chunked_nonce() if por_bloques else os.urandom(12)
+        pkg_path = self.file_manager.save_package_stream(original_path, nonce, write_ciphertext)
+        print_info(f"Hash SHA-256 original: {sha256.hexdigest()}")
+        print_success(f"Paquete seguro listo en: {pkg_path}")
+        return pkg_path
+
+    def send_interactive(self, get_input_path_func, dest_ip, dest_port, security_code, session_id):
+        """Modo emisor interactivo (usado por el menú)."""
+        path = get_input_path_func()
+        if not path:
+            return False
+
+        try:
+            print("\n[PROCESANDO ARCHIVO...]")
+            print_phase("1. PREPARACIÓN Y COMPRESIÓN")
+            print_action("Iniciando compresión y sanitización...")
+            zip_path = self.file_manager.compress_path(path)
+
+            pkg_path = self.build_package(path, zip_path)
             self.file_manager.cleanup(zip_path)
-            print_success(f"Paquete seguro listo en: {pkg_path}")
 
             print("\n[TRANSMITIENDO...]")
             print_phase("5. TRANSMISIÓN POR RED")
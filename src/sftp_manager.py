@@ -9,8 +9,15 @@ Este módulo proporciona funcionalidad reutilizable para:
 Autor: Grupo ESICORP - UNAD
 """
 
+import json
 import os
-from pathlib import Path
+import shutil
+import tempfile
+import threading
+import zipfile
+from pathlib import Path, PurePosixPath
+from . import config
+from .worker_remoto import ErrorWorker, ResultadoRemoto, WorkerRemoto
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
@@ -24,13 +31,30 @@ except ImportError:
 class SFTPManager:
     """Gestor de conexiones SFTP y llaves RSA."""
 
-    def __init__(self, keys_dir="./keys"):
+    def __init__(
+        self,
+        keys_dir="./keys",
+        workers_remoto=config.DECRYPT_WORKERS_REMOTO,
+        worker_residente=config.DECRYPT_WORKER_RESIDENTE,
+        reintentos_remoto=config.DECRYPT_REINTENTOS,
+    ):
         """
         Inicializa el gestor SFTP.
 
         Args:
             keys_dir (str): Directorio para almacenar llaves RSA
+            workers_remoto (int): Procesos de decrypt_esicorp.py en el
+                servidor (0 = uno por CPU)
+            worker_residente (bool): Descifrar con un decrypt_esicorp.py
+                --worker por sesión SSH en lugar de un proceso por ZIP
+            reintentos_remoto (int): Veces que se reenvían solo los .enc que
+                no se restauraron en el servidor (0 = no reintentar)
         """
+        self.workers_remoto = workers_remoto
+        self.worker_residente = worker_residente
+        self.reintentos_remoto = reintentos_remoto
+        self._workers = {}  # (transporte, directorio remoto) -> WorkerRemoto o None
+        self._workers_lock = threading.Lock()
         self.keys_dir = Path(keys_dir)
         self.keys_dir.mkdir(exist_ok=True)
         self.private_key_path = self.keys_dir / "id_rsa"
@@ -201,6 +225,8 @@ class SFTPManager:
         """
         Sube un archivo al servidor SFTP con output muy descriptivo.
 
+        Equivale a transferir_archivo seguido de extraer_y_descifrar.
+
         Args:
             sftp_client: Cliente SFTP conectado
             local_path (str/Path): Ruta local del archivo
@@ -208,7 +234,32 @@ class SFTPManager:
             extraer (bool): Si True, extrae el ZIP en el servidor
 
         Returns:
-            bool: True si la subida fue exitosa
+            False si la transferencia falló; si se descifró en el servidor, el
+            ResultadoRemoto (verdadero solo si se restauraron todos los .enc);
+            si no, True
+        """
+        if not self.transferir_archivo(sftp_client, local_path, remote_path):
+            return False
+
+        resultado = True
+        if extraer and Path(local_path).suffix == ".zip":
+            print()
+            resultado = self.extraer_y_descifrar(sftp_client, remote_path, local_path=local_path)
+
+        print("=" * 60)
+        return resultado
+
+    def transferir_archivo(self, sftp_client, local_path, remote_path):
+        """
+        Transfiere un archivo por SFTP y verifica su tamaño en el servidor.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            local_path (str/Path): Ruta local del archivo
+            remote_path (str): Ruta remota de destino
+
+        Returns:
+            bool: True si el archivo remoto quedó completo
         """
         try:
             local_path = Path(local_path)
@@ -241,125 +292,6 @@ class SFTPManager:
                 print(f"    Remoto: {remote_size:,} bytes")
                 return False
 
-            # Extraer ZIP si se solicita
-            if extraer and local_path.suffix == ".zip":
-                print()
-                print("[>>] Iniciando extraccion en servidor...")
-                print(f"[INFO] Archivo ZIP: {remote_path}")
-
-                # Obtener directorio de destino
-                remote_dir = remote_path.rsplit("/", 1)[0]
-                zip_filename = remote_path.rsplit("/", 1)[1]
-                extract_dir = zip_filename.replace(".zip", "")
-                full_extract_path = f"{remote_dir}/{extract_dir}"
-
-                print(f"[INFO] Directorio de extraccion: {full_extract_path}/")
-                print()
-
-                # Ejecutar comando unzip en el servidor
-                ssh_client = sftp_client.get_channel().get_transport().open_session()
-
-                # Comando: cd al directorio, crear carpeta, extraer
-                cmd = f"cd {remote_dir} && mkdir -p {extract_dir} && unzip -o {zip_filename} -d {extract_dir}"
-                print(f"[PROC] Ejecutando comando de extraccion...")
-                print(f"[CMD] {cmd}")
-                print()
-
-                ssh_client.exec_command(cmd)
-                exit_status = ssh_client.recv_exit_status()
-
-                if exit_status == 0:
-                    print("[OK] Extraccion completada exitosamente")
-                    print(f"[OK] Archivos extraidos en: {full_extract_path}/")
-                    print(f"[OK] Archivo ZIP original conservado: {remote_path}")
-
-                    # NUEVO: Desencriptacion automatica
-                    print()
-                    print("[>>] Iniciando desencriptacion automatica...")
-
-                    # Copiar script de desencriptacion al servidor
-                    script_local = Path("decrypt_esicorp.py")
-                    script_remoto = f"{remote_dir}/decrypt_esicorp.py"
-
-                    if script_local.exists():
-                        print(
-                            f"[PROC] Copiando script de desencriptacion al servidor..."
-                        )
-                        try:
-                            sftp_client.put(str(script_local), script_remoto)
-                            print(f"[OK] Script copiado: {script_remoto}")
-
-                            # Ejecutar script de desencriptacion
-                            ssh_client.close()  # Cerrar sesion anterior
-                            ssh_client = (
-                                sftp_client.get_channel().get_transport().open_session()
-                            )
-
-                            decrypt_cmd = f"cd {remote_dir} && python3 decrypt_esicorp.py {extract_dir}"
-                            print(f"[PROC] Ejecutando desencriptacion...")
-                            print(f"[CMD] {decrypt_cmd}")
-                            print()
-
-                            ssh_client.exec_command(decrypt_cmd)
-
-                            # Leer output del script
-                            import time
-
-                            time.sleep(1)  # Esperar a que termine
-
-                            # Obtener output
-                            stdout = ssh_client.makefile("r")
-                            stderr = ssh_client.makefile_stderr("r")
-
-                            output = stdout.read().decode("utf-8")
-                            errors = stderr.read().decode("utf-8")
-
-                            if output:
-                                print(output)
-
-                            exit_status = ssh_client.recv_exit_status()
-
-                            if exit_status == 0:
-                                print("[OK] Desencriptacion completada exitosamente")
-                                print(
-                                    f"[OK] Archivos originales restaurados en: {full_extract_path}/"
-                                )
-                            else:
-                                print(
-                                    f"[!] Advertencia: Desencriptacion retorno codigo {exit_status}"
-                                )
-                                if errors:
-                                    print(f"[!] Errores: {errors}")
-                                print(
-                                    f"[TIP] Verifica que Python 3 y cryptography esten instalados"
-                                )
-                                print(
-                                    f"[TIP] Instalar: sudo apt-get install python3-pip && pip3 install cryptography"
-                                )
-
-                        except Exception as e:
-                            print(f"[!] Error al desencriptar: {e}")
-                            print(
-                                f"[INFO] Los archivos cifrados estan disponibles en: {full_extract_path}/"
-                            )
-                    else:
-                        print(f"[!] Script decrypt_esicorp.py no encontrado localmente")
-                        print(
-                            f"[INFO] Los archivos cifrados estan disponibles en: {full_extract_path}/"
-                        )
-
-                else:
-                    print(
-                        f"[!] Advertencia: El comando de extraccion retorno codigo {exit_status}"
-                    )
-                    print(f"[TIP] Verifica que 'unzip' este instalado en el servidor")
-                    print(
-                        f"[TIP] Instalar con: sudo apt-get install unzip (Debian/Ubuntu)"
-                    )
-
-                ssh_client.close()
-
-            print("=" * 60)
             return True
 
         except PermissionError as e:
@@ -390,6 +322,335 @@ class SFTPManager:
             print(f"   [X] ERROR: {e}")
             return False
 
+    def extraer_y_descifrar(self, sftp_client, remote_path, copiar_script=True, local_path=None):
+        """
+        Descifra en el servidor un ZIP ya transferido.
+
+        decrypt_esicorp.py lee los .enc directamente del ZIP (sin unzip ni
+        archivos intermedios) y deja los originales verificados, con sus
+        .hash.txt y metadata, en ``<ZIP sin .zip>/``.
+
+        Si algunos .enc no se restauran y se indica el ZIP local, se reenvían
+        solo esos (ver reenviar_fallidos), hasta ``reintentos_remoto`` veces.
+
+        Solo abre sesiones sobre el transporte SSH de ``sftp_client``, por lo
+        que puede ejecutarse en otro hilo mientras se transfieren otros
+        archivos por la misma conexión.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            remote_path (str): Ruta remota del ZIP
+            copiar_script (bool): Copiar decrypt_esicorp.py al directorio
+                remoto antes de ejecutarlo (False si ya se copió)
+            local_path (str/Path): ZIP local del que reenviar los .enc
+                fallidos, o None para no reintentar
+
+        Returns:
+            ResultadoRemoto: Resultado por archivo; verdadero si se
+            restauraron todos
+        """
+        resultado = ResultadoRemoto(remote_path)
+        try:
+            print("[>>] Iniciando desencriptacion automatica en servidor...")
+            print(f"[INFO] Archivo ZIP: {remote_path}")
+
+            # Obtener directorio de destino
+            remote_dir = remote_path.rsplit("/", 1)[0]
+            zip_filename = remote_path.rsplit("/", 1)[1]
+
+            print(f"[INFO] Directorio de salida: {remote_dir}/{zip_filename.replace('.zip', '')}/")
+            print()
+
+            # Con un worker residente activo el script ya está en el servidor
+            if (
+                self.obtener_worker(sftp_client, remote_dir, iniciar=False) is not None
+                or not copiar_script
+                or self.copiar_script_descifrado(sftp_client, remote_dir)
+            ):
+                resultado = self._descifrar(sftp_client, remote_dir, zip_filename)
+                if local_path is not None:
+                    for _ in range(self.reintentos_remoto):
+                        if resultado or not resultado.reenviables:
+                            break
+                        resultado = self.reenviar_fallidos(
+                            sftp_client, local_path, remote_path, resultado
+                        )
+                if resultado:
+                    print(f"[OK] Archivo ZIP original conservado: {remote_path}")
+            else:
+                resultado.error = "no se pudo copiar decrypt_esicorp.py"
+                print(f"[INFO] El ZIP cifrado esta disponible en: {remote_path}")
+
+        except Exception as e:
+            resultado.error = str(e)
+            print(f"[!] Error en el servidor: {e}")
+        return resultado
+
+    def _descifrar(self, sftp_client, remote_dir, zip_filename, destino=None):
+        """
+        Descifra un ZIP remoto con el worker residente o, si no hay, con un
+        proceso aparte, y muestra el resultado por archivo.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            remote_dir (str): Directorio remoto del ZIP y del script
+            zip_filename (str): Nombre del ZIP en ``remote_dir``
+            destino (str): Directorio de salida relativo a ``remote_dir``, o
+                None para ``<ZIP sin .zip>/``
+
+        Returns:
+            ResultadoRemoto: Resultado por archivo
+        """
+        destino = destino or zip_filename.replace(".zip", "")
+        full_extract_path = f"{remote_dir}/{destino}"
+
+        resultado = None
+        worker = self.obtener_worker(sftp_client, remote_dir)
+        if worker is not None:
+            resultado = self._descifrar_con_worker(worker, remote_dir, zip_filename, destino)
+        if resultado is None:
+            resultado = self._ejecutar_descifrado(sftp_client, remote_dir, zip_filename, destino)
+
+        if resultado:
+            print("[OK] Desencriptacion completada exitosamente")
+            print(f"[OK] Archivos originales restaurados en: {full_extract_path}/")
+        elif resultado.error is None:
+            fallidos = ", ".join(resultado.fallidos) or full_extract_path
+            print(f"[!] Advertencia: no se restauraron: {fallidos}")
+        resultado.mostrar()
+        return resultado
+
+    def _ejecutar_descifrado(self, sftp_client, remote_dir, zip_filename, destino):
+        """
+        Ejecuta ``python3 decrypt_esicorp.py --json`` en un proceso nuevo del
+        servidor.
+
+        El script informa un registro JSON por .enc a medida que termina (ver
+        modo_json en decrypt_esicorp.py); la consola de cada archivo se
+        muestra en cuanto llega su registro.
+
+        Returns:
+            ResultadoRemoto: Resultado por archivo
+        """
+        ruta = f"{remote_dir}/{zip_filename}"
+        try:
+            # Ejecutar script de desencriptacion
+            ssh_client = sftp_client.get_channel().get_transport().open_session()
+
+            decrypt_cmd = (
+                f"cd {remote_dir} && python3 decrypt_esicorp.py {zip_filename} --json"
+            )
+            if destino != zip_filename.replace(".zip", ""):
+                decrypt_cmd += f" --destino {destino}"
+            if self.workers_remoto != 1:
+                decrypt_cmd += f" --workers {self.workers_remoto}"
+            print(f"[PROC] Ejecutando desencriptacion...")
+            print(f"[CMD] {decrypt_cmd}")
+            print()
+
+            ssh_client.exec_command(decrypt_cmd)
+
+            # Leer los registros a medida que el script los emite
+            archivos = []
+            fin = None
+            for linea in ssh_client.makefile("rb"):
+                try:
+                    registro = json.loads(linea.decode("utf-8"))
+                except ValueError:
+                    print(linea.decode("utf-8", "replace"), end="")
+                    continue
+                if registro.get("salida"):
+                    print(registro["salida"], end="")
+                if registro.get("tipo") == "archivo":
+                    archivos.append(registro)
+                elif registro.get("tipo") == "fin":
+                    fin = registro
+
+            errors = ssh_client.makefile_stderr("rb").read().decode("utf-8", "replace")
+            exit_status = ssh_client.recv_exit_status()
+            ssh_client.close()
+
+        except Exception as e:
+            print(f"[!] Error al desencriptar: {e}")
+            return ResultadoRemoto(ruta, error=str(e))
+
+        if fin is None:
+            # El script no llegó a informar (ej: falta python3 o cryptography)
+            print(f"[!] Advertencia: Desencriptacion retorno codigo {exit_status}")
+            if errors:
+                print(f"[!] Errores: {errors}")
+            print(f"[TIP] Verifica que Python 3 y cryptography esten instalados")
+            print(
+                f"[TIP] Instalar: sudo apt-get install python3-pip && pip3 install cryptography"
+            )
+            return ResultadoRemoto(ruta, error=errors.strip() or f"codigo {exit_status}")
+        return ResultadoRemoto.desde_mensaje(ruta, fin, archivos)
+
+    def _descifrar_con_worker(self, worker, remote_dir, zip_filename, destino):
+        """
+        Descifra un ZIP remoto con el worker residente.
+
+        Args:
+            worker (WorkerRemoto): Worker iniciado en el directorio remoto
+            remote_dir (str): Directorio remoto del worker
+            zip_filename (str): ZIP a descifrar, relativo al directorio del worker
+            destino (str): Directorio de salida, relativo al del worker
+
+        Returns:
+            ResultadoRemoto: Resultado por archivo; None si el worker dejó de
+            responder (hay que ejecutar el script aparte)
+        """
+        print(f"[PROC] Ejecutando desencriptacion (worker residente)...")
+        try:
+            resultado = worker.descifrar(zip_filename, destino)
+        except ErrorWorker as e:
+            print(f"[!] {e}; se ejecuta decrypt_esicorp.py aparte")
+            return None
+
+        resultado.ruta = f"{remote_dir}/{zip_filename}"
+        if resultado.salida:
+            print(resultado.salida)
+        return resultado
+
+    def reenviar_fallidos(self, sftp_client, local_zip, remote_path, resultado):
+        """
+        Reenvía al servidor solo los .enc que no se restauraron.
+
+        Arma un ZIP parcial con esos .enc y sus .hash.txt, tomados del ZIP
+        local, lo sube junto al original y lo descifra en el mismo directorio
+        de salida. El ZIP parcial se elimina del servidor al terminar.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            local_zip (str/Path): ZIP local que se subió a ``remote_path``
+            remote_path (str): Ruta remota del ZIP original
+            resultado (ResultadoRemoto): Resultado del descifrado anterior
+
+        Returns:
+            ResultadoRemoto: ``resultado`` con los archivos reenviados
+            actualizados
+        """
+        pendientes = resultado.reenviables
+        if not pendientes:
+            return resultado
+        remote_dir, zip_filename = remote_path.rsplit("/", 1)
+        destino = zip_filename.replace(".zip", "")
+        nombre_parcial = f"{destino}.reintento.zip"
+        remoto_parcial = f"{remote_dir}/{nombre_parcial}"
+        incluir = set(pendientes) | {
+            f"{nombre[: -len('.enc')]}.hash.txt" for nombre in pendientes
+        }
+
+        print(f"\n[PROC] Reenviando solo {len(pendientes)} archivo(s) no restaurado(s):")
+        for nombre in pendientes:
+            print(f"   - {nombre}")
+
+        with tempfile.TemporaryDirectory() as temporal:
+            parcial = Path(temporal) / nombre_parcial
+            try:
+                with zipfile.ZipFile(local_zip) as origen, zipfile.ZipFile(parcial, "w") as zipf:
+                    for info in origen.infolist():
+                        if PurePosixPath(info.filename).name not in incluir:
+                            continue
+                        copia = zipfile.ZipInfo(info.filename, info.date_time)
+                        copia.compress_type = info.compress_type
+                        copia.file_size = info.file_size
+                        with origen.open(info) as leer, zipf.open(copia, "w") as escribir:
+                            shutil.copyfileobj(leer, escribir)
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"[!] No se pudo armar el ZIP parcial: {e}")
+                return resultado
+
+            if not self.transferir_archivo(sftp_client, parcial, remoto_parcial):
+                return resultado
+
+        try:
+            reintento = self._descifrar(sftp_client, remote_dir, nombre_parcial, destino)
+        finally:
+            try:
+                sftp_client.remove(remoto_parcial)
+            except Exception:
+                pass
+        return resultado.combinar(reintento)
+
+    def obtener_worker(self, sftp_client, remote_dir, iniciar=True):
+        """
+        Worker residente de decrypt_esicorp.py para la sesión de ``sftp_client``.
+
+        Se inicia la primera vez que se pide (con el script ya copiado en
+        ``remote_dir``). Si no arranca, en esa sesión no se reintenta y cada
+        ZIP se descifra con un proceso aparte.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            remote_dir (str): Directorio remoto del script
+            iniciar (bool): Iniciarlo si todavía no existe
+
+        Returns:
+            WorkerRemoto: Worker activo, o None
+        """
+        if not self.worker_residente:
+            return None
+        transporte = sftp_client.get_channel().get_transport()
+        clave = (transporte, remote_dir)
+        with self._workers_lock:
+            if clave in self._workers or not iniciar:
+                worker = self._workers.get(clave)
+                return worker if worker is not None and worker.activo else None
+
+            worker = WorkerRemoto(transporte, remote_dir, self.workers_remoto)
+            try:
+                worker.iniciar()
+                print("[OK] Worker de desencriptacion iniciado en el servidor")
+            except Exception as e:
+                print(f"[!] No se pudo iniciar el worker remoto ({e})")
+                print("[INFO] Se ejecutara decrypt_esicorp.py por cada archivo")
+                worker = None
+            self._workers[clave] = worker
+            return worker
+
+    def cerrar_workers(self, sftp_client=None):
+        """
+        Termina los workers residentes de una conexión (o todos).
+
+        Args:
+            sftp_client: Cliente SFTP cuya sesión se cierra, o None para todas
+        """
+        transporte = sftp_client.get_channel().get_transport() if sftp_client else None
+        with self._workers_lock:
+            for clave in list(self._workers):
+                if transporte is None or clave[0] is transporte:
+                    worker = self._workers.pop(clave)
+                    if worker is not None:
+                        worker.cerrar()
+
+    def copiar_script_descifrado(self, sftp_client, remote_dir):
+        """
+        Copia decrypt_esicorp.py al directorio remoto.
+
+        Args:
+            sftp_client: Cliente SFTP conectado
+            remote_dir (str): Directorio remoto (sin "/" final)
+
+        Returns:
+            bool: True si el script quedó copiado
+        """
+        script_local = Path("decrypt_esicorp.py")
+        script_remoto = f"{remote_dir}/decrypt_esicorp.py"
+
+        if not script_local.exists():
+            print(f"[!] Script decrypt_esicorp.py no encontrado localmente")
+            return False
+
+        print(f"[PROC] Copiando script de desencriptacion al servidor...")
+        try:
+            sftp_client.put(str(script_local), script_remoto)
+        except Exception as e:
+            print(f"[!] Error al copiar el script: {e}")
+            return False
+        print(f"[OK] Script copiado: {script_remoto}")
+        return True
+
     def cerrar_conexion(self, sftp_client, ssh_client):
         """
         Cierra conexiones SFTP y SSH.
@@ -400,6 +661,7 @@ class SFTPManager:
         """
         try:
             if sftp_client:
+                self.cerrar_workers(sftp_client)
                 sftp_client.close()
             if ssh_client:
                 ssh_client.close()
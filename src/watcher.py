@@ -0,0 +1,248 @@
+"""
+Vigilante de ./salida - Modo ESICORP continuo (--watch)
+
+Detecta archivos nuevos o modificados en el directorio de salida, espera a que
+dejen de crecer, los procesa con ESICORPProcessor y los sube por una sesión
+SFTP que se mantiene abierta entre envíos.
+
+Detección:
+- inotify (paquete opcional inotify_simple, solo Linux) para despertar apenas
+  llega un archivo
+- Sondeo con os.scandir comparando tamaño y mtime en cualquier otro caso
+
+Un archivo que no se pudo procesar se vuelve a intentar cuando pasa de nuevo
+espera_estable segundos sin cambios. Solo vigila el nivel superior de ./salida
+y envía todo al destino indicado: no aplica --recursivo, los filtros de
+selección ni las rutas por Sede/Area (config.SFTP_RUTAS).
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import os
+import time
+from . import config
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+
+class VigilanteSalida:
+    """Procesa y envía automáticamente los archivos que llegan a ./salida."""
+
+    def __init__(
+        self,
+        processor,
+        sftp_mgr,
+        hostname,
+        username,
+        port,
+        remote_path,
+        intervalo=config.WATCH_INTERVALO,
+        espera_estable=config.WATCH_ESPERA_ESTABLE,
+    ):
+        """
+        Inicializa el vigilante.
+
+        Args:
+            processor (ESICORPProcessor): Procesador configurado
+            sftp_mgr (SFTPManager): Gestor de conexiones SFTP
+            hostname (str): Servidor SFTP
+            username (str): Usuario SFTP
+            port (int): Puerto SSH
+            remote_path (str): Ruta remota de destino
+            intervalo (float): Segundos entre revisiones del directorio
+            espera_estable (float): Segundos sin cambios de tamaño/mtime para
+                considerar que un archivo terminó de escribirse
+        """
+        self.processor = processor
+        self.sftp_mgr = sftp_mgr
+        self.hostname = hostname
+        self.username = username
+        self.port = port
+        self.remote_path = remote_path if remote_path.endswith("/") else remote_path + "/"
+        self.intervalo = intervalo
+        self.espera_estable = espera_estable
+
+        self.sftp_client = None
+        self.ssh_client = None
+        self.observados = {}  # nombre -> ((tamaño, mtime_ns), visto desde)
+        self.atendidos = {}  # nombre -> (tamaño, mtime_ns) ya procesado con éxito
+        self.pendientes_subida = []  # ZIP procesados que aún no se subieron
+
+    def _escanear(self):
+        """
+        Lista los archivos con patrón ESICORP usando os.scandir.
+
+        Returns:
+            dict: nombre -> (tamaño, mtime_ns)
+        """
+        firmas = {}
+        with os.scandir(self.processor.salida_dir) as entradas:
+            for entrada in entradas:
+                if not self.processor.FILE_PATTERN.match(entrada.name):
+                    continue
+                try:
+                    if not entrada.is_file():
+                        continue
+                    stat = entrada.stat()
+                except OSError:
+                    continue
+                firmas[entrada.name] = (stat.st_size, stat.st_mtime_ns)
+        return firmas
+
+    def _archivos_estables(self):
+        """
+        Devuelve los archivos nuevos o modificados que ya dejaron de cambiar.
+
+        Un archivo pasa a ``atendidos`` recién cuando se procesa con éxito
+        (ver _procesar): si falla, se vuelve a observar y se reintenta.
+
+        Returns:
+            dict: Archivo Path listo para procesar -> (tamaño, mtime_ns)
+        """
+        ahora = time.monotonic()
+        firmas = self._escanear()
+        listos = {}
+
+        for nombre in list(self.observados):
+            if nombre not in firmas:
+                del self.observados[nombre]
+
+        for nombre, firma in firmas.items():
+            if self.atendidos.get(nombre) == firma:
+                continue
+
+            anterior = self.observados.get(nombre)
+            if anterior is None or anterior[0] != firma:
+                self.observados[nombre] = (firma, ahora)
+                continue
+
+            if ahora - anterior[1] >= self.espera_estable:
+                del self.observados[nombre]
+                listos[self.processor.salida_dir / nombre] = firma
+
+        return listos
+
+    def _procesar(self, listos):
+        """
+        Procesa los archivos estables y deja sus ZIP pendientes de subida.
+
+        Args:
+            listos (dict): Archivo Path -> (tamaño, mtime_ns), ver _archivos_estables
+        """
+        self.pendientes_subida.extend(self.processor.procesar_lote(list(listos)))
+        for file_path, firma in listos.items():
+            if self.processor.zip_por_archivo.get(file_path):
+                self.atendidos[file_path.name] = firma
+
+    def _asegurar_conexion(self):
+        """
+        Mantiene abierta la sesión SFTP, reconectando si se cayó.
+
+        Returns:
+            bool: True si hay una conexión activa
+        """
+        if self.ssh_client is not None:
+            transporte = self.ssh_client.get_transport()
+            if transporte is not None and transporte.is_active():
+                return True
+            print("[!]  Conexión SFTP perdida, reconectando...")
+            self.sftp_mgr.cerrar_conexion(self.sftp_client, self.ssh_client)
+            self.sftp_client, self.ssh_client = None, None
+
+        self.sftp_client, self.ssh_client = self.sftp_mgr.conectar_sftp(
+            hostname=self.hostname, username=self.username, port=self.port
+        )
+        if self.ssh_client is None:
+            return False
+
+        self.ssh_client.get_transport().set_keepalive(config.WATCH_KEEPALIVE)
+        return True
+
+    def _subir_pendientes(self):
+        """
+        Sube los ZIP pendientes; los que no se pudieron transferir se
+        reintentan después.
+
+        Un ZIP se marca subido solo si el servidor restauró todos sus .enc. Si
+        el descifrado falla (ya reintentado por subir_archivo) no se vuelve a
+        subir en esta sesión: queda como procesado en el manifiesto y se
+        reenvía en la siguiente ejecución.
+        """
+        if not self.pendientes_subida or not self._asegurar_conexion():
+            return
+
+        fallidos = []
+        for zip_file in self.pendientes_subida:
+            remote_file = self.remote_path + zip_file.name
+            resultado = self.sftp_mgr.subir_archivo(self.sftp_client, zip_file, remote_file)
+            if resultado:
+                self.processor.marcar_subido(zip_file)
+            elif resultado is False:
+                fallidos.append(zip_file)
+            else:
+                print(f"[!]  {zip_file.name}: no se restauró en el servidor, no se marca como subido")
+        self.pendientes_subida = fallidos
+        self.processor.guardar_manifiesto()
+
+    def _marcar_ya_enviados(self):
+        """Omite al arrancar los archivos que el manifiesto da por enviados."""
+        manifiesto = self.processor.manifiesto
+        for nombre, firma in self._escanear().items():
+            file_path = self.processor.salida_dir / nombre
+            entrada = manifiesto.entradas.get(manifiesto._clave(file_path))
+            if (
+                entrada
+                and entrada["estado"] == "subido"
+                and (entrada["tamano"], entrada["mtime_ns"]) == firma
+            ):
+                self.atendidos[nombre] = firma
+
+    def _esperar_cambios(self, inotify):
+        """Espera el siguiente ciclo (o un evento de inotify, si está disponible)."""
+        if inotify is None:
+            time.sleep(self.intervalo)
+        else:
+            inotify.read(timeout=int(self.intervalo * 1000))
+
+    def ejecutar(self):
+        """Bucle principal; termina con Ctrl+C."""
+        print("\n" + "=" * 60)
+        print("MODO VIGILANCIA ESICORP (--watch)")
+        print("=" * 60)
+        print(f"[INFO] Directorio: {self.processor.salida_dir.absolute()}")
+        print(f"[INFO] Destino: {self.username}@{self.hostname}:{self.remote_path}")
+
+        inotify = None
+        if INotify is not None:
+            inotify = INotify()
+            inotify.add_watch(
+                str(self.processor.salida_dir),
+                inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE,
+            )
+            print("[INFO] Detección: inotify")
+        else:
+            print(f"[INFO] Detección: sondeo cada {self.intervalo}s")
+        print("[i]  Presione Ctrl+C para detener\n")
+
+        self._marcar_ya_enviados()
+        self._asegurar_conexion()
+
+        try:
+            while True:
+                listos = self._archivos_estables()
+                if listos:
+                    print(f"\n[>>] {len(listos)} archivo(s) nuevo(s) o modificado(s)")
+                    self._procesar(listos)
+                self._subir_pendientes()
+                self._esperar_cambios(inotify)
+        except KeyboardInterrupt:
+            print("\n[i]  Vigilancia detenida")
+        finally:
+            if inotify is not None:
+                inotify.close()
+            self.processor.guardar_manifiesto()
+            if self.ssh_client is not None:
+                self.sftp_mgr.cerrar_conexion(self.sftp_client, self.ssh_client)
@@ -0,0 +1,234 @@
+"""
+Worker remoto ESICORP - decrypt_esicorp.py residente en el servidor
+
+En lugar de lanzar ``python3 decrypt_esicorp.py`` por cada ZIP (arranque del
+intérprete e importación de cryptography cada vez), se inicia una vez por
+sesión SSH ``decrypt_esicorp.py --worker`` en un canal que queda abierto y se
+le envían los trabajos como mensajes.
+
+Protocolo (ver modo_worker en decrypt_esicorp.py): cada mensaje es
+[longitud 4 bytes big-endian][JSON UTF-8].
+
+ResultadoRemoto reúne lo que informa el servidor por cada .enc (por el
+worker o por ``decrypt_esicorp.py --json``), para reportar y reenviar solo los
+archivos que fallaron.
+
+Autor: Grupo ESICORP - UNAD
+"""
+
+import json
+import struct
+import threading
+
+LONGITUD_MENSAJE = struct.Struct(">I")
+VERSION_PROTOCOLO = 3
+
+
+class ResultadoRemoto:
+    """
+    Resultado del descifrado de un ZIP en el servidor, archivo por archivo.
+
+    Es verdadero si se restauraron todos los .enc, así que puede usarse donde
+    antes se esperaba un bool.
+    """
+
+    def __init__(self, ruta, ok=False, archivos=(), fallidos=(), salida="", error=None):
+        """
+        Args:
+            ruta (str): ZIP remoto
+            ok (bool): True si se restauraron todos los .enc
+            archivos (list): Un dict por .enc, como lo informa el servidor:
+                "archivo", "original", "exito", "tamano", "ms",
+                "hash_verificado", "copias", "omitido" (ya estaba restaurado)
+                y "error"
+            fallidos (list): .enc no restaurados (o el ZIP, si no se pudo leer)
+            salida (str): Consola del servidor
+            error (str): Motivo si el descifrado no llegó a ejecutarse
+        """
+        self.ruta = ruta
+        self.ok = ok
+        self.archivos = list(archivos)
+        self.fallidos = list(fallidos)
+        self.salida = salida
+        self.error = error
+
+    def __bool__(self):
+        return self.ok
+
+    @classmethod
+    def desde_mensaje(cls, ruta, mensaje, archivos):
+        """Resultado a partir del mensaje "fin" y los "archivo" del servidor."""
+        campos = (
+            "archivo",
+            "original",
+            "exito",
+            "tamano",
+            "ms",
+            "hash_verificado",
+            "copias",
+            "omitido",
+            "error",
+        )
+        return cls(
+            ruta,
+            ok=bool(mensaje.get("ok")),
+            archivos=[{campo: archivo.get(campo) for campo in campos} for archivo in archivos],
+            fallidos=mensaje.get("fallidos", ()),
+            salida=mensaje.get("salida", ""),
+        )
+
+    @property
+    def reenviables(self):
+        """.enc que fallaron y pueden reenviarse solos (no el ZIP entero)."""
+        return [archivo["archivo"] for archivo in self.archivos if not archivo["exito"]]
+
+    def combinar(self, reintento):
+        """
+        Incorpora el resultado de reenviar algunos .enc.
+
+        Args:
+            reintento (ResultadoRemoto): Resultado del ZIP parcial reenviado
+
+        Returns:
+            ResultadoRemoto: self, actualizado
+        """
+        nuevos = {archivo["archivo"]: archivo for archivo in reintento.archivos}
+        self.archivos = [nuevos.pop(a["archivo"], a) for a in self.archivos] + list(nuevos.values())
+        self.fallidos = [a["archivo"] for a in self.archivos if not a["exito"]]
+        self.ok = reintento.ok and not self.fallidos
+        return self
+
+    def mostrar(self):
+        """Imprime una línea por .enc: tamaño y tiempo, o el error."""
+        for archivo in self.archivos:
+            if archivo["omitido"]:
+                print(f"   [OK] {archivo['original']}: ya restaurado y verificado, se omitió")
+            elif archivo["exito"]:
+                verificado = "hash verificado" if archivo["hash_verificado"] else "sin hash"
+                print(
+                    f"   [OK] {archivo['original']}: {archivo['tamano'] or 0:,} bytes, "
+                    f"{archivo['ms'] or 0:,.1f} ms, {verificado}"
+                )
+            else:
+                print(f"   [X] {archivo['archivo']}: {archivo['error'] or 'no restaurado'}")
+
+
+class ErrorWorker(Exception):
+    """El worker remoto no arrancó o dejó de responder."""
+
+
+class WorkerRemoto:
+    """Proceso decrypt_esicorp.py --worker en una sesión SSH."""
+
+    def __init__(self, transporte, remote_dir, workers=1):
+        """
+        Args:
+            transporte (paramiko.Transport): Transporte SSH de la conexión
+            remote_dir (str): Directorio remoto donde está decrypt_esicorp.py
+            workers (int): Procesos de descifrado por trabajo en el servidor
+        """
+        self.transporte = transporte
+        self.remote_dir = remote_dir.rstrip("/")
+        self.workers = workers
+        self.canal = None
+        self._siguiente_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self):
+        return self.canal is not None and not self.canal.closed
+
+    def iniciar(self):
+        """
+        Lanza el worker y espera su mensaje "listo".
+
+        Raises:
+            ErrorWorker: Si el worker no arranca (ej: sin python3 o cryptography)
+        """
+        comando = f"cd {self.remote_dir} && python3 decrypt_esicorp.py --worker"
+        if self.workers != 1:
+            comando += f" --workers {self.workers}"
+        self.canal = self.transporte.open_session()
+        self.canal.exec_command(comando)
+
+        listo = self._recibir()
+        if listo.get("tipo") != "listo" or listo.get("version") != VERSION_PROTOCOLO:
+            self.cerrar()
+            raise ErrorWorker(f"respuesta inesperada del worker: {listo}")
+
+    def _recibir_exacto(self, tamano):
+        datos = bytearray()
+        while len(datos) < tamano:
+            trozo = self.canal.recv(tamano - len(datos))
+            if not trozo:
+                errores = b""
+                while self.canal.recv_stderr_ready():
+                    errores += self.canal.recv_stderr(4096)
+                detalle = errores.decode("utf-8", "replace").strip()
+                raise ErrorWorker(
+                    "el worker remoto terminó" + (f": {detalle}" if detalle else "")
+                )
+            datos += trozo
+        return bytes(datos)
+
+    def _recibir(self):
+        (longitud,) = LONGITUD_MENSAJE.unpack(self._recibir_exacto(LONGITUD_MENSAJE.size))
+        return json.loads(self._recibir_exacto(longitud).decode("utf-8"))
+
+    def _enviar(self, mensaje):
+        datos = json.dumps(mensaje, ensure_ascii=False).encode("utf-8")
+        self.canal.sendall(LONGITUD_MENSAJE.pack(len(datos)) + datos)
+
+    def descifrar(self, ruta, destino=None):
+        """
+        Descifra en el servidor los .enc de un ZIP subido (o de un directorio).
+
+        Args:
+            ruta (str): ZIP o directorio remoto, relativo a ``remote_dir``
+            destino (str): Directorio de salida del ZIP, o None para
+                ``<ZIP sin .zip>/``
+
+        Returns:
+            ResultadoRemoto: Resultado por archivo y consola del worker
+
+        Raises:
+            ErrorWorker: Si el worker dejó de responder
+        """
+        with self._lock:
+            if not self.activo:
+                raise ErrorWorker("el worker remoto no está iniciado")
+            self._siguiente_id += 1
+            id_ = self._siguiente_id
+            try:
+                self._enviar(
+                    {"id": id_, "accion": "descifrar", "ruta": ruta, "destino": destino}
+                )
+                archivos = []
+                while True:
+                    mensaje = self._recibir()
+                    if mensaje.get("id") != id_:
+                        raise ErrorWorker(f"respuesta fuera de orden: {mensaje}")
+                    if mensaje.get("tipo") == "archivo":
+                        archivos.append(mensaje)
+                    elif mensaje.get("tipo") == "fin":
+                        return ResultadoRemoto.desde_mensaje(ruta, mensaje, archivos)
+            except ErrorWorker:
+                self.cerrar()
+                raise
+            except Exception as e:
+                self.cerrar()
+                raise ErrorWorker(f"error de comunicación con el worker remoto: {e}") from e
+
+    def cerrar(self):
+        """Pide al worker que termine y cierra el canal."""
+        if self.canal is None:
+            return
+        try:
+            if not self.canal.closed:
+                self._enviar({"accion": "salir"})
+                self.canal.shutdown_write()
+        except OSError:
+            pass
+        finally:
+            self.canal.close()
+            self.canal = None